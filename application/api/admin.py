@@ -1,17 +1,39 @@
 # application/api/admin.py
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import os
+from datetime import date, datetime, timedelta
+from typing import Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import bindparam, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from utils.util_functions import get_current_user, role_required, role_validator
+from utils.menu_cache import menu_cache
+from utils.pagination import ORDERS_MAX_PAGE_SIZE, ORDERS_PAGE_SIZE, order_page
+from utils.bulk_io import MEDIA_TYPES, batched, csv_line, iter_records, ndjson_line, request_format
+from utils.events import KITCHEN_CHANNEL, event_stream, publish_order_event
+from utils.order_status import SameStatus, transition_order
 from schema.auth import TokenData, UserResponse
-from schema.pizza import MessageResponse, PizzaCreate, PizzaResponse, PizzaUpdate
-from schema.order import Order, OrderUpdate
-from database.database import get_db
+from schema.pizza import MessageResponse, PizzaCreate, PizzaImportReport, PizzaImportRow, PizzaImportUpdate, PizzaResponse, PizzaUpdate
+from schema.order import Order, OrderPage, OrderSummary, OrderUpdate
+from schema.stats import SalesStats
+from database.database import AsyncSessionLocal, get_async_db
 from models.pizza import Pizza
-from models.order import Order as ModelOrder
+from models.order import Order as ModelOrder, OrderItem as ModelOrderItem, OrderStatus
+from models.sales import DailyPizzaSales, DailySales
 
 router = APIRouter()
 
+# rows validated and written per batch by the bulk pizza import
+PIZZA_IMPORT_CHUNK_SIZE = int(os.getenv("PIZZA_IMPORT_CHUNK_SIZE", "500"))
+
+# rows fetched per round trip by the order export stream
+ORDER_EXPORT_BATCH_SIZE = int(os.getenv("ORDER_EXPORT_BATCH_SIZE", "1000"))
+
+# days covered by GET /admin/stats without a date range
+STATS_DEFAULT_DAYS = int(os.getenv("STATS_DEFAULT_DAYS", "30"))
+
 """
 Endpoint: POST /admin/pizzas
 Function: create_pizza
@@ -21,9 +43,9 @@ Description: Creates Object of Pizza model and add them in db
 
 @router.post("/pizzas", response_model=PizzaResponse)
 # @role_required(required_role="admin", current_user=get_current_user)
-def create_pizza(
+async def create_pizza(
         pizza: PizzaCreate,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_async_db),
         current_user: UserResponse = Depends(get_current_user)
 ):
     if role_validator(allowed_roles=['customer'], current_user=current_user):
@@ -36,10 +58,11 @@ def create_pizza(
 
         try:
             db.add(current_pizza)
-            db.commit()
-            db.refresh(current_pizza)
+            await db.commit()
+            await db.refresh(current_pizza)
+            menu_cache.invalidate()
         except Exception as e:
-            db.rollback()
+            await db.rollback()
             raise HTTPException(
                 status_code=500,
                 detail="Internal server Error:" + str(e)
@@ -48,6 +71,168 @@ def create_pizza(
         return current_pizza
 
 
+def validate_row(model, record: dict) -> tuple:
+    """The validated row and None, or None and the validation errors as one message."""
+    try:
+        return model.model_validate(record), None
+    except ValidationError as e:
+        return None, "; ".join(f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors())
+
+
+def fail(report: PizzaImportReport, row_number: int, record, error: str):
+    report.failed += 1
+    report.rows.append(PizzaImportRow(
+        row=row_number,
+        name=record.get("name") if isinstance(record, dict) else None,
+        status="error",
+        errors=[error],
+    ))
+
+
+"""
+Endpoint:       POST /admin/pizzas/bulk
+Function:       import_pizzas
+Description:    Creates or updates pizzas by name from a CSV (text/csv, with a name,description,price,is_available
+                header) or NDJSON (application/x-ndjson) body. The body is parsed while it streams in and validated
+                in chunks, each chunk costs one SELECT plus one batched INSERT and a batched UPDATE per set of
+                columns, and the whole import is one transaction. Rows for existing pizzas only write the columns
+                they contain, new pizzas need all of them. Invalid rows, lines that are not UTF-8 among them, are
+                skipped and reported, the others are applied.
+"""
+
+
+@router.post("/pizzas/bulk", response_model=PizzaImportReport)
+async def import_pizzas(
+        request: Request,
+        format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+        db: AsyncSession = Depends(get_async_db),
+        current_user: UserResponse = Depends(get_current_user)
+):
+    if role_validator(allowed_roles=['admin'], current_user=current_user):
+        format = request_format(request, format)
+        pizzas = Pizza.__table__
+        report = PizzaImportReport()
+        # name -> ids of the pizzas already created or found with that name during this import
+        known = {}
+
+        try:
+            async for chunk in batched(iter_records(request, format), PIZZA_IMPORT_CHUNK_SIZE):
+                # every row is first validated as an update, new pizzas need all the fields of a create below
+                valid = []
+                for row_number, record, error in chunk:
+                    if error is None:
+                        pizza, error = validate_row(PizzaImportUpdate, record)
+                    if error is None:
+                        valid.append((row_number, record, pizza))
+                    else:
+                        fail(report, row_number, record, error)
+
+                unknown_names = {pizza.name for _, _, pizza in valid} - known.keys()
+                if unknown_names:
+                    for pizza_id, name in (await db.execute(
+                        select(pizzas.c.id, pizzas.c.name).where(pizzas.c.name.in_(unknown_names))
+                    )).all():
+                        known.setdefault(name, []).append(pizza_id)
+
+                # name -> the columns set by this chunk's rows for that pizza, later rows win
+                to_insert, to_update, updated_rows = [], {}, []
+                for row_number, record, pizza in valid:
+                    if pizza.name in known:
+                        to_update.setdefault(pizza.name, {}).update(pizza.model_dump(exclude_unset=True))
+                        updated_rows.append((row_number, pizza.name))
+                        continue
+                    new_pizza, error = validate_row(PizzaCreate, record)
+                    if error is not None:
+                        fail(report, row_number, record, error)
+                        continue
+                    # later rows with the same name in this chunk become updates of this one
+                    known[pizza.name] = []
+                    to_insert.append((row_number, new_pizza))
+
+                if to_insert:
+                    # names are unique within to_insert, so the new ids are matched up by name
+                    created = dict((await db.execute(
+                        insert(pizzas).returning(pizzas.c.name, pizzas.c.id),
+                        [pizza.model_dump() for _, pizza in to_insert]
+                    )).all())
+                    for row_number, pizza in to_insert:
+                        known[pizza.name].append(created[pizza.name])
+                        report.created += 1
+                        report.rows.append(PizzaImportRow(
+                            row=row_number, name=pizza.name, status="created", id=created[pizza.name]
+                        ))
+
+                # one batched UPDATE per set of columns, only the columns the rows contain are written
+                by_columns = {}
+                for name, values in to_update.items():
+                    columns = tuple(sorted(set(values) - {"name"}))
+                    if columns:
+                        by_columns.setdefault(columns, []).append(
+                            {"match_name": name, **{f"new_{column}": values[column] for column in columns}}
+                        )
+                for columns, parameters in by_columns.items():
+                    await db.execute(
+                        update(pizzas)
+                        .where(pizzas.c.name == bindparam("match_name"))
+                        .values({column: bindparam(f"new_{column}") for column in columns}),
+                        parameters
+                    )
+                for row_number, name in updated_rows:
+                    report.updated += 1
+                    report.rows.append(PizzaImportRow(row=row_number, name=name, status="updated", id=known[name][0]))
+
+            await db.commit()
+        except HTTPException:
+            await db.rollback()
+            raise
+        except Exception as e:
+            await db.rollback()
+            raise HTTPException(
+                status_code=500,
+                detail="Internal server Error:" + str(e)
+            )
+
+        menu_cache.invalidate()
+        report.rows.sort(key=lambda row: row.row)
+        return report
+
+
+"""
+Endpoint:       GET /admin/pizzas/export
+Function:       export_pizzas
+Description:    Streams every pizza as CSV or NDJSON, in the format POST /admin/pizzas/bulk accepts.
+"""
+
+
+@router.get("/pizzas/export")
+async def export_pizzas(
+        format: str = Query("csv", pattern="^(csv|ndjson)$"),
+        current_user: UserResponse = Depends(get_current_user)
+):
+    if role_validator(allowed_roles=['admin'], current_user=current_user):
+        columns = ["id", "name", "description", "price", "is_available"]
+        pizzas = Pizza.__table__
+
+        async def rows():
+            if format == "csv":
+                yield csv_line(columns)
+            # the request's session is closed once the response starts, the stream uses its own
+            async with AsyncSessionLocal() as db:
+                result = await db.stream(
+                    select(*(pizzas.c[column] for column in columns))
+                    .order_by(pizzas.c.id)
+                    .execution_options(yield_per=PIZZA_IMPORT_CHUNK_SIZE)
+                )
+                async for row in result:
+                    yield csv_line(row) if format == "csv" else ndjson_line(dict(row._mapping))
+
+        return StreamingResponse(
+            rows(),
+            media_type=MEDIA_TYPES[format],
+            headers={"Content-Disposition": f'attachment; filename="pizzas.{format}"'},
+        )
+
+
 """
 Endpoint:       PUT /admin/pizzas/{pizza_id}
 Function:       update_pizza
@@ -57,10 +242,10 @@ Description:    Verifies that pizza exist, and then update the attributes given
 
 @router.put("/pizzas/{pizza_id}", response_model=PizzaResponse)
 # @role_required("admin")
-def update_pizza(
+async def update_pizza(
         pizza_id: int,
         pizza: PizzaUpdate,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_async_db),
         current_user: UserResponse = Depends(get_current_user)
 ):
     if role_validator(allowed_roles=['admin'], current_user=current_user):
@@ -70,16 +255,17 @@ def update_pizza(
                 detail="Operation not permitted"
             )
 
-        pizza_to_update = db.query(Pizza).filter(Pizza.id == pizza_id).first()
+        pizza_to_update = await db.get(Pizza, pizza_id)
 
         if not pizza_to_update:
             raise HTTPException(status_code=404, detail="Pizza not found")
 
-        for key, value in pizza.dict(exclude_unset=True).items():
+        for key, value in pizza.model_dump(exclude_unset=True).items():
             setattr(pizza_to_update, key, value)
 
-        db.commit()
-        db.refresh(pizza_to_update)
+        await db.commit()
+        await db.refresh(pizza_to_update)
+        menu_cache.invalidate()
 
         return pizza_to_update
 
@@ -93,23 +279,24 @@ Description:    Verifies that pizza exist, and then delete the pizza based on th
 
 @router.delete("/pizzas/{pizza_id}", response_model=MessageResponse)
 # @role_required("admin", current_user=get_current_user)
-def delete_pizza(
+async def delete_pizza(
         pizza_id: int,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_async_db),
         current_user: UserResponse = Depends(get_current_user)
 ):
     if role_validator(allowed_roles=['customer'], current_user=current_user):
 
-        pizza_to_delete = db.query(Pizza).filter(Pizza.id == pizza_id).first()
+        pizza_to_delete = await db.get(Pizza, pizza_id)
         if not pizza_to_delete:
             raise HTTPException(status_code=404, detail="Pizza not found")
 
-        db.delete(pizza_to_delete)
+        await db.delete(pizza_to_delete)
         try:
-            db.commit()
+            await db.commit()
+            menu_cache.invalidate()
 
         except Exception as e:
-            db.rollback()
+            await db.rollback()
             raise HTTPException(
                 status_code=500,
                 detail="Internal Server Error: " + str(e)
@@ -118,28 +305,213 @@ def delete_pizza(
         return MessageResponse(message="Pizza deleted successfully.")
 
 
+"""
+Endpoint:       GET /admin/orders
+Function:       get_all_orders
+Description:    Browse the orders of all users, newest first, with the same cursor pagination
+                and filters as GET /customer/orders, optionally narrowed down to one user.
+"""
+
+
+@router.get("/orders", response_model=OrderPage)
+async def get_all_orders(
+        limit: int = Query(ORDERS_PAGE_SIZE, ge=1, le=ORDERS_MAX_PAGE_SIZE),
+        cursor: Optional[str] = None,
+        user_id: Optional[int] = None,
+        status: Optional[OrderStatus] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        db: AsyncSession = Depends(get_async_db),
+        current_user: UserResponse = Depends(get_current_user)
+):
+    if role_validator(allowed_roles=['admin'], current_user=current_user):
+        return await order_page(
+            db,
+            limit=limit,
+            cursor=cursor,
+            user_id=user_id,
+            status=status,
+            created_from=created_from,
+            created_to=created_to,
+        )
+
+
+"""
+Endpoint:       GET /admin/orders/events
+Function:       kitchen_events
+Description:    Server-Sent Events feed of every order being placed or changing status, for the kitchen screen.
+"""
+
+
+@router.get("/orders/events")
+async def kitchen_events(
+        request: Request,
+        current_user: UserResponse = Depends(get_current_user)
+):
+    if role_validator(allowed_roles=['admin'], current_user=current_user):
+        return StreamingResponse(
+            event_stream(request, KITCHEN_CHANNEL),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+
+"""
+Endpoint:       GET /admin/orders/export
+Function:       export_orders
+Description:    Streams orders with their items for analytics, as NDJSON (one order with its items per line)
+                or CSV (one line per order item), optionally filtered by created_at range and status.
+                Plain rows are read through a streaming cursor in batches of ORDER_EXPORT_BATCH_SIZE, never ORM
+                objects, so memory stays flat however many orders are exported.
+"""
+
+
+@router.get("/orders/export")
+async def export_orders(
+        format: str = Query("ndjson", pattern="^(csv|ndjson)$"),
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        status: Optional[OrderStatus] = None,
+        current_user: UserResponse = Depends(get_current_user)
+):
+    if role_validator(allowed_roles=['admin'], current_user=current_user):
+        orders = ModelOrder.__table__
+        order_items = ModelOrderItem.__table__
+        order_columns = ["id", "user_id", "status", "total_amount", "created_at", "updated_at"]
+        item_columns = ["pizza_id", "quantity", "unit_price"]
+
+        query = (
+            select(
+                *(orders.c[column] for column in order_columns),
+                order_items.c.id.label("item_id"),
+                *(order_items.c[column] for column in item_columns),
+            )
+            .select_from(orders.outerjoin(order_items, order_items.c.order_id == orders.c.id))
+            .order_by(orders.c.created_at, orders.c.id, order_items.c.id)
+        )
+        if created_from is not None:
+            query = query.where(orders.c.created_at >= created_from)
+        if created_to is not None:
+            query = query.where(orders.c.created_at < created_to)
+        if status is not None:
+            query = query.where(orders.c.status == status)
+
+        async def csv_rows():
+            yield csv_line(["order_id", *order_columns[1:], "item_id", *item_columns])
+            async for row in stream_rows(query):
+                yield csv_line(row)
+
+        async def ndjson_rows():
+            # rows arrive ordered by order, so an order is complete once the next one starts
+            current = None
+            async for row in stream_rows(query):
+                if current is None or current["id"] != row.id:
+                    if current is not None:
+                        yield ndjson_line(current)
+                    current = {column: row._mapping[column] for column in order_columns}
+                    current["items"] = []
+                if row.item_id is not None:
+                    current["items"].append({"id": row.item_id, **{column: row._mapping[column] for column in item_columns}})
+            if current is not None:
+                yield ndjson_line(current)
+
+        return StreamingResponse(
+            csv_rows() if format == "csv" else ndjson_rows(),
+            media_type=MEDIA_TYPES[format],
+            headers={"Content-Disposition": f'attachment; filename="orders.{format}"'},
+        )
+
+
+async def stream_rows(query):
+    # the request's session is closed once the response starts, the stream uses its own
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=ORDER_EXPORT_BATCH_SIZE))
+        async for row in result:
+            yield row
+
+
+"""
+Endpoint:       GET /admin/stats
+Function:       get_sales_stats
+Description:    Revenue and order counts per day and status, and per pizza and status over the range
+                (by default the last STATS_DEFAULT_DAYS days, both ends included).
+                Read from the daily_sales and daily_pizza_sales rollups, which are kept up to date as orders are
+                placed and change status, so the cost grows with the number of days and not of orders.
+"""
+
+
+@router.get("/stats", response_model=SalesStats)
+async def get_sales_stats(
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        status: Optional[OrderStatus] = None,
+        db: AsyncSession = Depends(get_async_db),
+        current_user: UserResponse = Depends(get_current_user)
+):
+    role_validator(allowed_roles=['admin'], current_user=current_user)
+
+    date_to = date_to or datetime.utcnow().date()
+    date_from = date_from or date_to - timedelta(days=STATS_DEFAULT_DAYS - 1)
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from is after date_to")
+
+    days_query = (
+        select(DailySales.day, DailySales.status, DailySales.order_count, DailySales.revenue)
+        .where(DailySales.day.between(date_from, date_to), DailySales.order_count > 0)
+        .order_by(DailySales.day, DailySales.status)
+    )
+    order_count = func.sum(DailyPizzaSales.order_count)
+    revenue = func.sum(DailyPizzaSales.revenue)
+    pizzas_query = (
+        select(
+            DailyPizzaSales.pizza_id,
+            DailyPizzaSales.status,
+            order_count.label("order_count"),
+            func.sum(DailyPizzaSales.quantity).label("quantity"),
+            revenue.label("revenue"),
+        )
+        .where(DailyPizzaSales.day.between(date_from, date_to))
+        .group_by(DailyPizzaSales.pizza_id, DailyPizzaSales.status)
+        .having(order_count > 0)
+        .order_by(revenue.desc(), DailyPizzaSales.pizza_id)
+    )
+    if status is not None:
+        days_query = days_query.where(DailySales.status == status)
+        pizzas_query = pizzas_query.where(DailyPizzaSales.status == status)
+
+    return {
+        "date_from": date_from,
+        "date_to": date_to,
+        "days": [row._asdict() for row in (await db.execute(days_query)).all()],
+        "pizzas": [row._asdict() for row in (await db.execute(pizzas_query)).all()],
+    }
+
+
 """
 Endpoint:       PUT /admin/order/{order_id}/status
 Function:       update_order_status
 Description:    Finds the order, if exist, update the status given by admin user
                 If the current_status and status_to_update are same, it displays current status.         
+                Only changes allowed by ORDER_TRANSITIONS are made and, when `version` is sent, only if the
+                order was not changed since (409 otherwise).
 """
 
 
-@router.put("/orders/{order_id}/status")
-def update_order_status(
+@router.put("/orders/{order_id}/status", response_model=Union[OrderSummary, list[str]])
+async def update_order_status(
         order_id: int,
         order_update: OrderUpdate,
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db),
+        current_user: UserResponse = Depends(get_current_user)
 ):
-    if role_validator(allowed_roles=['customer'], current_user=current_user):
-        # Find the order to update
-        order = db.query(ModelOrder).filter(ModelOrder.id == order_id).first()
-        if not order:
-            raise HTTPException(status_code=404, detail="Order not found")
-
-        # Update the order status
-        order.status = order_update.status
-        db.commit()
-        db.refresh(order)
+    if role_validator(allowed_roles=['admin'], current_user=current_user):
+        try:
+            order, prev_status = await transition_order(
+                db, order_id, order_update.status, expected_version=order_update.version
+            )
+        except SameStatus as same:
+            return [f"The current status is {same.status}"]
+
+        await db.commit()
+        await publish_order_event("order.status_changed", order.id, order.user_id, order.status, prev_status)
         return order
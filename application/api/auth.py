@@ -1,22 +1,17 @@
 # application/api/auth.py
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from passlib.context import CryptContext
-from database.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.database import get_async_db
 from models.user import User
-from schema.auth import UserCreate, UserResponse, UserLogin
+from schema.auth import Token, UserCreate, UserResponse, UserLogin
 from fastapi.security.oauth2 import OAuth2PasswordRequestForm
-from utils.util_functions import create_access_token, get_current_user
+from utils.util_functions import create_access_token, get_current_user, principal_claims
+from utils.passwords import hash_password, verify_password
 
 router = APIRouter()
 
-# password hashing
-pwd_context = CryptContext(
-    schemes=["bcrypt"],
-    deprecated="auto",
-)
-
 """
 Endpoint:       POST /users/signup
 Function:       create_user
@@ -25,9 +20,9 @@ Description:    Creates the user with user credentials like username, email, pas
 
 
 @router.post("/signup", response_model=UserResponse)
-def create_user(user: UserCreate, db: Session = Depends(get_db)):
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     # check if user already exist
-    existing_user = db.query(User).filter(User.username == user.username).first()
+    existing_user = (await db.execute(select(User).where(User.username == user.username))).scalars().first()
 
     if existing_user:
         raise HTTPException(
@@ -35,15 +30,15 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
             detail="Email already registered"
         )
 
-    hashed_password = pwd_context.hash(user.password)
+    hashed_password = await hash_password(user.password)
     db_user = User(email=user.email, username=user.username, hashed_password=hashed_password, role=user.role)
 
     try:
         db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        await db.refresh(db_user)
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=500,
             detail="Internal server Error:" + str(e)
@@ -59,14 +54,23 @@ Description:    Creates the user login form using OAuth2 authentication and gene
 """
 
 
-@router.post("/login")
-def login(user: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.username == user.username).first()
-    if not db_user or not pwd_context.verify(user.password, db_user.hashed_password):
+@router.post("/login", response_model=Token)
+async def login(user: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    db_user = (await db.execute(select(User).where(User.username == user.username))).scalars().first()
+    if not db_user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid Credentials")
+
+    is_valid, new_hash = await verify_password(user.password, db_user.hashed_password)
+    if not is_valid:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid Credentials")
 
+    # the bcrypt cost changed since this hash was made, store the rehashed password
+    if new_hash:
+        db_user.hashed_password = new_hash
+        await db.commit()
+
     access_token = create_access_token(
-        data={"sub": db_user.username}
+        data={"sub": db_user.username, **principal_claims(db_user)}
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -1,16 +1,25 @@
 # application/api/customer.py
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from schema.cart import CartItem, CartItemCreate, CartItemUpdate, Cart
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, func, insert, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from schema.cart import CartItem, CartItemCreate, CartItemUpdate, Cart, CartSummary
 from schema.pizza import PizzaResponse
-from schema.order import OrderCreate, Order, OrderItem
+from schema.order import OrderCreate, Order, OrderItem, OrderPage
 from utils.util_functions import get_current_user
+from utils.menu_cache import menu_cache
+from utils.events import event_stream, publish_order_event, user_channel
+from utils.sales_rollups import record_new_order
+from utils.pagination import ORDERS_MAX_PAGE_SIZE, ORDERS_PAGE_SIZE, order_page
 from schema.auth import UserResponse
-from database.database import get_db
+from database.database import get_async_db
+from database.dialect import upsert_insert
 from models.pizza import Pizza
 from models.cart import CartItem as ModelCartItem
-from models.order import OrderItem as ModelOrderItem, Order as ModelOrder
+from models.order import OrderItem as ModelOrderItem, Order as ModelOrder, OrderStatus
 
 
 router = APIRouter()
@@ -19,16 +28,80 @@ router = APIRouter()
 Endpoint:       GET /customer/pizzas
 Function:       get_pizzas
 Description:    List all the pizzas created and updated by Admin user              
+                The menu is served pre-serialized from the menu cache, with ETag / Last-Modified,
+                a matching If-None-Match (or If-Modified-Since) is answered with 304.
 """
 
 
 @router.get("/pizzas", response_model=list[PizzaResponse])
-def get_pizzas(
-        db: Session = Depends(get_db),
+async def get_pizzas(
+        request: Request,
+        db: AsyncSession = Depends(get_async_db),
         current_user: UserResponse = Depends(get_current_user),
 ):
-    pizzas = db.query(Pizza).filter(Pizza.is_available == True).all()
-    return pizzas
+    menu = await menu_cache.get(db)
+    return menu.response(request)
+
+
+"""
+Function:       upsert_cart_items
+Description:    Adds the given quantity of each pizza to the user's cart in a single
+                INSERT ... ON CONFLICT (user_id, pizza_id) DO UPDATE SET quantity = quantity + excluded.quantity
+                ... RETURNING statement, so concurrent adds of the same pizza never create duplicate rows.
+                Databases without ON CONFLICT fall back to select + update / insert.
+"""
+
+
+async def upsert_cart_items(db: AsyncSession, user_id: int, quantities: dict) -> list:
+    insert_ = upsert_insert(db)
+
+    if insert_ is None:
+        cart_items = []
+        for pizza_id, quantity in quantities.items():
+            cart_item = (await db.execute(select(ModelCartItem).where(
+                ModelCartItem.user_id == user_id,
+                ModelCartItem.pizza_id == pizza_id
+            ))).scalars().first()
+            if cart_item:
+                cart_item.quantity += quantity
+            else:
+                cart_item = ModelCartItem(user_id=user_id, pizza_id=pizza_id, quantity=quantity)
+                db.add(cart_item)
+            cart_items.append(cart_item)
+        await db.commit()
+        return cart_items
+
+    statement = insert_(ModelCartItem).values([
+        {"user_id": user_id, "pizza_id": pizza_id, "quantity": quantity}
+        for pizza_id, quantity in quantities.items()
+    ])
+    statement = statement.on_conflict_do_update(
+        index_elements=[ModelCartItem.user_id, ModelCartItem.pizza_id],
+        set_={"quantity": ModelCartItem.quantity + statement.excluded.quantity},
+    ).returning(ModelCartItem)
+
+    cart_items = (await db.scalars(
+        statement,
+        execution_options={"populate_existing": True}
+    )).all()
+    await db.commit()
+    return cart_items
+
+
+"""
+Function:       check_pizzas_exist
+Description:    Raises 404 naming every pizza id that is not on the menu, checked against the menu cache.
+"""
+
+
+async def check_pizzas_exist(db: AsyncSession, pizza_ids) -> None:
+    menu = await menu_cache.get(db)
+    missing = sorted(pizza_id for pizza_id in set(pizza_ids) if menu.get(pizza_id) is None)
+    if missing:
+        raise HTTPException(
+            status_code=404,
+            detail="Pizza not found" if len(missing) == 1 else f"Pizzas with ids {missing} not found"
+        )
 
 
 """
@@ -37,48 +110,47 @@ Function:       add_to_cart
 Description:    It adds the pizza into the cart,           
                 If that pizza is already there, it updates the quantity,
                 If cart does not exist, it creates new one.
+                The pizza is looked up in the menu cache, the cart row is written with one upsert.
 """
 
 
 @router.post("/cart", response_model=CartItem)
-def add_to_cart(
+async def add_to_cart(
         cart_item: CartItemCreate,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_async_db),
         current_user: UserResponse = Depends(get_current_user)
 ):
     # Check if pizza exist
-    db_pizza = db.query(Pizza).filter(Pizza.id == cart_item.pizza_id).first()
-    if not db_pizza:
-        raise HTTPException(
-            status_code=404,
-            detail="Pizza not found"
-        )
+    await check_pizzas_exist(db, [cart_item.pizza_id])
 
-    # Check if the cart already exist for the user
-    user_cart = db.query(ModelCartItem).filter(
-        ModelCartItem.user_id == current_user.id,
-        ModelCartItem.pizza_id == cart_item.pizza_id
-    ).first()
-
-    if user_cart:
-        # update the quantity
-        user_cart.quantity += cart_item.quantity
-        db.commit()
-        db.refresh(user_cart)
-        return user_cart
-
-    else:
-        # create a new cart
-        new_item = ModelCartItem(
-            user_id=current_user.id,
-            pizza_id=cart_item.pizza_id,
-            quantity=cart_item.quantity
-        )
-        db.add(new_item)
-        db.commit()
-        db.refresh(new_item)
+    cart_items = await upsert_cart_items(db, current_user.id, {cart_item.pizza_id: cart_item.quantity})
+    return cart_items[0]
+
+
+"""
+Endpoint:       POST /customer/cart/batch
+Function:       add_many_to_cart
+Description:    Adds several pizzas to the cart in one call and one statement,
+                repeated pizza ids in the request are added up.
+"""
+
+
+@router.post("/cart/batch", response_model=list[CartItem])
+async def add_many_to_cart(
+        cart_items: list[CartItemCreate],
+        db: AsyncSession = Depends(get_async_db),
+        current_user: UserResponse = Depends(get_current_user)
+):
+    if not cart_items:
+        raise HTTPException(status_code=400, detail="No items to add")
 
-        return new_item
+    await check_pizzas_exist(db, [item.pizza_id for item in cart_items])
+
+    quantities = {}
+    for item in cart_items:
+        quantities[item.pizza_id] = quantities.get(item.pizza_id, 0) + item.quantity
+
+    return await upsert_cart_items(db, current_user.id, quantities)
 
 
 """
@@ -90,16 +162,16 @@ Description:    It finds the item to update in cart,
 
 
 @router.put("/cart/{item_id}", response_model=CartItem)
-def update_cart(
+async def update_cart(
         item_id: int,
         cart_item_update: CartItemUpdate,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_async_db),
         current_user: UserResponse = Depends(get_current_user)
 ):
     # Find the cart item to update
-    item_to_update = db.query(ModelCartItem).filter(
+    item_to_update = (await db.execute(select(ModelCartItem).where(
         ModelCartItem.id == item_id, ModelCartItem.user_id == current_user.id
-    ).first()
+    ))).scalars().first()
 
     if not item_to_update:
         raise HTTPException(
@@ -109,8 +181,8 @@ def update_cart(
 
     # Update the quantity
     item_to_update.quantity = cart_item_update.quantity
-    db.commit()
-    db.refresh(item_to_update)
+    # the session keeps the loaded values after commit, no refresh query needed
+    await db.commit()
 
     return item_to_update
 
@@ -123,23 +195,60 @@ Description:    It displays the cart for the current logged in user, if exist.
 
 
 @router.get("/cart", response_model=Cart)
-def view_cart(
-        db: Session = Depends(get_db),
+async def view_cart(
+        db: AsyncSession = Depends(get_async_db),
         current_user: UserResponse = Depends(get_current_user)
 ):
-    # Retrieve the user's cart items
-    cart_items = list(db.query(ModelCartItem).filter(ModelCartItem.user_id == current_user.id).all())
-    if not cart_items:
+    # Retrieve the user's cart items along with the pizza prices, in one query of plain rows
+    rows = (await db.execute(
+        select(
+            ModelCartItem.id,
+            ModelCartItem.user_id,
+            ModelCartItem.pizza_id,
+            ModelCartItem.quantity,
+            Pizza.price,
+        )
+        .outerjoin(Pizza, Pizza.id == ModelCartItem.pizza_id)
+        .where(ModelCartItem.user_id == current_user.id)
+        .order_by(ModelCartItem.id)
+    )).all()
+    if not rows:
         raise HTTPException(status_code=404, detail="Cart not found")
 
     # Calculate the total price
-    total = sum(item.quantity * item.pizza.price for item in cart_items)
+    total = sum(row.quantity * (row.price or 0) for row in rows)
     return {
-        "items": cart_items,
+        "items": [row._mapping for row in rows],
         "total": total
     }
 
 
+"""
+Endpoint:       GET /customer/cart/summary
+Function:       view_cart_summary
+Description:    Number of pizzas in the current user's cart and the cart total, for the header badge.
+                Both are computed by the database in a single aggregate query.
+"""
+
+
+@router.get("/cart/summary", response_model=CartSummary)
+async def view_cart_summary(
+        db: AsyncSession = Depends(get_async_db),
+        current_user: UserResponse = Depends(get_current_user)
+):
+    item_count, total = (await db.execute(
+        select(
+            func.coalesce(func.sum(ModelCartItem.quantity), 0),
+            func.coalesce(func.sum(ModelCartItem.quantity * Pizza.price), 0),
+        )
+        .select_from(ModelCartItem)
+        .outerjoin(Pizza, Pizza.id == ModelCartItem.pizza_id)
+        .where(ModelCartItem.user_id == current_user.id)
+    )).one()
+
+    return CartSummary(item_count=item_count, total=total)
+
+
 """
 Endpoint:       DELETE /customer/cart/{item_id}
 Function:       delete_cart_item
@@ -148,17 +257,17 @@ Description:    It finds the cart item from given id,
 """
 
 
-@router.delete("/cart/{item_id}")
-def delete_cart_item(
+@router.delete("/cart/{item_id}", response_model=list[str])
+async def delete_cart_item(
         item_id: int,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_async_db),
         current_user: UserResponse = Depends(get_current_user)
 ):
     # Find the cart item to delete
-    item_to_delete = db.query(ModelCartItem).filter(
+    item_to_delete = (await db.execute(select(ModelCartItem).where(
         ModelCartItem.id == item_id,
         ModelCartItem.user_id == current_user.id
-    ).first()
+    ))).scalars().first()
 
     if not item_to_delete:
         raise HTTPException(
@@ -166,9 +275,9 @@ def delete_cart_item(
             detail="Item not found"
         )
 
-    db.delete(item_to_delete)
-    db.commit()
-    return {"Item got deleted"}
+    await db.delete(item_to_delete)
+    await db.commit()
+    return ["Item got deleted"]
 
 
 """
@@ -177,79 +286,249 @@ Function:       create_order
 Description:    It gets all the item from order_create request json,
                 validate all items(pizzas) are available or exist,
                 then calculate the total price of all the pizzas in order.          
+                All pizzas are read with one IN query, missing and unavailable pizzas are
+                reported together, and the order items are inserted with one bulk statement.
 """
 
 
-@router.post("/orders")
-def create_order(
+@router.post("/orders", response_model=Order)
+async def create_order(
         order_create: OrderCreate,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_async_db),
         current_user: UserResponse = Depends(get_current_user)
 ):
-    # Calculate total amount and validate pizzas
-    total_amount = 0
-    order_items = []
-
-    for item in order_create.items:
-        # Check if the pizza exists
-        db_pizza = db.query(Pizza).filter(Pizza.id == item.pizza_id).first()
-        if not db_pizza:
-            raise HTTPException(
-                status_code=404,
-                detail=f"Pizza with id {item.pizza_id} not found"
-            )
-
-        # Calculate the total amount
-        total_amount += db_pizza.price * item.quantity
+    # Fetch every referenced pizza at once
+    pizza_ids = {item.pizza_id for item in order_create.items}
+    pizzas = {
+        pizza.id: pizza
+        for pizza in (await db.execute(
+            select(Pizza.id, Pizza.price, Pizza.is_available).where(Pizza.id.in_(pizza_ids))
+        )).all()
+    }
 
-        # Create order item
-        order_item = ModelOrderItem(
-            pizza_id=item.pizza_id,
-            quantity=item.quantity,
-            unit_price=db_pizza.price
+    # Validate all pizzas before failing, so the client sees every problem at once
+    missing = sorted(pizza_id for pizza_id in pizza_ids if pizza_id not in pizzas)
+    unavailable = sorted(pizza_id for pizza_id in pizza_ids if pizza_id in pizzas and not pizzas[pizza_id].is_available)
+    if missing or unavailable:
+        raise HTTPException(
+            status_code=404 if missing else 400,
+            detail={
+                "message": "Some pizzas in the order can not be ordered",
+                "missing_pizza_ids": missing,
+                "unavailable_pizza_ids": unavailable,
+            }
         )
-        order_items.append(order_item)
 
-    # Create the order
+    # Calculate total amount and the order item rows
+    total_amount = sum(pizzas[item.pizza_id].price * item.quantity for item in order_create.items)
+    order_item_rows = [
+        {
+            "pizza_id": item.pizza_id,
+            "quantity": item.quantity,
+            "unit_price": pizzas[item.pizza_id].price,
+        }
+        for item in order_create.items
+    ]
+
+    # Create the order and its items in one transaction
     new_order = ModelOrder(
         user_id=current_user.id,
         total_amount=total_amount,
-        order_items=order_items  # This will create the relationship
     )
 
-    # Query the items in the order
-    # items_in_order = db.query(ModelOrderItem).filter(
-    #     ModelOrderItem.order_id == new_order.id
-    # ).all()
+    try:
+        db.add(new_order)
+        await db.flush()
+
+        order_items = []
+        if order_item_rows:
+            for row in order_item_rows:
+                row["order_id"] = new_order.id
+            order_items = (await db.scalars(
+                insert(ModelOrderItem).returning(ModelOrderItem),
+                order_item_rows
+            )).all()
+
+        await record_new_order(db, new_order)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=500,
+            detail="Internal server Error:" + str(e)
+        )
 
-    db.add(new_order)
-    db.commit()
-    db.refresh(new_order)
-    return {
-        "user_id": current_user.id,
-        "total_amount": total_amount,
-        "created_at": new_order.created_at,
-        "updated_at": new_order.updated_at,
-        "status": new_order.status,
-        "items": new_order.order_items
-    }
+    await publish_order_event("order.created", new_order.id, current_user.id, new_order.status)
+
+    return Order(
+        id=new_order.id,
+        user_id=current_user.id,
+        total_amount=total_amount,
+        status=new_order.status,
+        version=new_order.version,
+        created_at=new_order.created_at,
+        updated_at=new_order.updated_at,
+        items=[OrderItem.model_validate(item) for item in order_items],
+    )
+
+
+"""
+Endpoint:       POST /customer/cart/checkout
+Function:       checkout
+Description:    Turns the current user's cart into an order in one short transaction, without a per-item loop:
+                the order row, then its items with INSERT ... SELECT from the cart joined with the pizza prices
+                at checkout time, then the total from those items, and finally the ordered quantities are taken
+                out of the cart, removing the lines with nothing left.
+                Pizzas that are no longer available stay in the cart.
+                The cart lines are locked while they are read (FOR UPDATE on PostgreSQL, SQLite serializes
+                writers), so a second checkout of the same cart waits for the first and finds it emptied.
+"""
+
+
+def orderable_cart(user_id: int):
+    return (
+        select(ModelCartItem.pizza_id, ModelCartItem.quantity, Pizza.price)
+        .join(Pizza, Pizza.id == ModelCartItem.pizza_id)
+        .where(ModelCartItem.user_id == user_id, Pizza.is_available == True)
+        # the prices are only read, admins can still change them
+        .with_for_update(of=ModelCartItem)
+    )
+
+
+@router.post("/cart/checkout", response_model=Order)
+async def checkout(
+        db: AsyncSession = Depends(get_async_db),
+        current_user: UserResponse = Depends(get_current_user)
+):
+    try:
+        new_order = (await db.scalars(
+            insert(ModelOrder)
+            .values(user_id=current_user.id, total_amount=0)
+            .returning(ModelOrder)
+        )).one()
+
+        cart_lines = orderable_cart(current_user.id).subquery()
+        order_items = (await db.scalars(
+            insert(ModelOrderItem)
+            .from_select(
+                ["order_id", "pizza_id", "quantity", "unit_price"],
+                select(literal(new_order.id), cart_lines.c.pizza_id, cart_lines.c.quantity, cart_lines.c.price)
+            )
+            .returning(ModelOrderItem)
+        )).all()
+
+        if not order_items:
+            await db.rollback()
+            raise HTTPException(status_code=400, detail="Cart is empty")
+
+        # the total comes from the inserted items, so it always matches them
+        new_order = (await db.scalars(
+            update(ModelOrder)
+            .where(ModelOrder.id == new_order.id)
+            .values(total_amount=(
+                select(func.sum(ModelOrderItem.quantity * ModelOrderItem.unit_price))
+                .where(ModelOrderItem.order_id == new_order.id)
+                .scalar_subquery()
+            ))
+            .returning(ModelOrder),
+            execution_options={"populate_existing": True}
+        )).one()
+        await record_new_order(db, new_order)
+
+        # take the ordered quantities out of the cart, from the lines as they are now: what a concurrent
+        # add_to_cart added meanwhile stays in the cart, and lines with nothing left are removed
+        ordered = (
+            select(ModelOrderItem.quantity)
+            .where(ModelOrderItem.order_id == new_order.id, ModelOrderItem.pizza_id == ModelCartItem.pizza_id)
+            .scalar_subquery()
+        )
+        await db.execute(
+            update(ModelCartItem)
+            .where(
+                ModelCartItem.user_id == current_user.id,
+                ModelCartItem.pizza_id.in_(
+                    select(ModelOrderItem.pizza_id).where(ModelOrderItem.order_id == new_order.id)
+                ),
+            )
+            .values(quantity=ModelCartItem.quantity - ordered)
+            .execution_options(synchronize_session=False)
+        )
+        await db.execute(
+            delete(ModelCartItem)
+            .where(ModelCartItem.user_id == current_user.id, ModelCartItem.quantity <= 0)
+            .execution_options(synchronize_session=False)
+        )
+
+        await db.commit()
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=500,
+            detail="Internal server Error:" + str(e)
+        )
+
+    await publish_order_event("order.created", new_order.id, current_user.id, new_order.status)
+
+    return Order(
+        id=new_order.id,
+        user_id=new_order.user_id,
+        total_amount=new_order.total_amount,
+        status=new_order.status,
+        version=new_order.version,
+        created_at=new_order.created_at,
+        updated_at=new_order.updated_at,
+        items=[OrderItem.model_validate(item) for item in order_items],
+    )
+
+
+"""
+Endpoint:       GET /customer/orders/events
+Function:       order_events
+Description:    Server-Sent Events stream of the current user's orders being placed and changing status,
+                instead of polling GET /customer/orders.
+"""
+
+
+@router.get("/orders/events")
+async def order_events(
+        request: Request,
+        current_user: UserResponse = Depends(get_current_user)
+):
+    return StreamingResponse(
+        event_stream(request, user_channel(current_user.id)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 """
 Endpoint:       GET /customer/orders
 Function:       get_orders
 Description:    It displays all the orders current_logged_in_user made.         
+                Orders come newest first in pages of `limit`, pass the returned next_cursor
+                to get the next page. They can be filtered by status and created_at range.
 """
 
 
-@router.get("/orders")
-def get_orders(
-        db: Session = Depends(get_db),
+@router.get("/orders", response_model=OrderPage)
+async def get_orders(
+        limit: int = Query(ORDERS_PAGE_SIZE, ge=1, le=ORDERS_MAX_PAGE_SIZE),
+        cursor: Optional[str] = None,
+        status: Optional[OrderStatus] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        db: AsyncSession = Depends(get_async_db),
         current_user: UserResponse = Depends(get_current_user)
 ):
-    # Retrieve all orders for the current user
-    orders = db.query(ModelOrder).filter(ModelOrder.user_id == current_user.id).all()
-    if not orders:
-        raise HTTPException(status_code=404, detail="No orders found for this user")
-
-    return orders
+    # Retrieve a page of orders for the current user
+    return await order_page(
+        db,
+        limit=limit,
+        cursor=cursor,
+        user_id=current_user.id,
+        status=status,
+        created_from=created_from,
+        created_to=created_to,
+    )
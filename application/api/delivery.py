@@ -1,50 +1,102 @@
 # application/api/delivery.py
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from utils.util_functions import get_current_user
+import os
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from utils.util_functions import get_current_user, role_validator
+from utils.dispatch import claim_order, ready_orders
+from utils.order_status import SameStatus, transition_order
 from schema.auth import UserResponse
-from schema.order import Order
+from schema.order import Order, OrderClaim
 from schema.delivery import DeliveryStatusUpdate, DeliveryComment, DeliveryCommentCreate
 from models.order import Order as ModelOrder
 from models.delivery import DeliveryComment as ModelDeliveryComment
-from database.database import get_db
+from database.database import get_async_db
+from utils.events import publish_order_event
 
 router = APIRouter()
 
+DISPATCH_QUEUE_SIZE = int(os.getenv("DISPATCH_QUEUE_SIZE", "50"))
+
+"""
+Endpoint:       GET /delivery/queue
+Function:       get_dispatch_queue
+Description:    Orders ready for pickup that no delivery partner has claimed yet, oldest first.
+"""
+
+
+@router.get("/queue", response_model=List[Order])
+async def get_dispatch_queue(
+        limit: int = Query(DISPATCH_QUEUE_SIZE, ge=1, le=DISPATCH_QUEUE_SIZE),
+        db: AsyncSession = Depends(get_async_db),
+        current_user: UserResponse = Depends(get_current_user)
+):
+    if role_validator(allowed_roles=['delivery_partner'], current_user=current_user):
+        return await ready_orders(db, limit)
+
+
+"""
+Endpoint:       POST /delivery/queue/claim
+Function:       claim_from_queue
+Description:    Assigns an order from the dispatch queue to the current delivery partner, the requested one
+                or else the oldest. Only one of several partners claiming at the same time gets a given order.
+"""
+
+
+@router.post("/queue/claim", response_model=Order)
+async def claim_from_queue(
+        claim: Optional[OrderClaim] = None,
+        db: AsyncSession = Depends(get_async_db),
+        current_user: UserResponse = Depends(get_current_user)
+):
+    role_validator(allowed_roles=['delivery_partner'], current_user=current_user)
+    order_id = claim.order_id if claim else None
+
+    order = await claim_order(db, current_user.id, order_id)
+    if order is None:
+        if order_id is None:
+            raise HTTPException(status_code=404, detail="No orders ready for pickup")
+        raise HTTPException(status_code=409, detail=f"Order {order_id} is not available for pickup")
+
+    await publish_order_event("order.assigned", order.id, order.user_id, order.status)
+    return order
+
+
 """
 Endpoint:       PUT /delivery/deliveries/{order_id}/status
 Function:       update_delivery_status
 Description:    Validate the order form request json, 
                 if present, it updates the status from old status to status given by delivery_person.
                 Also if the current_status is same as new_status, it shows current_status.              
+                Only the delivery partner the order is assigned to can update it, only along ORDER_TRANSITIONS
+                and, when `version` is sent, only if the order was not changed since (409 otherwise).
 """
 
 
-@router.put("/deliveries/{order_id}/status")
-def update_delivery_status(
+@router.put("/deliveries/{order_id}/status", response_model=list[str])
+async def update_delivery_status(
         order_id: int,
         status_update: DeliveryStatusUpdate,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_async_db),
         current_user: UserResponse = Depends(get_current_user)
 ):
-    # Find the order to update
-    order = db.query(ModelOrder).filter(ModelOrder.id == order_id).first()
-    prev_status = order.status
-
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
-
-    # return if the current and status to update is same
-    if prev_status == status_update.status:
-        return {f"The current status is {prev_status}"}
+    try:
+        order, prev_status = await transition_order(
+            db,
+            order_id,
+            status_update.status,
+            expected_version=status_update.version,
+            assigned_to=current_user.id,
+        )
+    except SameStatus as same:
+        # return if the current and status to update is same
+        return [f"The current status is {same.status}"]
 
-    # Update the delivery status
-    order.status = status_update.status
-    db.commit()
-    db.refresh(order)
+    await db.commit()
+    await publish_order_event("order.status_changed", order.id, order.user_id, order.status, prev_status)
 
-    return {f"Order status for order {order_id} updated from {prev_status} to {status_update.status}"}
+    return [f"Order status for order {order_id} updated from {prev_status} to {status_update.status}"]
 
 
 """
@@ -54,16 +106,15 @@ Description:    The delivery person can add the comment to the order using this
 """
 
 
-# @router.post("/deliveries/{order_id}/comments", response_model=ModelDeliveryComment)
-@router.post("/deliveries/{order_id}/comments")
-def add_delivery_comment(
+@router.post("/deliveries/{order_id}/comments", response_model=DeliveryComment)
+async def add_delivery_comment(
         order_id: int,
         comment_create: DeliveryCommentCreate,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_async_db),
         current_user: UserResponse = Depends(get_current_user)
 ):
     # Find the order
-    order = db.query(ModelOrder).filter(ModelOrder.id == order_id).first()
+    order = await db.get(ModelOrder, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
 
@@ -75,7 +126,7 @@ def add_delivery_comment(
     )
 
     db.add(new_comment)
-    db.commit()
-    db.refresh(new_comment)
+    await db.commit()
+    await db.refresh(new_comment)
 
     return new_comment
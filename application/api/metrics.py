@@ -0,0 +1,19 @@
+# application/api/metrics.py
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from utils.metrics import registry
+
+router = APIRouter()
+
+"""
+Endpoint:       GET /metrics
+Function:       get_metrics
+Description:    Request latency, queries per request and database time per route in the Prometheus text format,
+                for scraping. Not authenticated, expose it only on an internal network.
+"""
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,151 @@
+# application/database/config.py
+
+import os
+from dataclasses import dataclass, asdict
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+"""
+Class:          EngineSettings
+Description:    Connection pool and SQLite tuning for the sync and async engines, read from the environment.
+                Pool settings apply to file and server databases, pragmas apply to SQLite only.
+"""
+
+
+@dataclass(frozen=True)
+class EngineSettings:
+    database_url: str
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: int = 30
+    pool_recycle: int = 1800
+    pool_pre_ping: bool = True
+    echo: bool = False
+
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout: int = 5000
+    sqlite_cache_size: int = -64000
+    sqlite_mmap_size: int = 268435456
+
+    @classmethod
+    def from_env(cls, database_url: Optional[str] = None) -> "EngineSettings":
+        return cls(
+            database_url=database_url or os.getenv("DATABASE_URL"),
+            pool_size=_env_int("DB_POOL_SIZE", cls.pool_size),
+            max_overflow=_env_int("DB_MAX_OVERFLOW", cls.max_overflow),
+            pool_timeout=_env_int("DB_POOL_TIMEOUT", cls.pool_timeout),
+            pool_recycle=_env_int("DB_POOL_RECYCLE", cls.pool_recycle),
+            pool_pre_ping=_env_bool("DB_POOL_PRE_PING", cls.pool_pre_ping),
+            echo=_env_bool("DB_ECHO", cls.echo),
+            sqlite_journal_mode=os.getenv("SQLITE_JOURNAL_MODE", cls.sqlite_journal_mode),
+            sqlite_synchronous=os.getenv("SQLITE_SYNCHRONOUS", cls.sqlite_synchronous),
+            sqlite_busy_timeout=_env_int("SQLITE_BUSY_TIMEOUT", cls.sqlite_busy_timeout),
+            sqlite_cache_size=_env_int("SQLITE_CACHE_SIZE", cls.sqlite_cache_size),
+            sqlite_mmap_size=_env_int("SQLITE_MMAP_SIZE", cls.sqlite_mmap_size),
+        )
+
+    @property
+    def is_sqlite(self) -> bool:
+        return make_url(self.database_url).get_backend_name() == "sqlite"
+
+    @property
+    def is_memory(self) -> bool:
+        url = make_url(self.database_url)
+        return self.is_sqlite and url.database in (None, "", ":memory:")
+
+    """
+    Function:       engine_kwargs
+    Description:    Keyword arguments for create_engine / create_async_engine.
+                    In-memory SQLite keeps the dialect's default single connection pool, every other
+                    database gets a sized queue pool so connections (and their pragmas) are reused.
+    """
+
+    def engine_kwargs(self, is_async: bool = False) -> dict:
+        kwargs = {"echo": self.echo}
+
+        if self.is_sqlite:
+            kwargs["connect_args"] = {
+                "check_same_thread": False,
+                "timeout": self.sqlite_busy_timeout / 1000,
+            }
+            if self.is_memory:
+                return kwargs
+            kwargs["poolclass"] = AsyncAdaptedQueuePool if is_async else QueuePool
+        else:
+            kwargs["pool_pre_ping"] = self.pool_pre_ping
+
+        kwargs.update(
+            pool_size=self.pool_size,
+            max_overflow=self.max_overflow,
+            pool_timeout=self.pool_timeout,
+            pool_recycle=self.pool_recycle,
+        )
+        return kwargs
+
+    def sqlite_pragmas(self) -> dict:
+        pragmas = {
+            "synchronous": self.sqlite_synchronous,
+            "busy_timeout": self.sqlite_busy_timeout,
+            "cache_size": self.sqlite_cache_size,
+            "mmap_size": self.sqlite_mmap_size,
+        }
+        if not self.is_memory:
+            pragmas = {"journal_mode": self.sqlite_journal_mode, **pragmas}
+        return pragmas
+
+    """
+    Function:       describe
+    Description:    Active settings, with the password hidden, for logging at startup.
+    """
+
+    def describe(self) -> dict:
+        settings = asdict(self)
+        settings["database_url"] = make_url(self.database_url).render_as_string(hide_password=True)
+        if self.is_sqlite:
+            unused = ["pool_pre_ping"]
+            if self.is_memory:
+                unused += ["pool_size", "max_overflow", "pool_timeout", "pool_recycle", "sqlite_journal_mode"]
+        else:
+            unused = [key for key in settings if key.startswith("sqlite_")]
+        for key in unused:
+            settings.pop(key)
+        return settings
+
+
+"""
+Function:       install_sqlite_pragmas
+Description:    Registers a connect hook on the engine which applies the SQLite pragmas to every new connection.
+                For an AsyncEngine pass engine.sync_engine.
+"""
+
+
+def install_sqlite_pragmas(engine: Engine, settings: EngineSettings):
+    if not settings.is_sqlite:
+        return
+
+    pragmas = settings.sqlite_pragmas()
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
@@ -1,36 +1,161 @@
 # application/database/database.py
 
 import os
+from typing import Optional
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from database.config import EngineSettings, install_sqlite_pragmas
 
 
-# databse URL for sqlite database file
-DATABASE_URL = os.getenv("DATABASE_URL")
+# async drivers used when ASYNC_DATABASE_URL is not given explicitly
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
 
-# database engine, using database url
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={
-        "check_same_thread": False,
-    }
-)
 
-# generate a session
+"""
+Function:       to_async_url
+Description:    Converts a sync database url (sqlite:///, postgresql://) to the matching async driver url.
+                Urls which already name a driver are returned as they are.
+"""
+
+
+def to_async_url(database_url: str) -> str:
+    url = make_url(database_url)
+    if url.drivername in ASYNC_DRIVERS:
+        url = url.set(drivername=ASYNC_DRIVERS[url.drivername])
+    return url.render_as_string(hide_password=False)
+
+
+# pool and sqlite pragma settings, read from the environment when the engines are created
+engine_settings: Optional[EngineSettings] = None
+
+# database engines, created on first use (or at startup by the app's lifespan) rather than at import,
+# so that importing the models, a CLI or the tests does not need a database
+_engine: Optional[Engine] = None
+_async_engine: Optional[AsyncEngine] = None
+
+# urls given to configure(), DATABASE_URL and ASYNC_DATABASE_URL otherwise
+_database_url: Optional[str] = None
+_async_database_url: Optional[str] = None
+
+# generate a session, bound when the sync engine is created
 sessionLocal = sessionmaker(
     autocommit=False,
     autoflush=False,
-    bind=engine,
 )
 
+# generate an async session, bound when the async engine is created
+# objects stay loaded after commit, as lazy loading is not possible with AsyncSession
+AsyncSessionLocal = async_sessionmaker(
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+
+"""
+Function:       configure
+Description:    Sets the database the engines are created for, instead of DATABASE_URL / ASYNC_DATABASE_URL.
+                There is one pair of engines per process, so this has to happen before they are created.
+"""
+
+
+def configure(database_url: Optional[str] = None, async_database_url: Optional[str] = None):
+    global _database_url, _async_database_url
+    if (_engine is not None or _async_engine is not None) and (
+            (database_url and database_url != get_engine_settings().database_url)
+            or (async_database_url and async_database_url != _async_database_url)
+    ):
+        raise RuntimeError("The database engines were already created for another database")
+    _database_url = database_url or _database_url
+    _async_database_url = async_database_url or _async_database_url
+
+
+def get_engine_settings() -> EngineSettings:
+    global engine_settings
+    if engine_settings is None:
+        database_url = _database_url or os.getenv("DATABASE_URL")
+        if not database_url:
+            raise RuntimeError("DATABASE_URL is not set")
+        engine_settings = EngineSettings.from_env(database_url)
+    return engine_settings
+
+
+# database engine, using database url
+# kept for scripts (manage.py, test_db.py) and for comparing sync and async request handling under load
+def get_engine() -> Engine:
+    global _engine
+    if _engine is None:
+        settings = get_engine_settings()
+        _engine = create_engine(
+            settings.database_url,
+            **settings.engine_kwargs()
+        )
+        install_sqlite_pragmas(_engine, settings)
+        sessionLocal.configure(bind=_engine)
+    return _engine
+
+
+# async database engine, used by the api routers
+def get_async_engine() -> AsyncEngine:
+    global _async_engine
+    if _async_engine is None:
+        settings = get_engine_settings()
+        async_database_url = (
+            _async_database_url or os.getenv("ASYNC_DATABASE_URL") or to_async_url(settings.database_url)
+        )
+        _async_engine = create_async_engine(
+            async_database_url,
+            **settings.engine_kwargs(is_async=True)
+        )
+        install_sqlite_pragmas(_async_engine.sync_engine, settings)
+        AsyncSessionLocal.configure(bind=_async_engine)
+    return _async_engine
+
+
+"""
+Function:       dispose_engines
+Description:    Closes the pooled connections of both engines, at shutdown. The engines stay usable and open
+                new connections if they are used again.
+"""
+
+
+async def dispose_engines():
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    if _engine is not None:
+        _engine.dispose()
+
+
+def __getattr__(name: str):
+    # `from database.database import engine` still works, and creates the engine at that point
+    if name == "engine":
+        return get_engine()
+    if name == "async_engine":
+        return get_async_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 Base = declarative_base()
 
 
 # Dependency to get database session
 def get_db():
+    get_engine()
     db = sessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+# Dependency to get async database session
+async def get_async_db():
+    get_async_engine()
+    async with AsyncSessionLocal() as db:
+        yield db
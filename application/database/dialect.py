@@ -0,0 +1,29 @@
+# application/database/dialect.py
+
+import importlib
+from typing import Callable, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+# dialects with INSERT ... ON CONFLICT DO UPDATE ... RETURNING support, and the module of their insert()
+# imported on first use, the engine has loaded the dialect in use by then and the others are not needed
+UPSERT_INSERTS = {
+    "sqlite": "sqlalchemy.dialects.sqlite",
+    "postgresql": "sqlalchemy.dialects.postgresql",
+}
+
+
+def dialect_name(db: AsyncSession) -> str:
+    return db.bind.dialect.name
+
+
+"""
+Function:       upsert_insert
+Description:    The dialect specific insert() that has on_conflict_do_update, for the session's database.
+                Returns None for databases without it, callers then fall back to select + update / insert.
+"""
+
+
+def upsert_insert(db: AsyncSession) -> Optional[Callable]:
+    module = UPSERT_INSERTS.get(dialect_name(db))
+    return importlib.import_module(module).insert if module else None
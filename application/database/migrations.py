@@ -0,0 +1,233 @@
+# application/database/migrations.py
+
+import logging
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Iterator, List, Optional
+from sqlalchemy import Column, DateTime, Integer, String, Table, func, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+from database.database import Base
+
+
+logger = logging.getLogger("uvicorn.error")
+
+# one row per applied migration
+schema_migrations = Table(
+    "schema_migrations",
+    Base.metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime, default=datetime.utcnow, nullable=False),
+)
+
+# key of the PostgreSQL advisory lock held while the schema is set up or migrated
+SCHEMA_LOCK_ID = 72100901
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+
+"""
+Migrations
+Description:    Each migration brings an existing database up to the models as they were at that version.
+                They are written against plain DDL, not the models, so later model changes do not alter them.
+                Databases created from scratch get every table from create_all and are stamped instead.
+"""
+
+
+def _create_hot_path_indexes(conn: Connection):
+    for statement in (
+        "CREATE INDEX IF NOT EXISTS ix_cart_items_user_pizza ON cart_items (user_id, pizza_id)",
+        "CREATE INDEX IF NOT EXISTS ix_orders_user_created ON orders (user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_orders_created_id ON orders (created_at, id)",
+        "CREATE INDEX IF NOT EXISTS ix_orders_status ON orders (status)",
+        "CREATE INDEX IF NOT EXISTS ix_order_items_order_id ON order_items (order_id)",
+        "CREATE INDEX IF NOT EXISTS ix_delivery_comments_order_id ON delivery_comments (order_id)",
+    ):
+        conn.execute(text(statement))
+
+
+def _unique_cart_items(conn: Connection):
+    # merge duplicate cart rows into the oldest one before the unique index can be built
+    conn.execute(text(
+        "UPDATE cart_items SET quantity = ("
+        " SELECT SUM(duplicate.quantity) FROM cart_items AS duplicate"
+        " WHERE duplicate.user_id = cart_items.user_id AND duplicate.pizza_id = cart_items.pizza_id"
+        ") WHERE id IN (SELECT MIN(id) FROM cart_items GROUP BY user_id, pizza_id HAVING COUNT(*) > 1)"
+    ))
+    conn.execute(text(
+        "DELETE FROM cart_items WHERE id NOT IN (SELECT MIN(id) FROM cart_items GROUP BY user_id, pizza_id)"
+    ))
+    conn.execute(text("DROP INDEX IF EXISTS ix_cart_items_user_pizza"))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_cart_items_user_pizza ON cart_items (user_id, pizza_id)"
+    ))
+
+
+def _order_assignment(conn: Connection):
+    columns = {column["name"] for column in inspect(conn).get_columns("orders")}
+    if "assigned_to" not in columns:
+        conn.execute(text("ALTER TABLE orders ADD COLUMN assigned_to INTEGER REFERENCES users (id)"))
+    if "assigned_at" not in columns:
+        conn.execute(text("ALTER TABLE orders ADD COLUMN assigned_at TIMESTAMP"))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_orders_dispatch ON orders (status, assigned_to, created_at)"
+    ))
+
+
+def _order_version(conn: Connection):
+    columns = {column["name"] for column in inspect(conn).get_columns("orders")}
+    if "version" not in columns:
+        conn.execute(text("ALTER TABLE orders ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+
+
+def _idempotency_keys(conn: Connection):
+    body_type = "BYTEA" if conn.dialect.name == "postgresql" else "BLOB"
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS idempotency_keys ("
+        " key VARCHAR(64) NOT NULL PRIMARY KEY,"
+        " fingerprint VARCHAR(64) NOT NULL,"
+        " status_code INTEGER,"
+        " headers TEXT,"
+        f" body {body_type},"
+        " expires_at TIMESTAMP NOT NULL)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_idempotency_keys_expires_at ON idempotency_keys (expires_at)"
+    ))
+
+
+def _sales_rollups(conn: Connection):
+    # the same type as orders.status
+    status_type = "orderstatus" if conn.dialect.name == "postgresql" else "VARCHAR(16)"
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS daily_sales ("
+        " day DATE NOT NULL,"
+        f" status {status_type} NOT NULL,"
+        " order_count INTEGER NOT NULL,"
+        " revenue FLOAT NOT NULL,"
+        " PRIMARY KEY (day, status))"
+    ))
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS daily_pizza_sales ("
+        " day DATE NOT NULL,"
+        " pizza_id INTEGER NOT NULL,"
+        f" status {status_type} NOT NULL,"
+        " order_count INTEGER NOT NULL,"
+        " quantity INTEGER NOT NULL,"
+        " revenue FLOAT NOT NULL,"
+        " PRIMARY KEY (day, pizza_id, status))"
+    ))
+    logger.info("Sales rollups are empty, fill them with: python manage.py rebuild-rollups")
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "composite indexes for cart, order and delivery comment lookups", _create_hot_path_indexes),
+    Migration(2, "unique (user_id, pizza_id) on cart_items", _unique_cart_items),
+    Migration(3, "delivery assignment columns on orders", _order_assignment),
+    Migration(4, "version column on orders", _order_version),
+    Migration(5, "idempotency_keys table", _idempotency_keys),
+    Migration(6, "daily sales rollup tables", _sales_rollups),
+]
+
+HEAD = MIGRATIONS[-1].version
+
+
+def current_version(conn: Connection) -> int:
+    if not inspect(conn).has_table(schema_migrations.name):
+        return 0
+    return conn.execute(select(schema_migrations.c.version).order_by(schema_migrations.c.version.desc())).scalar() or 0
+
+
+def _record(conn: Connection, migration: Migration):
+    conn.execute(schema_migrations.insert().values(version=migration.version, description=migration.description))
+
+
+"""
+Function:       _lock_schema
+Description:    Called first in a transaction that changes the schema: every worker of a deployment runs
+                setup_schema when it starts, and only one at a time may look at and change the schema.
+                PostgreSQL takes a transaction level advisory lock, SQLite takes the write lock up front
+                (BEGIN IMMEDIATE, the driver has not started the transaction yet). Others wait for the lock
+                and then see the versions recorded before them as applied.
+"""
+
+
+def _lock_schema(conn: Connection):
+    if conn.dialect.name == "postgresql":
+        conn.execute(select(func.pg_advisory_xact_lock(SCHEMA_LOCK_ID)))
+    elif conn.dialect.name == "sqlite":
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+@contextmanager
+def _schema_transaction(engine: Engine) -> Iterator[Connection]:
+    with engine.begin() as conn:
+        _lock_schema(conn)
+        schema_migrations.create(conn, checkfirst=True)
+        yield conn
+
+
+"""
+Function:       upgrade
+Description:    Applies the migrations newer than the database, up to `target` (default: all of them).
+                Every migration runs in its own transaction together with its version row.
+"""
+
+
+def upgrade(engine: Engine, target: Optional[int] = None) -> List[Migration]:
+    target = HEAD if target is None else target
+
+    applied = []
+    for migration in MIGRATIONS:
+        with _schema_transaction(engine) as conn:
+            if migration.version <= current_version(conn) or migration.version > target:
+                continue
+            logger.info("Applying migration %s: %s", migration.version, migration.description)
+            migration.upgrade(conn)
+            _record(conn, migration)
+        applied.append(migration)
+    return applied
+
+
+"""
+Function:       stamp
+Description:    Marks every migration up to `target` as applied without running it.
+"""
+
+
+def stamp(engine: Engine, target: Optional[int] = None):
+    with _schema_transaction(engine) as conn:
+        _stamp(conn, HEAD if target is None else target)
+
+
+def _stamp(conn: Connection, target: int):
+    version = current_version(conn)
+    for migration in MIGRATIONS:
+        if version < migration.version <= target:
+            _record(conn, migration)
+
+
+"""
+Function:       setup_schema
+Description:    Used at startup: a new database gets every table from the models and is stamped at HEAD,
+                an existing one gets its missing tables and then the pending migrations.
+                Safe to run from several processes at once, see _lock_schema.
+"""
+
+
+def setup_schema(engine: Engine) -> List[Migration]:
+    with _schema_transaction(engine) as conn:
+        is_new = not inspect(conn).has_table("users")
+        Base.metadata.create_all(bind=conn)
+        if is_new:
+            _stamp(conn, HEAD)
+
+    if is_new:
+        return []
+    return upgrade(engine)
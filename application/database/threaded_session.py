@@ -0,0 +1,81 @@
+# application/database/threaded_session.py
+
+from functools import partial
+from anyio import to_thread
+from sqlalchemy.orm import Session
+from database.database import get_engine, sessionLocal
+
+
+"""
+Class:          ThreadedSession
+Description:    The AsyncSession methods the routers use, backed by a sync Session and the sync driver. Every
+                database call runs in the threadpool, so a request holds a threadpool slot for each round trip,
+                as the plain `def` handlers did. With DB_SYNC_SESSIONS=true (Settings.sync_sessions) the routers
+                get one of these instead of an AsyncSession, to compare the two under load.
+                Results are fetched in the thread and handed back buffered, like AsyncSession.execute does.
+"""
+
+
+class ThreadedSession:
+
+    def __init__(self, session: Session):
+        self.sync_session = session
+
+    @property
+    def bind(self):
+        return self.sync_session.bind
+
+    async def _run(self, method, *args, **kwargs):
+        return await to_thread.run_sync(partial(method, *args, **kwargs))
+
+    def _execute(self, statement, params=None, **kwargs):
+        result = self.sync_session.execute(statement, params, **kwargs)
+        # ORM results always have rows, UPDATE / INSERT without RETURNING only a rowcount
+        return result.freeze()() if getattr(result, "returns_rows", True) else result
+
+    async def execute(self, statement, params=None, **kwargs):
+        return await self._run(self._execute, statement, params, **kwargs)
+
+    async def scalars(self, statement, params=None, **kwargs):
+        return (await self.execute(statement, params, **kwargs)).scalars()
+
+    async def scalar(self, statement, params=None, **kwargs):
+        return (await self.execute(statement, params, **kwargs)).scalar()
+
+    async def get(self, entity, ident, **kwargs):
+        return await self._run(self.sync_session.get, entity, ident, **kwargs)
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    async def delete(self, instance):
+        await self._run(self.sync_session.delete, instance)
+
+    async def flush(self, objects=None):
+        await self._run(self.sync_session.flush, objects)
+
+    async def refresh(self, instance, attribute_names=None):
+        await self._run(self.sync_session.refresh, instance, attribute_names)
+
+    async def commit(self):
+        await self._run(self.sync_session.commit)
+
+    async def rollback(self):
+        await self._run(self.sync_session.rollback)
+
+    async def close(self):
+        await self._run(self.sync_session.close)
+
+
+# Dependency to get a sync database session, in place of get_async_db
+async def get_threaded_db():
+    get_engine()
+    # objects stay loaded after commit, as with AsyncSessionLocal: reloading them would block the event loop
+    db = ThreadedSession(sessionLocal(expire_on_commit=False))
+    try:
+        yield db
+    finally:
+        await db.close()
@@ -1,38 +1,126 @@
 # application/main.py
 
-from fastapi import FastAPI
-from api.auth import router as user_router
-from api.admin import router as admin_router
-from api.customer import router as customer_router
-from api.delivery import router as delivery_router
-from database.database import engine, Base
-
-# create the database tables
-Base.metadata.create_all(bind=engine)
-
-app = FastAPI()
-
-# including the user router
-app.include_router(
-    user_router,
-    prefix="/users",
-    tags=["users"]
-)
-
-app.include_router(
-    admin_router,
-    prefix="/admin",
-    tags=["admin"]
-)
-
-app.include_router(
-    customer_router,
-    prefix="/customer",
-    tags=["customer"]
-)
-
-app.include_router(
-    delivery_router,
-    prefix="/delivery",
-    tags=["delivery"]
-)
\ No newline at end of file
+import logging
+from contextlib import asynccontextmanager
+from typing import Optional
+from dotenv import load_dotenv
+from settings import Settings
+
+# .env is read before any module reads its settings from the environment
+load_dotenv()
+
+# uvicorn configures this logger, so the message shows up in the server output
+logger = logging.getLogger("uvicorn.error")
+
+
+"""
+Function:       create_app
+Description:    Builds the app. Nothing touches the database here: the engine is created, the schema set up
+                (settings.setup_schema) and the query hooks installed by the lifespan handler when the server
+                starts, and the connections are closed again when it stops.
+                FastAPI, the routers and everything they import are imported here rather than at the top, so
+                importing this module stays cheap for tools that only need create_app.
+                Run with `uvicorn main:app`, or `uvicorn main:create_app --factory`.
+"""
+
+
+def create_app(settings: Optional[Settings] = None):
+    settings = settings or Settings.from_env()
+
+    from fastapi import FastAPI
+    from fastapi.concurrency import run_in_threadpool
+    from fastapi.responses import ORJSONResponse
+    from api.auth import router as user_router
+    from api.admin import router as admin_router
+    from api.customer import router as customer_router
+    from api.delivery import router as delivery_router
+    from api.metrics import router as metrics_router
+    from database import database
+    from database.migrations import setup_schema
+    from utils.idempotency import IdempotencyMiddleware
+    from utils.metrics import MetricsMiddleware, install_query_hooks
+    from utils.passwords import shutdown_password_executor
+    from utils.rate_limit import RateLimitMiddleware
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        database.configure(settings.database_url, settings.async_database_url)
+        async_engine = database.get_async_engine()
+        logger.info("Database engine settings: %s", database.get_engine_settings().describe())
+        if settings.sync_sessions:
+            logger.info("Routers use sync sessions in the threadpool (DB_SYNC_SESSIONS)")
+
+        # per request query counts and slow query logging, on both engines: the sync one runs the schema setup,
+        # scripts and the handlers with DB_SYNC_SESSIONS
+        if settings.metrics_enabled:
+            install_query_hooks(async_engine.sync_engine)
+            install_query_hooks(database.get_engine())
+
+        # create the database tables, or bring an existing database up to date
+        if settings.setup_schema:
+            await run_in_threadpool(setup_schema, database.get_engine())
+
+        try:
+            yield
+        finally:
+            shutdown_password_executor()
+            await database.dispose_engines()
+
+    # responses are encoded with orjson, response models are validated by pydantic before that
+    app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
+    app.state.settings = settings
+
+    # the sync engine behind the same handlers, for comparing the two (benchmarks/bench.py run --sync-sessions)
+    if settings.sync_sessions:
+        from database.threaded_session import get_threaded_db
+        app.dependency_overrides[database.get_async_db] = get_threaded_db
+
+    # replays the stored response of retried requests that carry an Idempotency-Key
+    app.add_middleware(IdempotencyMiddleware)
+
+    # token buckets per user or client address, added last so that it runs first
+    app.add_middleware(RateLimitMiddleware, enabled=settings.rate_limit_enabled)
+
+    # latency and query metrics, outermost so that the time spent in the other middleware is included
+    app.add_middleware(MetricsMiddleware, enabled=settings.metrics_enabled)
+
+    # including the user router
+    app.include_router(
+        user_router,
+        prefix="/users",
+        tags=["users"]
+    )
+
+    app.include_router(
+        admin_router,
+        prefix="/admin",
+        tags=["admin"]
+    )
+
+    app.include_router(
+        customer_router,
+        prefix="/customer",
+        tags=["customer"]
+    )
+
+    app.include_router(
+        delivery_router,
+        prefix="/delivery",
+        tags=["delivery"]
+    )
+
+    if settings.metrics_enabled:
+        app.include_router(
+            metrics_router,
+            tags=["metrics"]
+        )
+
+    return app
+
+
+def __getattr__(name: str):
+    # `main:app` is built on first access, so `import main` alone does not build it
+    if name == "app":
+        globals()["app"] = create_app()
+        return globals()["app"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,141 @@
+# application/manage.py
+
+"""
+Maintenance commands, run from the application directory:
+
+    python manage.py migrate            apply pending schema migrations
+    python manage.py migrate --to 1     apply migrations up to version 1
+    python manage.py migrate --status   show the database and latest versions
+    python manage.py stamp              mark all migrations as applied without running them
+    python manage.py rebuild-rollups    recompute the sales rollups from all orders
+    python manage.py seed --orders 1000000 --customers 100000
+                                        bulk load generated users, pizzas, carts and orders
+"""
+
+import argparse
+import logging
+import sys
+import time
+from datetime import datetime
+from dotenv import load_dotenv
+
+# .env is read before the modules below read their settings from the environment
+load_dotenv()
+
+from sqlalchemy import func, select  # noqa: E402
+from database.database import get_engine  # noqa: E402
+from database import migrations  # noqa: E402
+from utils.sales_rollups import rebuild_rollups  # noqa: E402
+from utils.seed_data import SEED_PASSWORD, SeedConfig, SeedGenerator  # noqa: E402
+
+# every model has to be imported so that Base.metadata knows all tables
+from models import user, pizza, cart, order, delivery, idempotency, sales  # noqa: F401,E402
+
+
+def migrate(args):
+    engine = get_engine()
+    if args.status:
+        with engine.connect() as conn:
+            print(f"database version: {migrations.current_version(conn)}, latest: {migrations.HEAD}")
+        return
+
+    if args.to is None:
+        # also creates a database from scratch
+        applied = migrations.setup_schema(engine)
+    else:
+        applied = migrations.upgrade(engine, target=args.to)
+    for migration in applied:
+        print(f"applied {migration.version}: {migration.description}")
+    if not applied:
+        print("database is up to date")
+
+
+def stamp(args):
+    engine = get_engine()
+    migrations.stamp(engine, target=args.to)
+    print(f"database stamped at version {args.to or migrations.HEAD}")
+
+
+def rebuild_rollups_command(args):
+    engine = get_engine()
+    with engine.begin() as conn:
+        rebuild_rollups(conn)
+        days = conn.execute(select(func.count()).select_from(sales.DailySales)).scalar()
+    print(f"sales rollups rebuilt, {days} day and status rows")
+
+
+def seed_end(value: str) -> datetime:
+    if value == "now":
+        return datetime.utcnow().replace(second=0, microsecond=0)
+    return datetime.fromisoformat(value)
+
+
+def seed(args):
+    config = SeedConfig(
+        customers=args.customers,
+        delivery_partners=args.delivery_partners,
+        admins=args.admins,
+        pizzas=args.pizzas,
+        orders=args.orders,
+        days=args.days,
+        end=args.end,
+        cart_share=args.cart_share,
+        comment_share=args.comment_share,
+        seed=args.seed,
+        batch_size=args.batch_size,
+    )
+    engine = get_engine()
+    # the tables have to exist, and a new database is created
+    migrations.setup_schema(engine)
+
+    started_at = time.perf_counter()
+    # one transaction, a failed run leaves nothing behind
+    with engine.begin() as conn:
+        counts = SeedGenerator(conn, config).run()
+    for table, count in counts.items():
+        print(f"{table}: {count}")
+    print(f"seeded in {time.perf_counter() - started_at:.1f} s, every user's password is {SEED_PASSWORD!r}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="manage.py")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    migrate_parser = commands.add_parser("migrate", help="apply pending schema migrations")
+    migrate_parser.add_argument("--to", type=int, default=None, help="target version, defaults to the latest")
+    migrate_parser.add_argument("--status", action="store_true", help="only show the current version")
+    migrate_parser.set_defaults(func=migrate)
+
+    stamp_parser = commands.add_parser("stamp", help="mark migrations as applied without running them")
+    stamp_parser.add_argument("--to", type=int, default=None, help="target version, defaults to the latest")
+    stamp_parser.set_defaults(func=stamp)
+
+    rollups_parser = commands.add_parser("rebuild-rollups", help="recompute the sales rollups from all orders")
+    rollups_parser.set_defaults(func=rebuild_rollups_command)
+
+    defaults = SeedConfig()
+    seed_parser = commands.add_parser("seed", help="bulk load generated data, the same for the same --seed")
+    seed_parser.add_argument("--customers", type=int, default=defaults.customers)
+    seed_parser.add_argument("--delivery-partners", type=int, default=defaults.delivery_partners)
+    seed_parser.add_argument("--admins", type=int, default=defaults.admins)
+    seed_parser.add_argument("--pizzas", type=int, default=defaults.pizzas)
+    seed_parser.add_argument("--orders", type=int, default=defaults.orders)
+    seed_parser.add_argument("--days", type=int, default=defaults.days, help="days the orders are spread over")
+    seed_parser.add_argument("--end", type=seed_end, default=defaults.end,
+                             help=f"YYYY-MM-DD[THH:MM] (UTC) or now, orders are placed before it, "
+                                  f"defaults to {defaults.end.date()}")
+    seed_parser.add_argument("--cart-share", type=float, default=defaults.cart_share,
+                             help="share of the customers with a filled cart")
+    seed_parser.add_argument("--comment-share", type=float, default=defaults.comment_share,
+                             help="share of the delivered orders with a delivery comment")
+    seed_parser.add_argument("--seed", type=int, default=defaults.seed)
+    seed_parser.add_argument("--batch-size", type=int, default=defaults.batch_size, help="rows per INSERT")
+    seed_parser.set_defaults(func=seed)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,16 @@
 # application/models/cart.py
 
-from sqlalchemy import Column, Integer, ForeignKey
+from sqlalchemy import Column, Integer, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from database.database import Base
 
 
 class CartItem(Base):
     __tablename__ = "cart_items"
+    __table_args__ = (
+        # one row per pizza in a user's cart, target of the add_to_cart upsert
+        Index("uq_cart_items_user_pizza", "user_id", "pizza_id", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
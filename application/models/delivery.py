@@ -1,12 +1,15 @@
 # application/models/delivery.py
 
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from database.database import Base
 
 
 class DeliveryComment(Base):
     __tablename__ = "delivery_comments"
+    __table_args__ = (
+        Index("ix_delivery_comments_order_id", "order_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
@@ -0,0 +1,20 @@
+# application/models/idempotency.py
+
+from sqlalchemy import Column, DateTime, Index, Integer, LargeBinary, String, Text
+from database.database import Base
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        Index("ix_idempotency_keys_expires_at", "expires_at"),
+    )
+
+    # hash of the caller, method, path and Idempotency-Key header
+    key = Column(String(64), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)
+    # NULL while the first request is still running
+    status_code = Column(Integer, nullable=True)
+    headers = Column(Text, nullable=True)
+    body = Column(LargeBinary, nullable=True)
+    expires_at = Column(DateTime, nullable=False)
@@ -1,6 +1,6 @@
 # application/models/order.py
 
-from sqlalchemy import Column, Integer, String, Float, Enum, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Float, Enum, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from models.delivery import DeliveryComment
 from database.database import Base
@@ -16,23 +16,47 @@ class OrderStatus(str, enum.Enum):
     CANCELLED = "cancelled"
 
 
+# the statuses an order may move to from each status
+ORDER_TRANSITIONS = {
+    OrderStatus.PLACED: {OrderStatus.PREPARING, OrderStatus.CANCELLED},
+    OrderStatus.PREPARING: {OrderStatus.OUT_FOR_DELIVERY, OrderStatus.CANCELLED},
+    OrderStatus.OUT_FOR_DELIVERY: {OrderStatus.DELIVERED},
+    OrderStatus.DELIVERED: set(),
+    OrderStatus.CANCELLED: set(),
+}
+
+
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        Index("ix_orders_user_created", "user_id", "created_at"),
+        Index("ix_orders_created_id", "created_at", "id"),
+        Index("ix_orders_status", "status"),
+        Index("ix_orders_dispatch", "status", "assigned_to", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     total_amount = Column(Float)
     status = Column(Enum(OrderStatus), default=OrderStatus.PLACED)
+    # incremented by every status change and assignment, for optimistic concurrency control
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # delivery partner who claimed the order from the dispatch queue
+    assigned_to = Column(Integer, ForeignKey("users.id"), nullable=True)
+    assigned_at = Column(DateTime, nullable=True)
 
-    users = relationship("User", back_populates="orders")
+    users = relationship("User", back_populates="orders", foreign_keys=[user_id])
     order_items = relationship("OrderItem", back_populates="order")
     delivery_comments = relationship(DeliveryComment, back_populates="orders")
 
 
 class OrderItem(Base):
     __tablename__ = "order_items"
+    __table_args__ = (
+        Index("ix_order_items_order_id", "order_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     order_id = Column(Integer, ForeignKey("orders.id"))
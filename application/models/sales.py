@@ -0,0 +1,27 @@
+# application/models/sales.py
+
+from sqlalchemy import Column, Date, Enum, Float, Integer
+from database.database import Base
+from models.order import OrderStatus
+
+
+# order totals per day (of created_at, UTC) and current order status
+class DailySales(Base):
+    __tablename__ = "daily_sales"
+
+    day = Column(Date, primary_key=True)
+    status = Column(Enum(OrderStatus), primary_key=True)
+    order_count = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+
+
+# order item totals per day, pizza and current order status
+class DailyPizzaSales(Base):
+    __tablename__ = "daily_pizza_sales"
+
+    day = Column(Date, primary_key=True)
+    pizza_id = Column(Integer, primary_key=True)
+    status = Column(Enum(OrderStatus), primary_key=True)
+    order_count = Column(Integer, nullable=False, default=0)
+    quantity = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
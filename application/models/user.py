@@ -37,5 +37,5 @@ class User(Base):
         Boolean,
         default=True,
     )
-    orders = relationship("Order", back_populates="users")
+    orders = relationship("Order", back_populates="users", foreign_keys="Order.user_id")
     cart_items = relationship("CartItem", back_populates="users")
@@ -1,6 +1,6 @@
 # application/schema/auth.py
 
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
 from typing import Optional
 
 
@@ -20,8 +20,7 @@ class UserCreate(UserBase):
 class UserResponse(UserBase):
     id: int
 
-    class config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class UserLogin(BaseModel):
@@ -1,6 +1,6 @@
 # application/schema/cart.py
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 class CartItemBase(BaseModel):
     pizza_id: int
@@ -16,12 +16,14 @@ class CartItem(CartItemBase):
     id: int
     user_id: int
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class Cart(BaseModel):
     items: list[CartItem]
     total: float
 
-    class Config:
-        orm_mode = True
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+class CartSummary(BaseModel):
+    item_count: int
+    total: float
@@ -1,11 +1,13 @@
 # application/schema/delivery.py
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
+from typing import Optional
 from models.order import OrderStatus
-from datetime import datetime
 
 class DeliveryStatusUpdate(BaseModel):
     status: OrderStatus
+    # the order version the change is based on, it is rejected if the order changed since
+    version: Optional[int] = None
 
 class DeliveryCommentBase(BaseModel):
     order_id: int
@@ -15,9 +17,10 @@ class DeliveryCommentBase(BaseModel):
 class DeliveryCommentCreate(DeliveryCommentBase):
     pass
 
-class DeliveryComment(DeliveryCommentBase):
+class DeliveryComment(BaseModel):
     id: int
-    created_at: datetime
+    order_id: int
+    current_user_id: int
+    comment: str
 
-    class config:
-        orm_mode=True
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
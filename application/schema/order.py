@@ -1,7 +1,8 @@
 # application/schema/order.py
 
-from pydantic import BaseModel
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field
 from datetime import datetime
+from typing import Optional
 from models.order import OrderStatus
 
 class OrderItemBase(BaseModel):
@@ -13,10 +14,10 @@ class OrderItemCreate(OrderItemBase):
 
 class OrderItem(OrderItemBase):
     id: int
+    order_id: int
     unit_price: float
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class OrderBase(BaseModel):
     user_id: int
@@ -26,14 +27,29 @@ class OrderCreate(OrderBase):
 
 class OrderUpdate(BaseModel):
     status: OrderStatus
+    # the order version the change is based on, it is rejected if the order changed since
+    version: Optional[int] = None
 
-class Order(OrderBase):
+class OrderSummary(OrderBase):
     id: int
     total_amount: float
     status: OrderStatus
+    version: int = 1
     created_at: datetime
     updated_at: datetime
-    items: list[OrderItem]
+    assigned_to: Optional[int] = None
+    assigned_at: Optional[datetime] = None
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+class Order(OrderSummary):
+    # ORM orders carry their items as order_items
+    items: list[OrderItem] = Field(validation_alias=AliasChoices("items", "order_items"))
+
+class OrderClaim(BaseModel):
+    # a specific order from the queue, or else the oldest one
+    order_id: Optional[int] = None
+
+class OrderPage(BaseModel):
+    items: list[Order]
+    next_cursor: Optional[str] = None
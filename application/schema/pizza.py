@@ -1,7 +1,7 @@
 # application/schema/pizza.py
 
-from typing import Optional
-from pydantic import BaseModel
+from typing import List, Optional
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 
 
 class PizzaBase(BaseModel):
@@ -22,12 +22,38 @@ class PizzaUpdate(BaseModel):
     is_available: Optional[bool] = None
 
 
+# a bulk import row for an existing pizza: the columns it leaves out keep their value
+class PizzaImportUpdate(PizzaUpdate):
+    name: str
+
+    @field_validator("description", "price", "is_available")
+    @classmethod
+    def not_null(cls, value):
+        if value is None:
+            raise ValueError("may be left out, but not null")
+        return value
+
+
 class PizzaResponse(PizzaCreate):
     id: int
 
-    class config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class MessageResponse(BaseModel):
     message: str
+
+
+class PizzaImportRow(BaseModel):
+    row: int
+    name: Optional[str] = None
+    status: str = Field(description="created, updated or error")
+    id: Optional[int] = None
+    errors: Optional[List[str]] = None
+
+
+class PizzaImportReport(BaseModel):
+    created: int = 0
+    updated: int = 0
+    failed: int = 0
+    rows: List[PizzaImportRow] = []
@@ -0,0 +1,24 @@
+# application/schema/stats.py
+
+from pydantic import BaseModel
+from datetime import date
+from models.order import OrderStatus
+
+class DailySales(BaseModel):
+    day: date
+    status: OrderStatus
+    order_count: int
+    revenue: float
+
+class PizzaSales(BaseModel):
+    pizza_id: int
+    status: OrderStatus
+    order_count: int
+    quantity: int
+    revenue: float
+
+class SalesStats(BaseModel):
+    date_from: date
+    date_to: date
+    days: list[DailySales]
+    pizzas: list[PizzaSales]
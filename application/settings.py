@@ -0,0 +1,42 @@
+# application/settings.py
+
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+
+def _flag(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes")
+
+
+"""
+Class:          Settings
+Description:    What create_app needs to know to build the app. from_env() reads the same environment
+                variables as before; pass a Settings to run the app against another database or with parts
+                turned off (tests, benchmarks). Module level settings (SECRET_KEY, pool sizes, ...) are
+                still read from the environment.
+"""
+
+
+@dataclass(frozen=True)
+class Settings:
+    # DATABASE_URL, and ASYNC_DATABASE_URL when it is not derived from it
+    database_url: Optional[str] = None
+    async_database_url: Optional[str] = None
+    # create a new database, or apply pending migrations, when the app starts
+    setup_schema: bool = True
+    metrics_enabled: bool = True
+    rate_limit_enabled: bool = True
+    # serve the routers from the sync engine in the threadpool, to compare it with the async one under load
+    sync_sessions: bool = False
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        return cls(
+            database_url=os.getenv("DATABASE_URL"),
+            async_database_url=os.getenv("ASYNC_DATABASE_URL"),
+            setup_schema=_flag("DB_SETUP_SCHEMA", cls.setup_schema),
+            metrics_enabled=_flag("METRICS_ENABLED", cls.metrics_enabled),
+            rate_limit_enabled=_flag("RATE_LIMIT_ENABLED", cls.rate_limit_enabled),
+            sync_sessions=_flag("DB_SYNC_SESSIONS", cls.sync_sessions),
+        )
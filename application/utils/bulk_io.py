@@ -0,0 +1,133 @@
+# application/utils/bulk_io.py
+
+import csv
+import io
+import json
+import orjson
+from datetime import date, datetime
+from enum import Enum
+from typing import AsyncIterator, Iterable, List, Optional
+from fastapi import HTTPException, Request
+
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+CONTENT_TYPE_FORMATS = {
+    "text/csv": "csv",
+    "application/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "application/json-lines": "ndjson",
+}
+
+
+"""
+Function:       request_format
+Description:    csv or ndjson, from the `format` query parameter or else the request's Content-Type.
+"""
+
+
+def request_format(request: Request, format: Optional[str] = None) -> str:
+    if format is None:
+        content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+        format = CONTENT_TYPE_FORMATS.get(content_type)
+    if format not in MEDIA_TYPES:
+        raise HTTPException(
+            status_code=415,
+            detail="Send CSV (text/csv) or NDJSON (application/x-ndjson), or pass ?format=csv|ndjson"
+        )
+    return format
+
+
+async def iter_lines(request: Request) -> AsyncIterator[bytes]:
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.rstrip(b"\r")
+    if buffer:
+        yield buffer.rstrip(b"\r")
+
+
+"""
+Function:       iter_records
+Description:    Parses the request body while it streams in, one record (dict, or the parse error) per
+                non-empty line. CSV uses its first line as the header, quoted values may not contain newlines
+                and empty cells are left out. Lines must be UTF-8, others are reported like any other parse
+                error; a CSV header that is not is rejected with 400.
+"""
+
+
+async def iter_records(request: Request, format: str) -> AsyncIterator[tuple]:
+    header = None
+    line_number = 0
+    async for raw_line in iter_lines(request):
+        line_number += 1
+        try:
+            line = raw_line.decode("utf-8-sig")
+        except UnicodeDecodeError as e:
+            if format == "csv" and header is None:
+                raise HTTPException(status_code=400, detail=f"The CSV header is not valid UTF-8 (byte {e.start})")
+            yield line_number, None, f"Invalid UTF-8 at byte {e.start}"
+            continue
+        if not line.strip():
+            continue
+
+        if format == "ndjson":
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_number, None, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield line_number, None, "Expected a JSON object"
+                continue
+            yield line_number, record, None
+            continue
+
+        values = next(csv.reader([line]))
+        if header is None:
+            header = [value.strip() for value in values]
+            continue
+        if len(values) != len(header):
+            yield line_number, None, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+        # empty cells fall back to the field defaults
+        yield line_number, {key: value for key, value in zip(header, values) if value != ""}, None
+
+
+async def batched(records: AsyncIterator, size: int) -> AsyncIterator[List]:
+    batch = []
+    async for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _plain(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def csv_line(values: Iterable) -> str:
+    out = io.StringIO()
+    csv.writer(out, lineterminator="\n").writerow([_plain(value) for value in values])
+    return out.getvalue()
+
+
+def ndjson_line(record: dict) -> bytes:
+    # orjson writes datetimes, enums and bools the same way _plain does
+    return orjson.dumps(record, default=_plain, option=orjson.OPT_APPEND_NEWLINE)
@@ -0,0 +1,74 @@
+# application/utils/dispatch.py
+
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from models.order import Order as ModelOrder, OrderStatus
+from utils.pagination import select_orders, with_items
+
+# orders in this status wait in the dispatch queue until a delivery partner claims them
+DISPATCH_STATUS = OrderStatus.PREPARING
+
+
+def _ready():
+    return (ModelOrder.status == DISPATCH_STATUS, ModelOrder.assigned_to.is_(None))
+
+
+"""
+Function:       ready_orders
+Description:    Unclaimed orders waiting for pickup, oldest first, as dicts with their items.
+"""
+
+
+async def ready_orders(db: AsyncSession, limit: int) -> List[dict]:
+    return await with_items(db, (await db.execute(
+        select_orders()
+        .where(*_ready())
+        .order_by(ModelOrder.created_at, ModelOrder.id)
+        .limit(limit)
+    )).all())
+
+
+"""
+Function:       claim_order
+Description:    Assigns one ready order (the given one, or else the oldest) to the partner with a single conditional
+                UPDATE ... RETURNING, so of any number of concurrent claims exactly one gets each order.
+                On PostgreSQL the candidate row is picked with FOR UPDATE SKIP LOCKED: a claim skips orders other
+                partners are claiming at that moment instead of waiting on their locks. SQLite serializes writers
+                and ignores the locking clause.
+                Returns the claimed order with its items, or None when nothing could be claimed.
+"""
+
+
+async def claim_order(db: AsyncSession, partner_id: int, order_id: Optional[int] = None) -> Optional[ModelOrder]:
+    candidate = select(ModelOrder.id).where(*_ready())
+    if order_id is not None:
+        candidate = candidate.where(ModelOrder.id == order_id)
+    candidate = (
+        candidate
+        .order_by(ModelOrder.created_at, ModelOrder.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+
+    claimed_id = (await db.execute(
+        update(ModelOrder)
+        # the conditions are checked again on the row being written
+        .where(ModelOrder.id == candidate, *_ready())
+        .values(assigned_to=partner_id, assigned_at=datetime.utcnow(), version=ModelOrder.version + 1)
+        .returning(ModelOrder.id)
+        .execution_options(synchronize_session=False)
+    )).scalar()
+    await db.commit()
+
+    if claimed_id is None:
+        return None
+    return (await db.execute(
+        select(ModelOrder)
+        .options(selectinload(ModelOrder.order_items))
+        .where(ModelOrder.id == claimed_id)
+        .execution_options(populate_existing=True)
+    )).scalar_one()
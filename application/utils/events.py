@@ -0,0 +1,183 @@
+# application/utils/events.py
+
+import asyncio
+import importlib
+import itertools
+import json
+import os
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import AsyncIterator, Dict, Optional, Set
+from fastapi import Request
+
+
+# events kept per subscriber before the oldest are dropped, a slow client can not hold up publishers
+ORDER_EVENTS_QUEUE_SIZE = int(os.getenv("ORDER_EVENTS_QUEUE_SIZE", "100"))
+
+# seconds between keepalive comments on an idle event stream
+ORDER_EVENTS_HEARTBEAT = float(os.getenv("ORDER_EVENTS_HEARTBEAT", "15"))
+
+KITCHEN_CHANNEL = "orders.kitchen"
+
+
+def user_channel(user_id: int) -> str:
+    return f"orders.user.{user_id}"
+
+
+"""
+Class:          Subscription
+Description:    The events published on a set of channels since subscribing, in order.
+"""
+
+
+class Subscription(ABC):
+
+    @abstractmethod
+    async def get(self) -> dict:
+        ...
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> dict:
+        return await self.get()
+
+
+"""
+Class:          Broker
+Description:    Fan-out of order events to subscribers. The in-memory broker only reaches subscribers of the
+                same process, a broker backed by a shared pub/sub (Redis, PostgreSQL LISTEN/NOTIFY, ...) can be
+                plugged in with ORDER_EVENTS_BROKER="module:attribute" so that every worker sees every event.
+"""
+
+
+class Broker(ABC):
+
+    @abstractmethod
+    async def publish(self, channel: str, event: dict):
+        ...
+
+    @abstractmethod
+    def subscribe(self, *channels: str):
+        """Async context manager yielding a Subscription to the channels."""
+
+
+class InMemorySubscription(Subscription):
+
+    def __init__(self, maxsize: int):
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def put(self, event: dict):
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def get(self) -> dict:
+        return await self.queue.get()
+
+
+class InMemoryBroker(Broker):
+
+    def __init__(self, queue_size: int = ORDER_EVENTS_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.subscribers: Dict[str, Set[InMemorySubscription]] = {}
+
+    async def publish(self, channel: str, event: dict):
+        for subscription in list(self.subscribers.get(channel, ())):
+            subscription.put(event)
+
+    @asynccontextmanager
+    async def subscribe(self, *channels: str) -> AsyncIterator[InMemorySubscription]:
+        subscription = InMemorySubscription(self.queue_size)
+        for channel in channels:
+            self.subscribers.setdefault(channel, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            for channel in channels:
+                subscribers = self.subscribers.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self.subscribers[channel]
+
+
+def _load_broker() -> Broker:
+    path = os.getenv("ORDER_EVENTS_BROKER")
+    if not path:
+        return InMemoryBroker()
+    module_name, _, attribute = path.partition(":")
+    broker = getattr(importlib.import_module(module_name), attribute)
+    return broker() if isinstance(broker, type) else broker
+
+
+_broker: Optional[Broker] = None
+
+
+def get_broker() -> Broker:
+    global _broker
+    if _broker is None:
+        _broker = _load_broker()
+    return _broker
+
+
+def set_broker(broker: Broker):
+    global _broker
+    _broker = broker
+
+
+_event_ids = itertools.count(1)
+
+
+"""
+Function:       publish_order_event
+Description:    Publishes an order change to the customer's channel and to the kitchen feed.
+                Called after the change is committed.
+"""
+
+
+async def publish_order_event(
+        event_type: str,
+        order_id: int,
+        user_id: int,
+        status,
+        previous_status=None,
+):
+    event = {
+        "id": next(_event_ids),
+        "type": event_type,
+        "order_id": order_id,
+        "user_id": user_id,
+        "status": getattr(status, "value", status),
+        "previous_status": getattr(previous_status, "value", previous_status),
+        "at": datetime.utcnow().isoformat(),
+    }
+    broker = get_broker()
+    await broker.publish(user_channel(user_id), event)
+    await broker.publish(KITCHEN_CHANNEL, event)
+
+
+def sse_message(event: dict) -> str:
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event, separators=(',', ':'))}\n\n"
+
+
+"""
+Function:       event_stream
+Description:    Server-Sent Events body for the channels, with a keepalive comment every
+                ORDER_EVENTS_HEARTBEAT seconds. Ends when the client disconnects.
+"""
+
+
+async def event_stream(request: Request, *channels: str):
+    async with get_broker().subscribe(*channels) as subscription:
+        yield ": connected\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), timeout=ORDER_EVENTS_HEARTBEAT)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": keepalive\n\n"
+                continue
+            yield sse_message(event)
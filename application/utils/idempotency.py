@@ -0,0 +1,376 @@
+# application/utils/idempotency.py
+
+import asyncio
+import hashlib
+import importlib
+import json
+import os
+import re
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from database.database import AsyncSessionLocal, get_async_engine
+from models.idempotency import IdempotencyKey
+from utils.metrics import HANDLED_BY
+
+
+# seconds a stored response is replayed for
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "86400"))
+
+# responses kept by the in-memory store
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+
+# seconds a retry waits for the first request with the same key before giving up with 409
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", "30"))
+
+# seconds after which a key whose request never finished (a crashed worker) can be used again
+IDEMPOTENCY_LOCK_TIMEOUT = float(os.getenv("IDEMPOTENCY_LOCK_TIMEOUT", "60"))
+
+IDEMPOTENCY_KEY_HEADER = "idempotency-key"
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+# the endpoints that honour Idempotency-Key
+IDEMPOTENT_ROUTES = [
+    ("POST", re.compile(r"^/customer/orders$")),
+    ("POST", re.compile(r"^/customer/cart$")),
+    ("POST", re.compile(r"^/customer/cart/checkout$")),
+    ("PUT", re.compile(r"^/admin/orders/\d+/status$")),
+    ("PUT", re.compile(r"^/delivery/deliveries/\d+/status$")),
+]
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    status_code: int
+    headers: List[Tuple[str, str]]
+    body: bytes
+
+
+@dataclass(frozen=True)
+class KeyState:
+    fingerprint: str
+    # None while the first request is still running
+    response: Optional[StoredResponse] = None
+
+
+"""
+Class:          IdempotencyStore
+Description:    Keyed store of the responses of idempotent requests.
+                reserve() marks a key as in progress and fails if it is already known, so only one of several
+                concurrent requests with the same key runs the endpoint. complete() stores its response and
+                release() forgets the key again, when the request failed and may be retried.
+"""
+
+
+class IdempotencyStore(ABC):
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[KeyState]:
+        ...
+
+    @abstractmethod
+    async def reserve(self, key: str, fingerprint: str) -> bool:
+        ...
+
+    @abstractmethod
+    async def complete(self, key: str, response: StoredResponse):
+        ...
+
+    @abstractmethod
+    async def release(self, key: str):
+        ...
+
+    @abstractmethod
+    async def wait(self, key: str, timeout: float):
+        """Returns once the request holding the key has finished, or after timeout seconds."""
+
+
+"""
+Class:          MemoryIdempotencyStore
+Description:    In-process LRU of responses, each kept for ttl seconds. Retries only find the response
+                when they reach the same worker, use DatabaseIdempotencyStore with several workers.
+"""
+
+
+class MemoryIdempotencyStore(IdempotencyStore):
+
+    def __init__(self, maxsize: int = IDEMPOTENCY_CACHE_SIZE, ttl: float = IDEMPOTENCY_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[KeyState, float]]" = OrderedDict()
+        self._done: Dict[str, asyncio.Event] = {}
+
+    async def get(self, key: str) -> Optional[KeyState]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        state, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return state
+
+    async def reserve(self, key: str, fingerprint: str) -> bool:
+        if await self.get(key) is not None:
+            return False
+        self._entries[key] = (KeyState(fingerprint), time.monotonic() + IDEMPOTENCY_LOCK_TIMEOUT)
+        self._done[key] = asyncio.Event()
+        return True
+
+    async def complete(self, key: str, response: StoredResponse):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries[key] = (KeyState(entry[0].fingerprint, response), time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        self._finish(key)
+
+    async def release(self, key: str):
+        self._entries.pop(key, None)
+        self._finish(key)
+
+    def _finish(self, key: str):
+        done = self._done.pop(key, None)
+        if done is not None:
+            done.set()
+
+    async def wait(self, key: str, timeout: float):
+        done = self._done.get(key)
+        if done is None:
+            return
+        try:
+            await asyncio.wait_for(done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+"""
+Class:          DatabaseIdempotencyStore
+Description:    Responses kept in the idempotency_keys table, shared by all workers. The primary key makes
+                reserve() atomic across workers, and waiting retries poll the row until it has a response.
+"""
+
+
+class DatabaseIdempotencyStore(IdempotencyStore):
+
+    def __init__(self, ttl: float = IDEMPOTENCY_TTL, poll_interval: float = 0.1):
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        # the middleware runs before any endpoint opened a session, make sure AsyncSessionLocal is bound
+        get_async_engine()
+
+    async def get(self, key: str) -> Optional[KeyState]:
+        async with AsyncSessionLocal() as db:
+            row = (await db.execute(
+                select(
+                    IdempotencyKey.fingerprint,
+                    IdempotencyKey.status_code,
+                    IdempotencyKey.headers,
+                    IdempotencyKey.body,
+                ).where(IdempotencyKey.key == key, IdempotencyKey.expires_at >= datetime.utcnow())
+            )).first()
+        if row is None:
+            return None
+        if row.status_code is None:
+            return KeyState(row.fingerprint)
+        headers = [tuple(header) for header in json.loads(row.headers)]
+        return KeyState(row.fingerprint, StoredResponse(row.status_code, headers, row.body))
+
+    async def reserve(self, key: str, fingerprint: str) -> bool:
+        now = datetime.utcnow()
+        async with AsyncSessionLocal() as db:
+            # expired keys, including this one, make room first
+            await db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at < now))
+            db.add(IdempotencyKey(
+                key=key,
+                fingerprint=fingerprint,
+                expires_at=now + timedelta(seconds=IDEMPOTENCY_LOCK_TIMEOUT),
+            ))
+            try:
+                await db.commit()
+            except IntegrityError:
+                await db.rollback()
+                return False
+        return True
+
+    async def complete(self, key: str, response: StoredResponse):
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(IdempotencyKey)
+                .where(IdempotencyKey.key == key)
+                .values(
+                    status_code=response.status_code,
+                    headers=json.dumps(response.headers),
+                    body=response.body,
+                    expires_at=datetime.utcnow() + timedelta(seconds=self.ttl),
+                )
+            )
+            await db.commit()
+
+    async def release(self, key: str):
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(IdempotencyKey).where(IdempotencyKey.key == key))
+            await db.commit()
+
+    async def wait(self, key: str, timeout: float):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            state = await self.get(key)
+            if state is None or state.response is not None:
+                return
+
+
+IDEMPOTENCY_STORES = {
+    "memory": MemoryIdempotencyStore,
+    "database": DatabaseIdempotencyStore,
+}
+
+
+def load_store() -> IdempotencyStore:
+    # memory, database, or "module:attribute" of another IdempotencyStore
+    name = os.getenv("IDEMPOTENCY_STORE", "memory")
+    if name in IDEMPOTENCY_STORES:
+        return IDEMPOTENCY_STORES[name]()
+    module_name, _, attribute = name.partition(":")
+    store = getattr(importlib.import_module(module_name), attribute)
+    return store() if isinstance(store, type) else store
+
+
+def _is_idempotent_route(method: str, path: str) -> bool:
+    return any(method == route_method and pattern.match(path) for route_method, pattern in IDEMPOTENT_ROUTES)
+
+
+def _hash(*parts: bytes) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+async def _send_json(scope, send, status_code: int, detail: str):
+    scope[HANDLED_BY] = "idempotency"
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+"""
+Class:          IdempotencyMiddleware
+Description:    Requests to IDEMPOTENT_ROUTES with an Idempotency-Key header run once per key: the response is
+                stored, and a retry with the same key gets it back (marked Idempotent-Replayed: true) without the
+                endpoint running again. Keys are scoped to the caller's Authorization header, method and path.
+                A retry arriving while the first request is still running waits for it. Reusing a key with a
+                different body is rejected with 422. Responses with status 500 or above are not stored, so such
+                requests can be retried.
+"""
+
+
+class IdempotencyMiddleware:
+
+    def __init__(self, app, store: Optional[IdempotencyStore] = None):
+        self.app = app
+        self.store = store
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _is_idempotent_route(scope["method"], scope["path"]):
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope["headers"])
+        idempotency_key = headers.get(IDEMPOTENCY_KEY_HEADER.encode())
+        if idempotency_key is None:
+            return await self.app(scope, receive, send)
+        if not idempotency_key or len(idempotency_key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            return await _send_json(
+                scope, send, 400, f"Idempotency-Key must be 1 to {IDEMPOTENCY_KEY_MAX_LENGTH} characters"
+            )
+
+        if self.store is None:
+            self.store = load_store()
+
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+        key = _hash(
+            headers.get(b"authorization", b""), scope["method"].encode(), scope["path"].encode(), idempotency_key
+        )
+        fingerprint = _hash(scope.get("query_string", b""), body)
+
+        deadline = time.monotonic() + IDEMPOTENCY_WAIT_TIMEOUT
+        while True:
+            state = await self.store.get(key)
+            if state is not None and state.fingerprint != fingerprint:
+                return await _send_json(
+                    scope, send, 422, "Idempotency-Key was already used for a request with a different body"
+                )
+            if state is not None and state.response is not None:
+                return await self._replay(scope, send, state.response)
+            if state is None and await self.store.reserve(key, fingerprint):
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return await _send_json(
+                    scope, send, 409, "A request with this Idempotency-Key is still being processed"
+                )
+            await self.store.wait(key, remaining)
+
+        await self._run(scope, body, receive, send, key)
+
+    async def _run(self, scope, body: bytes, receive, send, key: str):
+        body_sent = False
+
+        async def replay_receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        start = None
+        chunks = []
+
+        async def capture_send(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        except BaseException:
+            await self.store.release(key)
+            raise
+
+        if start is None or start["status"] >= 500:
+            await self.store.release(key)
+            return
+        await self.store.complete(key, StoredResponse(
+            status_code=start["status"],
+            headers=[(name.decode("latin-1"), value.decode("latin-1")) for name, value in start.get("headers", [])],
+            body=b"".join(chunks),
+        ))
+
+    async def _replay(self, scope, send, response: StoredResponse):
+        scope[HANDLED_BY] = "idempotency"
+        headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in response.headers]
+        headers.append((b"idempotent-replayed", b"true"))
+        await send({"type": "http.response.start", "status": response.status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": response.body})
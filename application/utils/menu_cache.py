@@ -0,0 +1,133 @@
+# application/utils/menu_cache.py
+
+import hashlib
+import os
+import time
+from dataclasses import dataclass
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.pizza import Pizza
+from schema.pizza import PizzaResponse
+
+
+# seconds a menu snapshot is served before it is reloaded,
+# bounds how long workers that did not see an admin change keep the old menu
+MENU_CACHE_TTL = float(os.getenv("MENU_CACHE_TTL", "300"))
+
+menu_adapter = TypeAdapter(list[PizzaResponse])
+
+
+"""
+Class:          MenuSnapshot
+Description:    One loaded version of the menu: the pre-serialized GET /customer/pizzas body with its
+                validators, and every pizza (available or not) by id, which the cart endpoints check pizza ids
+                against. Prices are not taken from it: orders and the cart read them from the database, so a
+                price change is never charged late.
+"""
+
+
+@dataclass(frozen=True)
+class MenuSnapshot:
+    version: int
+    body: bytes
+    etag: str
+    last_modified: str
+    pizzas: Dict[int, PizzaResponse]
+    expires_at: float
+
+    def get(self, pizza_id: int) -> Optional[PizzaResponse]:
+        return self.pizzas.get(pizza_id)
+
+    """
+    Function:       is_not_modified
+    Description:    True if the request's If-None-Match (or, without it, If-Modified-Since)
+                    matches this snapshot, so a 304 can be sent instead of the body.
+    """
+
+    def is_not_modified(self, request: Request) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return "*" in tags or self.etag in tags
+
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return parsedate_to_datetime(if_modified_since) >= parsedate_to_datetime(self.last_modified)
+            except (TypeError, ValueError):
+                return False
+
+        return False
+
+    def headers(self) -> dict:
+        return {
+            "ETag": self.etag,
+            "Last-Modified": self.last_modified,
+            "Cache-Control": "private, no-cache",
+        }
+
+    def response(self, request: Request) -> Response:
+        if self.is_not_modified(request):
+            return Response(status_code=304, headers=self.headers())
+        return Response(content=self.body, media_type="application/json", headers=self.headers())
+
+
+"""
+Class:          MenuCache
+Description:    Holds the current MenuSnapshot. Admin mutations call invalidate() after their commit,
+                which bumps the version, the next reader loads a new snapshot with a single query.
+"""
+
+
+class MenuCache:
+
+    def __init__(self, ttl: float = MENU_CACHE_TTL):
+        self.ttl = ttl
+        self.version = 0
+        self._snapshot: Optional[MenuSnapshot] = None
+
+    async def get(self, db: AsyncSession) -> MenuSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == self.version and snapshot.expires_at > time.monotonic():
+            return snapshot
+        return await self.load(db)
+
+    async def load(self, db: AsyncSession) -> MenuSnapshot:
+        version = self.version
+        rows = (await db.execute(select(Pizza).order_by(Pizza.id))).scalars().all()
+        pizzas = {row.id: PizzaResponse.model_validate(row, from_attributes=True) for row in rows}
+
+        body = menu_adapter.dump_json([pizza for pizza in pizzas.values() if pizza.is_available])
+        etag = '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+
+        # keep the validator stable when a reload finds the same menu
+        previous = self._snapshot
+        if previous is not None and previous.etag == etag:
+            last_modified = previous.last_modified
+        else:
+            last_modified = formatdate(usegmt=True)
+
+        snapshot = MenuSnapshot(
+            version=version,
+            body=body,
+            etag=etag,
+            last_modified=last_modified,
+            pizzas=pizzas,
+            expires_at=time.monotonic() + self.ttl,
+        )
+
+        # an invalidation while loading means this snapshot may already be stale, do not keep it
+        if version == self.version:
+            self._snapshot = snapshot
+        return snapshot
+
+    def invalidate(self):
+        self.version += 1
+        self._snapshot = None
+
+
+menu_cache = MenuCache()
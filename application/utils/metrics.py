@@ -0,0 +1,254 @@
+# application/utils/metrics.py
+
+import bisect
+import logging
+import os
+import threading
+import time
+import weakref
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.routing import Match
+
+
+logger = logging.getLogger("uvicorn.error")
+
+# requests and queries slower than this many milliseconds are logged as warnings
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+
+# add the Server-Timing header to responses
+SERVER_TIMING = os.getenv("SERVER_TIMING", "true").lower() in ("1", "true", "yes")
+
+# upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# upper bounds of the queries per request histogram buckets
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# scope key set by middleware that answers a request itself (a 429, an idempotent replay), with its name
+HANDLED_BY = "handled_by"
+
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    db_seconds: float = 0.0
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+class Histogram:
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            yield bound, total
+
+
+"""
+Class:          MetricsRegistry
+Description:    Per (method, route, status, handler) request latency and queries per request histograms,
+                plus the database time spent by each route, rendered in the Prometheus text format.
+                Routes are labelled with their path template (/customer/orders/{order_id}), not the raw path.
+                handler is "endpoint", or the middleware that answered without running it.
+"""
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency: Dict[Tuple[str, str, str, str], Histogram] = {}
+        self.queries: Dict[Tuple[str, str, str, str], Histogram] = {}
+        self.db_seconds: Dict[Tuple[str, str, str, str], float] = {}
+        self.slow_requests = 0
+        self.slow_queries = 0
+
+    def observe_request(
+            self, method: str, route: str, status: int, seconds: float, stats: RequestStats, handler: str = "endpoint"
+    ):
+        labels = (method, route, str(status), handler)
+        with self._lock:
+            self.latency.setdefault(labels, Histogram(LATENCY_BUCKETS)).observe(seconds)
+            self.queries.setdefault(labels, Histogram(QUERY_BUCKETS)).observe(stats.queries)
+            self.db_seconds[labels] = self.db_seconds.get(labels, 0.0) + stats.db_seconds
+
+    def observe_slow_query(self):
+        with self._lock:
+            self.slow_queries += 1
+
+    def observe_slow_request(self):
+        with self._lock:
+            self.slow_requests += 1
+
+    def render(self) -> str:
+        lines = []
+
+        def labels(method, route, status, handler, **extra):
+            pairs = {"method": method, "route": route, "status": status, "handler": handler, **extra}
+            return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs.items()) + "}"
+
+        def histogram(name, help_text, histograms):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, hist in sorted(histograms.items()):
+                for bound, count in hist.cumulative():
+                    le = "+Inf" if bound == float("inf") else repr(float(bound))
+                    lines.append(f"{name}_bucket{labels(*key, le=le)} {count}")
+                lines.append(f"{name}_sum{labels(*key)} {hist.sum}")
+                lines.append(f"{name}_count{labels(*key)} {hist.count}")
+
+        with self._lock:
+            histogram(
+                "http_request_duration_seconds", "Time from request to the start of the response.", self.latency
+            )
+            histogram("http_request_db_queries", "SQL statements executed per request.", self.queries)
+
+            lines.append("# HELP http_request_db_seconds_total Time spent in SQL statements by requests.")
+            lines.append("# TYPE http_request_db_seconds_total counter")
+            for key, seconds in sorted(self.db_seconds.items()):
+                lines.append(f"http_request_db_seconds_total{labels(*key)} {seconds}")
+
+            lines.append(f"# HELP http_slow_requests_total Requests slower than {SLOW_REQUEST_MS} ms.")
+            lines.append("# TYPE http_slow_requests_total counter")
+            lines.append(f"http_slow_requests_total {self.slow_requests}")
+            lines.append(f"# HELP db_slow_queries_total SQL statements slower than {SLOW_QUERY_MS} ms.")
+            lines.append("# TYPE db_slow_queries_total counter")
+            lines.append(f"db_slow_queries_total {self.slow_queries}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = MetricsRegistry()
+
+
+"""
+Function:       install_query_hooks
+Description:    Counts the statements and database time of the current request (tracked in a context variable,
+                so each request only sees its own queries) and logs statements slower than SLOW_QUERY_MS.
+                For an AsyncEngine pass its sync_engine, the hooks run inside the request's task.
+                Installing them again on the same engine (the app started twice) does nothing.
+"""
+
+
+_hooked_engines = weakref.WeakSet()
+
+
+def install_query_hooks(engine: Engine):
+    if engine in _hooked_engines:
+        return
+    _hooked_engines.add(engine)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info["query_started_at"].pop()
+
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += seconds
+
+        if seconds * 1000 >= SLOW_QUERY_MS:
+            registry.observe_slow_query()
+            logger.warning("Slow query (%.1f ms): %s", seconds * 1000, " ".join(statement.split())[:500])
+
+
+def _server_timing(seconds: float, stats: RequestStats) -> bytes:
+    return (
+        f'app;dur={seconds * 1000:.1f}, '
+        f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries"'
+    ).encode()
+
+
+def _route_path(scope) -> str:
+    route = scope.get("route")
+    if route is None and "app" in scope:
+        # answered by a middleware before routing, look the route up the way the router would
+        for candidate in scope["app"].router.routes:
+            if candidate.matches(scope)[0] == Match.FULL:
+                route = candidate
+                break
+    # unmatched paths share one label, so random URLs can not grow the registry
+    return getattr(route, "path_format", None) or getattr(route, "path", None) or "unmatched"
+
+
+"""
+Class:          MetricsMiddleware
+Description:    Times every request and, together with the query hooks, records its latency, number of queries
+                and database time per route. The latency runs until the response starts, so streamed bodies
+                (order events, exports) that stay open as long as the client reads them do not count; their
+                queries do. Adds a Server-Timing header with the same app and db times and logs requests
+                slower than SLOW_REQUEST_MS.
+"""
+
+
+class MetricsMiddleware:
+
+    # create_app passes Settings.metrics_enabled (METRICS_ENABLED)
+    def __init__(self, app, enabled: bool = True):
+        self.app = app
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled:
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        started_at = time.perf_counter()
+        seconds = None
+        status = 500
+
+        async def timed_send(message):
+            nonlocal status, seconds
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                seconds = time.perf_counter() - started_at
+                if SERVER_TIMING:
+                    headers = [*message.get("headers", [])]
+                    headers.append((b"server-timing", _server_timing(seconds, stats)))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            _request_stats.reset(token)
+            if seconds is None:
+                # failed before responding
+                seconds = time.perf_counter() - started_at
+            registry.observe_request(
+                scope["method"], _route_path(scope), status, seconds, stats, scope.get(HANDLED_BY, "endpoint")
+            )
+
+            if seconds * 1000 >= SLOW_REQUEST_MS:
+                registry.observe_slow_request()
+                logger.warning(
+                    "Slow request (%.1f ms, %d queries, %.1f ms in the database): %s %s",
+                    seconds * 1000, stats.queries, stats.db_seconds * 1000, scope["method"], scope["path"]
+                )
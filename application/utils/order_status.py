@@ -0,0 +1,77 @@
+# application/utils/order_status.py
+
+from datetime import datetime
+from typing import Optional, Tuple
+from fastapi import HTTPException
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.order import ORDER_TRANSITIONS, Order as ModelOrder, OrderStatus
+from utils.sales_rollups import record_status_change
+
+
+class SameStatus(Exception):
+    """The order already has the requested status, nothing was changed."""
+
+    def __init__(self, status: OrderStatus):
+        self.status = status
+
+
+"""
+Function:       transition_order
+Description:    Moves an order to `new_status` if ORDER_TRANSITIONS allows it, with a conditional
+                UPDATE ... WHERE id=? AND status=? [AND version=?] ... RETURNING instead of reading the order first.
+                The status is tried against each allowed previous status in turn, which is a single statement for
+                every status but `cancelled` (reachable from two). The version is incremented, so a change made
+                on a stale copy of the order matches no row.
+                Only when nothing was updated is the order read once, to tell 404 (no such order), 403 (not
+                assigned to `assigned_to`), SameStatus and 409 (stale version or transition not allowed) apart.
+                The sales rollups are moved to the new status in the same transaction.
+                Returns the updated order and its previous status, the caller commits.
+"""
+
+
+async def transition_order(
+        db: AsyncSession,
+        order_id: int,
+        new_status: OrderStatus,
+        expected_version: Optional[int] = None,
+        assigned_to: Optional[int] = None,
+) -> Tuple[ModelOrder, OrderStatus]:
+    conditions = [ModelOrder.id == order_id]
+    if expected_version is not None:
+        conditions.append(ModelOrder.version == expected_version)
+    if assigned_to is not None:
+        conditions.append(ModelOrder.assigned_to == assigned_to)
+
+    for prev_status, allowed in ORDER_TRANSITIONS.items():
+        if new_status not in allowed:
+            continue
+        order = (await db.execute(
+            update(ModelOrder)
+            .where(ModelOrder.status == prev_status, *conditions)
+            .values(status=new_status, version=ModelOrder.version + 1, updated_at=datetime.utcnow())
+            .returning(ModelOrder)
+            .execution_options(synchronize_session="fetch")
+        )).scalar_one_or_none()
+        if order is not None:
+            await record_status_change(db, order, prev_status)
+            return order, prev_status
+
+    current = (await db.execute(
+        select(ModelOrder.status, ModelOrder.version, ModelOrder.assigned_to).where(ModelOrder.id == order_id)
+    )).first()
+    if current is None:
+        raise HTTPException(status_code=404, detail="Order not found")
+    if assigned_to is not None and current.assigned_to != assigned_to:
+        raise HTTPException(status_code=403, detail="Order is not assigned to you")
+    if expected_version is not None and current.version != expected_version:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Order {order_id} was changed by someone else, its current version is {current.version}"
+        )
+    if current.status == new_status:
+        raise SameStatus(current.status)
+    raise HTTPException(
+        status_code=409,
+        detail=f"Order status can not change from {current.status.value} to {new_status.value}"
+    )
@@ -0,0 +1,129 @@
+# application/utils/pagination.py
+
+import base64
+import json
+import os
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+from fastapi import HTTPException
+from sqlalchemy import Row, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.order import Order as ModelOrder, OrderItem as ModelOrderItem, OrderStatus
+
+
+ORDERS_PAGE_SIZE = int(os.getenv("ORDERS_PAGE_SIZE", "20"))
+ORDERS_MAX_PAGE_SIZE = int(os.getenv("ORDERS_MAX_PAGE_SIZE", "100"))
+
+
+"""
+Function:       encode_cursor / decode_cursor
+Description:    Opaque keyset cursor holding the (created_at, id) of the last row of a page.
+"""
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+# the columns of schema.order.Order, selected as plain rows instead of ORM instances
+ORDER_COLUMNS = (
+    ModelOrder.id,
+    ModelOrder.user_id,
+    ModelOrder.total_amount,
+    ModelOrder.status,
+    ModelOrder.version,
+    ModelOrder.created_at,
+    ModelOrder.updated_at,
+    ModelOrder.assigned_to,
+    ModelOrder.assigned_at,
+)
+ORDER_ITEM_COLUMNS = (
+    ModelOrderItem.id,
+    ModelOrderItem.order_id,
+    ModelOrderItem.pizza_id,
+    ModelOrderItem.quantity,
+    ModelOrderItem.unit_price,
+)
+
+
+def select_orders():
+    return select(*ORDER_COLUMNS)
+
+
+"""
+Function:       with_items
+Description:    Turns order rows into dicts with their items, read for all orders with one IN query.
+"""
+
+
+async def with_items(db: AsyncSession, rows: Sequence[Row]) -> List[dict]:
+    orders = [dict(row._mapping, items=[]) for row in rows]
+    if not orders:
+        return orders
+
+    by_id = {order["id"]: order for order in orders}
+    items = await db.execute(
+        select(*ORDER_ITEM_COLUMNS)
+        .where(ModelOrderItem.order_id.in_(by_id))
+        .order_by(ModelOrderItem.id)
+    )
+    for item in items:
+        by_id[item.order_id]["items"].append(item._mapping)
+    return orders
+
+
+"""
+Function:       order_page
+Description:    One page of orders, newest first, using keyset pagination over (created_at, id).
+                Rows after the cursor are found through the index instead of an OFFSET scan, and the
+                order items of the whole page are loaded with one extra IN query. Both are read as plain rows,
+                without building ORM instances.
+"""
+
+
+async def order_page(
+        db: AsyncSession,
+        limit: int,
+        cursor: Optional[str] = None,
+        user_id: Optional[int] = None,
+        status: Optional[OrderStatus] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+) -> dict:
+    query = select_orders()
+
+    if user_id is not None:
+        query = query.where(ModelOrder.user_id == user_id)
+    if status is not None:
+        query = query.where(ModelOrder.status == status)
+    if created_from is not None:
+        query = query.where(ModelOrder.created_at >= created_from)
+    if created_to is not None:
+        query = query.where(ModelOrder.created_at < created_to)
+    if cursor:
+        query = query.where(tuple_(ModelOrder.created_at, ModelOrder.id) < tuple_(*decode_cursor(cursor)))
+
+    # one extra row tells whether there is a next page
+    orders = (await db.execute(
+        query.order_by(ModelOrder.created_at.desc(), ModelOrder.id.desc()).limit(limit + 1)
+    )).all()
+
+    next_cursor = None
+    if len(orders) > limit:
+        orders = orders[:limit]
+        next_cursor = encode_cursor(orders[-1].created_at, orders[-1].id)
+
+    return {
+        "items": await with_items(db, orders),
+        "next_cursor": next_cursor,
+    }
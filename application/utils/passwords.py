@@ -0,0 +1,129 @@
+# application/utils/passwords.py
+
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Optional, Tuple
+from fastapi import HTTPException, status
+
+
+# bcrypt cost factor, hashes made with any other cost are rehashed on the next successful login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# "thread" (bcrypt releases the GIL) or "process" to spread hashing over all cores
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# hashes allowed in flight at once, further signups / logins wait for a free slot
+PASSWORD_HASH_CONCURRENCY = int(os.getenv("PASSWORD_HASH_CONCURRENCY", str(PASSWORD_HASH_WORKERS)))
+
+# seconds a request may wait for a slot before it is answered with 503
+PASSWORD_HASH_QUEUE_TIMEOUT = float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT", "10"))
+
+_executor: Optional[Executor] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+@lru_cache(maxsize=None)
+def _context(rounds: int):
+    # passlib is imported with the first hash, not when the app starts
+    from passlib.context import CryptContext
+
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
+
+
+# module level, so that they can be sent to a process pool worker
+
+def _hash(password: str, rounds: int) -> str:
+    return _context(rounds).hash(password)
+
+
+def _verify_and_update(password: str, hashed_password: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    return _context(rounds).verify_and_update(password, hashed_password)
+
+
+def _get_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        if PASSWORD_HASH_EXECUTOR == "process":
+            _executor = ProcessPoolExecutor(
+                max_workers=PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        else:
+            _executor = ThreadPoolExecutor(
+                max_workers=PASSWORD_HASH_WORKERS,
+                thread_name_prefix="password-hash",
+            )
+    return _executor
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(PASSWORD_HASH_CONCURRENCY)
+    return _semaphore
+
+
+"""
+Function:       _run
+Description:    Runs a hashing function in the password executor, once one of the
+                PASSWORD_HASH_CONCURRENCY slots is free. Waiting longer than
+                PASSWORD_HASH_QUEUE_TIMEOUT for a slot raises 503, so a login storm
+                is shed instead of piling up behind the executor.
+"""
+
+
+async def _run(func, *args):
+    semaphore = _get_semaphore()
+    try:
+        await asyncio.wait_for(semaphore.acquire(), timeout=PASSWORD_HASH_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many login attempts in progress, please retry",
+            headers={"Retry-After": "1"},
+        )
+
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_executor(), func, *args)
+    finally:
+        semaphore.release()
+
+
+"""
+Function:       hash_password
+Description:    Hashes the password with the configured bcrypt cost, off the event loop.
+"""
+
+
+async def hash_password(password: str) -> str:
+    return await _run(_hash, password, BCRYPT_ROUNDS)
+
+
+"""
+Function:       verify_password
+Description:    Checks the password against the stored hash, off the event loop.
+                Returns (is_valid, new_hash), new_hash is set when the stored hash
+                was made with a different cost and should replace it.
+"""
+
+
+async def verify_password(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return await _run(_verify_and_update, password, hashed_password, BCRYPT_ROUNDS)
+
+
+def shutdown_password_executor():
+    global _executor, _semaphore
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+    _executor = None
+    _semaphore = None
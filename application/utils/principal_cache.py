@@ -0,0 +1,94 @@
+# application/utils/principal_cache.py
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+from sqlalchemy import event, inspect
+from models.user import User
+
+
+"""
+Class:          Principal
+Description:    The part of a user record needed to authorize a request,
+                returned by get_current_user instead of the full User row.
+"""
+
+
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    username: str
+    role: str
+    is_active: bool = True
+
+
+"""
+Class:          PrincipalCache
+Description:    In-process LRU cache of principals keyed by token subject (username).
+                Entries expire after ttl seconds, so changes made by other workers are picked up within ttl.
+"""
+
+
+class PrincipalCache:
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, subject: str) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(subject)
+            if entry is None:
+                return None
+            principal, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[subject]
+                return None
+            self._entries.move_to_end(subject)
+            return principal
+
+    def set(self, principal: Principal):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[principal.username] = (principal, time.monotonic() + self.ttl)
+            self._entries.move_to_end(principal.username)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, subject: str):
+        with self._lock:
+            self._entries.pop(subject, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+principal_cache = PrincipalCache(
+    maxsize=int(os.getenv("AUTH_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("AUTH_CACHE_TTL", "60")),
+)
+
+
+"""
+Function:       invalidate_user
+Description:    Drops the cached principal whenever a user row is updated or deleted through the ORM,
+                including the entry under the old username when the username itself changed.
+"""
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def invalidate_user(mapper, connection, target):
+    principal_cache.invalidate(target.username)
+    for old_username in inspect(target).attrs.username.history.deleted:
+        principal_cache.invalidate(old_username)
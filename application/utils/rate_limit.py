@@ -0,0 +1,222 @@
+# application/utils/rate_limit.py
+
+import importlib
+import math
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from jose import JWTError, jwt
+from utils.metrics import HANDLED_BY
+from utils.util_functions import ALGORITHM, SECRET_KEY
+
+
+# buckets kept by the in-memory store, the least recently used are dropped first
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+
+# take the client address from the first X-Forwarded-For entry, only behind a proxy that sets it
+RATE_LIMIT_TRUST_PROXY = os.getenv("RATE_LIMIT_TRUST_PROXY", "false").lower() in ("1", "true", "yes")
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    # bucket size, also the number of requests allowed per period
+    requests: int
+    period: float
+
+    @property
+    def rate(self) -> float:
+        return self.requests / self.period
+
+    @property
+    def policy(self) -> str:
+        return f"{self.requests};w={int(self.period)}"
+
+    @classmethod
+    def parse(cls, value: str) -> Optional["RateLimit"]:
+        """"10/60" allows 10 requests per 60 seconds, "off" or "0" turns the limit off."""
+        value = value.strip().lower()
+        if value in ("", "0", "off"):
+            return None
+        requests, _, period = value.partition("/")
+        return cls(int(requests), float(period or 60))
+
+
+# /users is strict by default: signup and login run bcrypt
+DEFAULT_RATE_LIMITS = {
+    "/users": "10/60",
+    "/customer": "120/60",
+    "/admin": "120/60",
+    "/delivery": "120/60",
+}
+
+
+def limits_from_env() -> Dict[str, RateLimit]:
+    limits = {}
+    for prefix, default in DEFAULT_RATE_LIMITS.items():
+        limit = RateLimit.parse(os.getenv(f"RATE_LIMIT_{prefix.strip('/').upper()}", default))
+        if limit is not None:
+            limits[prefix] = limit
+    return limits
+
+
+@dataclass(frozen=True)
+class Decision:
+    allowed: bool
+    remaining: int
+    # seconds until the bucket is full again
+    reset: float
+    # seconds until the next request would be allowed, 0 if this one was
+    retry_after: float
+
+
+"""
+Class:          RateLimitStore
+Description:    Token buckets by key. take() refills the bucket for the time passed since the last call and
+                takes one token if there is one. A store shared by the workers (Redis, ...) can be plugged in
+                with RATE_LIMIT_STORE="module:attribute"; the default only limits each worker on its own.
+"""
+
+
+class RateLimitStore(ABC):
+
+    @abstractmethod
+    async def take(self, key: str, limit: RateLimit) -> Decision:
+        ...
+
+
+class MemoryRateLimitStore(RateLimitStore):
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def take(self, key: str, limit: RateLimit) -> Decision:
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (float(limit.requests), now))
+        tokens = min(float(limit.requests), tokens + (now - updated_at) * limit.rate)
+
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+        return Decision(
+            allowed=allowed,
+            remaining=int(tokens),
+            reset=(limit.requests - tokens) / limit.rate,
+            retry_after=0 if allowed else (1 - tokens) / limit.rate,
+        )
+
+
+def load_store() -> RateLimitStore:
+    path = os.getenv("RATE_LIMIT_STORE")
+    if not path:
+        return MemoryRateLimitStore()
+    module_name, _, attribute = path.partition(":")
+    store = getattr(importlib.import_module(module_name), attribute)
+    return store() if isinstance(store, type) else store
+
+
+def _client_key(scope) -> str:
+    headers = dict(scope["headers"])
+    authorization = headers.get(b"authorization", b"").decode("latin-1")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            # signature checked, so nobody can spend someone else's bucket
+            claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            subject = claims.get("uid", claims.get("sub"))
+            if subject is not None:
+                return f"user:{subject}"
+        except JWTError:
+            pass
+
+    if RATE_LIMIT_TRUST_PROXY and b"x-forwarded-for" in headers:
+        return "ip:" + headers[b"x-forwarded-for"].decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+def _headers(limit: RateLimit, decision: Decision) -> list:
+    headers = [
+        (b"ratelimit-limit", str(limit.requests).encode()),
+        (b"ratelimit-remaining", str(decision.remaining).encode()),
+        (b"ratelimit-reset", str(math.ceil(decision.reset)).encode()),
+        (b"ratelimit-policy", limit.policy.encode()),
+    ]
+    if not decision.allowed:
+        headers.append((b"retry-after", str(math.ceil(decision.retry_after)).encode()))
+    return headers
+
+
+"""
+Class:          RateLimitMiddleware
+Description:    Limits requests per route prefix (RATE_LIMIT_USERS, RATE_LIMIT_CUSTOMER, ...) with a token bucket
+                per authenticated user, or per client address for requests without a valid token.
+                Rejected requests get 429 with Retry-After, and every limited response carries the
+                RateLimit-Limit, RateLimit-Remaining, RateLimit-Reset and RateLimit-Policy headers.
+"""
+
+
+class RateLimitMiddleware:
+
+    def __init__(
+            self,
+            app,
+            limits: Optional[Dict[str, RateLimit]] = None,
+            store: Optional[RateLimitStore] = None,
+            # create_app passes Settings.rate_limit_enabled (RATE_LIMIT_ENABLED)
+            enabled: bool = True,
+    ):
+        self.app = app
+        self.limits = limits_from_env() if limits is None else limits
+        # longest prefix first
+        self.prefixes = sorted(self.limits, key=len, reverse=True)
+        self.store = store
+        self.enabled = enabled
+
+    def _match(self, path: str) -> Optional[str]:
+        for prefix in self.prefixes:
+            if path == prefix or path.startswith(prefix.rstrip("/") + "/"):
+                return prefix
+        return None
+
+    async def __call__(self, scope, receive, send):
+        prefix = self._match(scope["path"]) if scope["type"] == "http" and self.enabled else None
+        if prefix is None:
+            return await self.app(scope, receive, send)
+
+        if self.store is None:
+            self.store = load_store()
+        limit = self.limits[prefix]
+        decision = await self.store.take(f"{prefix}:{_client_key(scope)}", limit)
+        headers = _headers(limit, decision)
+
+        if not decision.allowed:
+            scope[HANDLED_BY] = "rate_limit"
+            body = b'{"detail":"Too many requests"}'
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    *headers,
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), *headers]}
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
@@ -0,0 +1,126 @@
+# application/utils/sales_rollups.py
+
+from typing import Iterable, Tuple
+from sqlalchemy import Date, delete, func, insert, literal, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.dialect import upsert_insert
+from models.order import Order as ModelOrder, OrderItem as ModelOrderItem, OrderStatus
+from models.sales import DailyPizzaSales, DailySales
+
+DAILY_KEYS = ("day", "status")
+DAILY_AMOUNTS = ("order_count", "revenue")
+PIZZA_KEYS = ("day", "pizza_id", "status")
+PIZZA_AMOUNTS = ("order_count", "quantity", "revenue")
+
+
+def _pizza_rows(order_id: int, day, status: OrderStatus, sign: int):
+    # the order's items summed per pizza, in the column order of PIZZA_KEYS + PIZZA_AMOUNTS
+    return (
+        select(
+            literal(day, Date()),
+            ModelOrderItem.pizza_id,
+            literal(status, DailyPizzaSales.status.type),
+            literal(sign),
+            sign * func.sum(ModelOrderItem.quantity),
+            sign * func.sum(ModelOrderItem.quantity * ModelOrderItem.unit_price),
+        )
+        .where(ModelOrderItem.order_id == order_id)
+        .group_by(ModelOrderItem.pizza_id)
+    )
+
+
+async def _add(db: AsyncSession, model, keys: Iterable[str], amounts: Iterable[str], row: dict):
+    # row by row fallback for databases without an upsert
+    changed = (await db.execute(
+        update(model)
+        .where(*(getattr(model, key) == row[key] for key in keys))
+        .values({amount: getattr(model, amount) + row[amount] for amount in amounts})
+    )).rowcount
+    if not changed:
+        await db.execute(insert(model).values(row))
+
+
+"""
+Function:       apply_order
+Description:    Adds an order to the rollups, once per (status, sign) pair: sign 1 counts the order under the status,
+                -1 takes it out again. The daily row is changed with one multi-row upsert and the per-pizza rows with
+                one INSERT ... SELECT ... ON CONFLICT per pair, straight from the order's items.
+                Runs in the caller's transaction, so the rollups commit or roll back together with the order.
+"""
+
+
+async def apply_order(db: AsyncSession, order: ModelOrder, changes: Iterable[Tuple[OrderStatus, int]]):
+    changes = list(changes)
+    day = order.created_at.date()
+    insert_ = upsert_insert(db)
+
+    daily_rows = [
+        {"day": day, "status": status, "order_count": sign, "revenue": sign * order.total_amount}
+        for status, sign in changes
+    ]
+
+    if insert_ is None:
+        for row in daily_rows:
+            await _add(db, DailySales, DAILY_KEYS, DAILY_AMOUNTS, row)
+        for status, sign in changes:
+            for values in (await db.execute(_pizza_rows(order.id, day, status, sign))).all():
+                row = dict(zip(PIZZA_KEYS + PIZZA_AMOUNTS, values))
+                await _add(db, DailyPizzaSales, PIZZA_KEYS, PIZZA_AMOUNTS, row)
+        return
+
+    daily = insert_(DailySales).values(daily_rows)
+    await db.execute(daily.on_conflict_do_update(
+        index_elements=list(DAILY_KEYS),
+        set_={amount: getattr(DailySales, amount) + daily.excluded[amount] for amount in DAILY_AMOUNTS},
+    ))
+
+    for status, sign in changes:
+        pizzas = insert_(DailyPizzaSales).from_select(
+            list(PIZZA_KEYS + PIZZA_AMOUNTS), _pizza_rows(order.id, day, status, sign)
+        )
+        await db.execute(pizzas.on_conflict_do_update(
+            index_elements=list(PIZZA_KEYS),
+            set_={amount: getattr(DailyPizzaSales, amount) + pizzas.excluded[amount] for amount in PIZZA_AMOUNTS},
+        ))
+
+
+async def record_new_order(db: AsyncSession, order: ModelOrder):
+    await apply_order(db, order, [(order.status, 1)])
+
+
+async def record_status_change(db: AsyncSession, order: ModelOrder, prev_status: OrderStatus):
+    await apply_order(db, order, [(prev_status, -1), (order.status, 1)])
+
+
+"""
+Function:       rebuild_rollups
+Description:    Recomputes both rollup tables from orders and order_items, for backfilling and repairs.
+                Scans every order, so it is meant for `python manage.py rebuild-rollups`, not for requests.
+"""
+
+
+def rebuild_rollups(conn: Connection):
+    day = func.date(ModelOrder.created_at)
+
+    conn.execute(delete(DailyPizzaSales))
+    conn.execute(delete(DailySales))
+
+    conn.execute(insert(DailySales).from_select(
+        list(DAILY_KEYS + DAILY_AMOUNTS),
+        select(day, ModelOrder.status, func.count(ModelOrder.id), func.coalesce(func.sum(ModelOrder.total_amount), 0))
+        .group_by(day, ModelOrder.status)
+    ))
+    conn.execute(insert(DailyPizzaSales).from_select(
+        list(PIZZA_KEYS + PIZZA_AMOUNTS),
+        select(
+            day,
+            ModelOrderItem.pizza_id,
+            ModelOrder.status,
+            func.count(func.distinct(ModelOrder.id)),
+            func.sum(ModelOrderItem.quantity),
+            func.sum(ModelOrderItem.quantity * ModelOrderItem.unit_price),
+        )
+        .join(ModelOrder, ModelOrder.id == ModelOrderItem.order_id)
+        .group_by(day, ModelOrderItem.pizza_id, ModelOrder.status)
+    ))
@@ -0,0 +1,364 @@
+# application/utils/seed_data.py
+
+import random
+import time
+from bisect import bisect
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Callable, Dict, Iterator, List
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.engine import Connection
+from models.cart import CartItem
+from models.delivery import DeliveryComment
+from models.order import Order, OrderItem, OrderStatus
+from models.pizza import Pizza
+from models.user import User
+from passlib.hash import bcrypt
+from utils.passwords import BCRYPT_ROUNDS
+from utils.sales_rollups import rebuild_rollups
+
+
+# every generated user can log in with this password
+SEED_PASSWORD = "password"
+
+BCRYPT_SALT_ALPHABET = "./ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+
+PIZZA_NAMES = [
+    "Margherita", "Pepperoni", "Quattro Formaggi", "Hawaiian", "Diavola", "Capricciosa", "Marinara",
+    "Funghi", "Prosciutto", "Vegetariana", "BBQ Chicken", "Calzone", "Napoletana", "Tonno", "Quattro Stagioni",
+    "Meat Feast", "Buffalo", "Pesto", "Truffle", "Spinach and Ricotta",
+]
+
+DELIVERY_COMMENTS = [
+    "Left at the door", "Handed to the customer", "Customer was not home, left with a neighbour",
+    "Gate code needed", "Delivered to reception", "Traffic, a few minutes late", "Rang twice",
+]
+
+# orders per hour of the day, lunch and dinner peaks
+HOUR_WEIGHTS = [1, 0, 0, 0, 0, 0, 1, 2, 3, 4, 6, 12, 20, 16, 8, 6, 8, 14, 22, 24, 18, 10, 5, 2]
+
+# weekday(): Friday and Saturday are the busy days
+WEEKDAY_WEIGHTS = [0.9, 0.9, 1.0, 1.0, 1.3, 1.4, 1.1]
+
+# order sizes, most orders have one or two different pizzas
+ITEM_COUNT_WEIGHTS = {1: 50, 2: 30, 3: 13, 4: 5, 5: 2}
+QUANTITY_WEIGHTS = {1: 75, 2: 18, 3: 5, 4: 2}
+
+# share of the orders older than RECENT that were cancelled, the others were delivered
+CANCELLED_SHARE = 0.06
+
+# orders placed in the last RECENT before the end are still in the kitchen or on the road
+RECENT = timedelta(hours=1)
+
+HOUR = timedelta(hours=1)
+
+# the default end of the generated orders, fixed so that the same seed gives the same rows in every run
+SEED_END = datetime(2026, 1, 1)
+
+
+@dataclass
+class SeedConfig:
+    customers: int = 1000
+    delivery_partners: int = 50
+    admins: int = 2
+    pizzas: int = 30
+    orders: int = 10000
+    # days before `end` the orders are spread over, busier towards the end
+    days: int = 365
+    # the time of the last orders (UTC)
+    end: datetime = SEED_END
+    # share of the customers with something in their cart
+    cart_share: float = 0.2
+    # share of the delivered orders with a comment of the delivery partner
+    comment_share: float = 0.3
+    seed: int = 42
+    batch_size: int = 10000
+
+
+def _cumulative(weights) -> List[float]:
+    return list(accumulate(weights))
+
+
+def _skewed_weights(count: int, exponent: float) -> List[float]:
+    # zipf like: a few pizzas / customers make most of the orders
+    return [1 / (rank + 1) ** exponent for rank in range(count)]
+
+
+def _next_id(conn: Connection, model) -> int:
+    return (conn.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+
+def _day_windows(start: datetime, end: datetime) -> List[tuple]:
+    """Every day from start to end: its midnight, and the weight of each of its hours that lies between the two."""
+    windows = []
+    midnight = datetime.combine(start.date(), datetime.min.time())
+    while midnight < end:
+        weights = []
+        for hour, weight in enumerate(HOUR_WEIGHTS):
+            hour_start = midnight + hour * HOUR
+            inside = min(hour_start + HOUR, end) - max(hour_start, start)
+            weights.append(weight * max(inside / HOUR, 0.0))
+        windows.append((midnight, weights))
+        midnight += timedelta(days=1)
+    return windows
+
+
+def _orders_per_day(config: SeedConfig, windows: List[tuple]) -> List[int]:
+    """Splits config.orders over the days, growing by half over the range and with busier weekends."""
+    weights = [
+        (1 + 0.5 * day / max(len(windows) - 1, 1)) * WEEKDAY_WEIGHTS[midnight.weekday()] * sum(hour_weights)
+        for day, (midnight, hour_weights) in enumerate(windows)
+    ]
+    total = sum(weights)
+    counts = [int(config.orders * weight / total) for weight in weights]
+    # the rounding remainder goes to the last days that have orders at all
+    days = [day for day, weight in enumerate(weights) if weight > 0]
+    for number in range(config.orders - sum(counts)):
+        counts[days[-1 - number % len(days)]] += 1
+    return counts
+
+
+"""
+Class:          SeedGenerator
+Description:    Generates users of every role, pizzas, carts, orders with their items and delivery comments
+                and bulk loads them with batched core INSERTs (executemany of config.batch_size rows), without
+                the ORM. All values come from one random.Random(config.seed), and ids are assigned here from
+                the current maximum, so the same seed, end and starting database give the same rows. Users are
+                named after their ids (customer123), skipping ids whose name an existing user already has.
+                Orders are generated day by day in time order, so ids grow with created_at as they do in
+                production. Their status follows from their age: orders before the last hour were delivered
+                or cancelled, later ones are still placed, being prepared or out for delivery.
+"""
+
+
+class SeedGenerator:
+
+    def __init__(self, conn: Connection, config: SeedConfig, progress: Callable[[str], None] = print):
+        self.conn = conn
+        self.config = config
+        self.progress = progress
+        self.rng = random.Random(config.seed)
+        self.end = config.end
+        self.counts: Dict[str, int] = {}
+
+    def _insert(self, model, rows: Iterator[dict]):
+        table = model.__table__
+        started_at = time.perf_counter()
+        count = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.config.batch_size:
+                self.conn.execute(insert(table), batch)
+                count += len(batch)
+                batch = []
+                self.progress(f"{table.name}: {count} rows ({time.perf_counter() - started_at:.1f} s)")
+        if batch:
+            self.conn.execute(insert(table), batch)
+            count += len(batch)
+        self.counts[table.name] = self.counts.get(table.name, 0) + count
+
+    def run(self) -> Dict[str, int]:
+        # hashed once with a salt from the seed, bcrypt per user would take longer than everything else
+        salt = "".join(self.rng.choice(BCRYPT_SALT_ALPHABET) for _ in range(21)) + self.rng.choice(".Oeu")
+        hashed_password = bcrypt.using(rounds=BCRYPT_ROUNDS, salt=salt).hash(SEED_PASSWORD)
+        self.admin_ids = self._users("admin", self.config.admins, hashed_password)
+        self.partner_ids = self._users("delivery_partner", self.config.delivery_partners, hashed_password)
+        self.customer_ids = self._users("customer", self.config.customers, hashed_password)
+        self._pizzas()
+        self._carts()
+        self._orders()
+
+        if self.conn.dialect.name == "postgresql":
+            # the ids were given explicitly, move the sequences past them
+            for model in (User, Pizza, CartItem, Order, OrderItem, DeliveryComment):
+                table = model.__tablename__
+                self.conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                    f"(SELECT COALESCE(MAX(id), 0) + 1 FROM {table}), false)"
+                ))
+
+        self.progress("rebuilding the sales rollups")
+        rebuild_rollups(self.conn)
+        return self.counts
+
+    def _users(self, role: str, count: int, hashed_password: str) -> List[int]:
+        # names follow the ids, skip the ids whose name or email is already taken by an existing user
+        taken = set(self.conn.execute(select(User.username).where(User.username.like(f"{role}%"))).scalars())
+        taken.update(self.conn.execute(select(User.email).where(User.email.like(f"{role}%"))).scalars())
+        ids = []
+        user_id = _next_id(self.conn, User)
+        while len(ids) < count:
+            if f"{role}{user_id}" not in taken and f"{role}{user_id}@example.com" not in taken:
+                ids.append(user_id)
+            user_id += 1
+        self._insert(User, (
+            {
+                "id": user_id,
+                "username": f"{role}{user_id}",
+                "email": f"{role}{user_id}@example.com",
+                "hashed_password": hashed_password,
+                "role": role,
+                "is_active": True,
+            }
+            for user_id in ids
+        ))
+        return ids
+
+    def _pizzas(self):
+        rng = self.rng
+        first_id = _next_id(self.conn, Pizza)
+        self.pizzas = []
+        for number in range(self.config.pizzas):
+            name = PIZZA_NAMES[number % len(PIZZA_NAMES)]
+            if number >= len(PIZZA_NAMES):
+                name = f"{name} {number // len(PIZZA_NAMES) + 1}"
+            self.pizzas.append({
+                "id": first_id + number,
+                "name": name,
+                "description": f"Seeded {name.lower()} pizza",
+                "price": rng.randrange(14, 37) / 2,
+                "is_available": rng.random() < 0.95,
+            })
+        self._insert(Pizza, iter(self.pizzas))
+
+        # popularity does not follow the id order
+        popular = self.pizzas[:]
+        rng.shuffle(popular)
+        self.popular_pizzas = popular
+        self.pizza_weights = _cumulative(_skewed_weights(len(popular), 1.1))
+
+    def _pick_pizzas(self, count: int) -> List[dict]:
+        picked = {}
+        while len(picked) < min(count, len(self.popular_pizzas)):
+            pizza = self.rng.choices(self.popular_pizzas, cum_weights=self.pizza_weights)[0]
+            picked[pizza["id"]] = pizza
+        return list(picked.values())
+
+    def _carts(self):
+        rng = self.rng
+        available = [pizza for pizza in self.pizzas if pizza["is_available"]]
+        if not available:
+            return
+        first_id = _next_id(self.conn, CartItem)
+
+        def rows():
+            item_id = first_id
+            for customer_id in self.customer_ids:
+                if rng.random() >= self.config.cart_share:
+                    continue
+                for pizza in rng.sample(available, min(len(available), rng.randint(1, 3))):
+                    yield {
+                        "id": item_id, "user_id": customer_id, "pizza_id": pizza["id"], "quantity": rng.randint(1, 3),
+                    }
+                    item_id += 1
+
+        self._insert(CartItem, rows())
+
+    def _status(self, created_at: datetime):
+        """Status, version, assignment and last update of an order placed at created_at."""
+        rng = self.rng
+        age = self.end - created_at
+        if age > RECENT:
+            if rng.random() < CANCELLED_SHARE:
+                return OrderStatus.CANCELLED, 2, None, created_at + timedelta(minutes=rng.randint(1, 15))
+            status = OrderStatus.DELIVERED
+        else:
+            minutes = age.total_seconds() / 60
+            status = (
+                OrderStatus.OUT_FOR_DELIVERY if minutes > 40
+                else OrderStatus.PREPARING if minutes > 15
+                else OrderStatus.PLACED
+            )
+
+        if status == OrderStatus.PLACED:
+            return status, 1, None, created_at
+        if status == OrderStatus.PREPARING:
+            return status, 2, None, created_at + timedelta(minutes=rng.randint(2, 10))
+        # prepared, claimed from the dispatch queue and taken out (and delivered)
+        assigned_at = created_at + timedelta(minutes=rng.randint(12, 30))
+        if status == OrderStatus.OUT_FOR_DELIVERY:
+            return status, 4, assigned_at, assigned_at + timedelta(minutes=rng.randint(1, 5))
+        return status, 5, assigned_at, assigned_at + timedelta(minutes=rng.randint(10, 40))
+
+    def _orders(self):
+        rng = self.rng
+        config = self.config
+        if not self.customer_ids or not self.pizzas or not config.orders:
+            return
+
+        customers = self.customer_ids[:]
+        rng.shuffle(customers)
+        customer_weights = _cumulative(_skewed_weights(len(customers), 0.8))
+        item_counts, item_count_weights = list(ITEM_COUNT_WEIGHTS), _cumulative(ITEM_COUNT_WEIGHTS.values())
+        quantities, quantity_weights = list(QUANTITY_WEIGHTS), _cumulative(QUANTITY_WEIGHTS.values())
+        start = self.end - timedelta(days=config.days)
+        windows = _day_windows(start, self.end)
+        self.progress(f"orders: from {start.isoformat()} to {self.end.isoformat()}")
+        order_id = _next_id(self.conn, Order)
+        item_id = _next_id(self.conn, OrderItem)
+        comment_id = _next_id(self.conn, DeliveryComment)
+        started_at = time.perf_counter()
+
+        orders, items, comments = [], [], []
+        done = 0
+        for (midnight, weights), count in zip(windows, _orders_per_day(config, windows)):
+            if not count:
+                continue
+            hour_weights = _cumulative(weights)
+            times = []
+            for _ in range(count):
+                hour_start = midnight + bisect(hour_weights, rng.random() * hour_weights[-1]) * HOUR
+                # the first and last hour of the range may only be partly inside it
+                earliest, latest = max(hour_start, start), min(hour_start + HOUR, self.end)
+                times.append(earliest + (latest - earliest) * rng.random())
+            for created_at in sorted(times):
+                status, version, assigned_at, updated_at = self._status(created_at)
+                assigned_to = rng.choice(self.partner_ids) if assigned_at and self.partner_ids else None
+
+                total_amount = 0.0
+                item_count = item_counts[bisect(item_count_weights, rng.random() * item_count_weights[-1])]
+                for pizza in self._pick_pizzas(item_count):
+                    quantity = quantities[bisect(quantity_weights, rng.random() * quantity_weights[-1])]
+                    total_amount += pizza["price"] * quantity
+                    items.append({
+                        "id": item_id, "order_id": order_id, "pizza_id": pizza["id"],
+                        "quantity": quantity, "unit_price": pizza["price"],
+                    })
+                    item_id += 1
+
+                orders.append({
+                    "id": order_id,
+                    "user_id": rng.choices(customers, cum_weights=customer_weights)[0],
+                    "total_amount": round(total_amount, 2),
+                    "status": status,
+                    "version": version,
+                    "created_at": created_at,
+                    "updated_at": updated_at,
+                    "assigned_to": assigned_to,
+                    "assigned_at": assigned_at if assigned_to else None,
+                })
+                if status == OrderStatus.DELIVERED and assigned_to and rng.random() < config.comment_share:
+                    comments.append({
+                        "id": comment_id, "order_id": order_id, "current_user_id": assigned_to,
+                        "comment": rng.choice(DELIVERY_COMMENTS),
+                    })
+                    comment_id += 1
+                order_id += 1
+
+                if len(orders) >= config.batch_size:
+                    done += self._flush_orders(orders, items, comments)
+                    self.progress(f"orders: {done}/{config.orders} ({time.perf_counter() - started_at:.1f} s)")
+                    orders, items, comments = [], [], []
+
+        if orders:
+            done += self._flush_orders(orders, items, comments)
+            self.progress(f"orders: {done}/{config.orders} ({time.perf_counter() - started_at:.1f} s)")
+
+    def _flush_orders(self, orders: List[dict], items: List[dict], comments: List[dict]) -> int:
+        for model, rows in ((Order, orders), (OrderItem, items), (DeliveryComment, comments)):
+            if rows:
+                self.conn.execute(insert(model.__table__), rows)
+                self.counts[model.__tablename__] = self.counts.get(model.__tablename__, 0) + len(rows)
+        return len(orders)
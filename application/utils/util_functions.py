@@ -2,22 +2,24 @@
 
 import os
 from typing import List, Optional
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends, HTTPException, status
 from jose import jwt, JWTError
-from database.database import get_db
+from database.database import get_async_db
 from models.user import User
+from utils.principal_cache import Principal, principal_cache
 from datetime import datetime, timedelta
 from fastapi.security import OAuth2PasswordBearer
 from schema.auth import TokenData, UserResponse
-from dotenv import load_dotenv
 
 
-load_dotenv()
-
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
-EXPIRE_TIME = os.getenv("EXPIRE_TIME")
+EXPIRE_TIME = int(os.getenv("EXPIRE_TIME", "1"))
+
+# when enabled, the id and role claims written by login are trusted and the user table is not read at all
+TRUST_TOKEN_CLAIMS = os.getenv("AUTH_TRUST_TOKEN_CLAIMS", "false").lower() in ("1", "true", "yes")
 
 """
 Function:       create_access_token
@@ -40,14 +42,31 @@ oauth2_scheme = OAuth2PasswordBearer(
 )
 
 
+"""
+Function:       principal_claims
+Description:    The claims login adds next to "sub", so that get_current_user can skip
+                the user lookup when AUTH_TRUST_TOKEN_CLAIMS is enabled.
+"""
+
+
+def principal_claims(user) -> dict:
+    return {
+        "uid": user.id,
+        "role": user.role,
+        "active": user.is_active,
+    }
+
+
 """
 Function:       get_current_user
 Description:    It gets the current logged in user from the token, 
                 mainly used for role based access of API endpoints.
+                The user is served from the principal cache, or straight from the token claims
+                if AUTH_TRUST_TOKEN_CLAIMS is enabled, the database is only read on a cache miss.
 """
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="could not validate credentials",
@@ -69,12 +88,29 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     except JWTError:
         raise credentials_exception
 
-    user = db.query(User).filter(User.username == username).first()
+    if TRUST_TOKEN_CLAIMS and "uid" in payload and "role" in payload:
+        return Principal(
+            id=payload["uid"],
+            username=username,
+            role=payload["role"],
+            is_active=payload.get("active", True),
+        )
+
+    principal = principal_cache.get(username)
+    if principal is not None:
+        return principal
+
+    user = (await db.execute(
+        select(User.id, User.username, User.role, User.is_active).where(User.username == username)
+    )).first()
 
     if user is None:
         raise credentials_exception
 
-    return user
+    principal = Principal(**user._mapping)
+    principal_cache.set(principal)
+
+    return principal
 
 
 """
@@ -0,0 +1,199 @@
+# benchmarks/bench.py
+
+"""
+Load tests of the API, run from the repository root:
+
+    python benchmarks/bench.py run                          in-process, 10 virtual users for 30 seconds
+    python benchmarks/bench.py run --server --workers 4     through uvicorn on localhost
+    python benchmarks/bench.py run --concurrency 50 --scenarios browse=10,place_order=4
+    python benchmarks/bench.py run --sync-sessions          the routers on the sync engine, in the threadpool
+    python benchmarks/bench.py compare old.json new.json    per endpoint changes, exits 1 on regressions
+
+Results are written as JSON to benchmarks/results/ (or --output), named after the commit they were run on.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from harness import Client, Recorder, configure_environment, in_process_client, run_load, uvicorn_client
+from scenarios import DEFAULT_WEIGHTS, SCENARIOS, parse_weights, prepare
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+def git_commit() -> dict:
+    def git(*args):
+        return subprocess.run(
+            ["git", *args], cwd=RESULTS_DIR.parent, capture_output=True, text=True
+        ).stdout.strip()
+
+    try:
+        commit = git("rev-parse", "HEAD") or None
+        return {"commit": commit, "dirty": bool(git("status", "--porcelain", "--", "application"))}
+    except OSError:
+        return {"commit": None, "dirty": None}
+
+
+async def benchmark(args) -> dict:
+    recorder = Recorder()
+    if args.server:
+        connection = uvicorn_client(args.concurrency, workers=args.workers)
+    else:
+        # imported only now, the environment has to be set first
+        import main
+        # the slow request and query warnings would drown the report
+        logging.getLogger("uvicorn.error").setLevel(logging.ERROR)
+        connection = in_process_client(main.app)
+
+    async with connection as http:
+        client = Client(http, recorder)
+        started_at = time.perf_counter()
+        data = await prepare(client, args.run_id, args.concurrency, args.pizzas)
+        print(f"prepared {len(data.customers)} customers, {len(data.partners)} partners and "
+              f"{len(data.pizza_ids)} pizzas in {time.perf_counter() - started_at:.1f} s", file=sys.stderr)
+
+        runs = await run_load(
+            client, SCENARIOS, args.weights, data,
+            concurrency=args.concurrency, duration=args.duration, warmup=args.warmup, seed=args.seed,
+        )
+
+    return {
+        "meta": {
+            **git_commit(),
+            "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "mode": "uvicorn" if args.server else "in-process",
+            "workers": args.workers if args.server else None,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "seed": args.seed,
+            "pizzas": args.pizzas,
+            "weights": args.weights,
+            "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+            "sessions": "sync" if args.sync_sessions else "async",
+            "bcrypt_rounds": int(os.getenv("BCRYPT_ROUNDS", "12")),
+        },
+        "totals": recorder.totals(),
+        "scenarios": runs,
+        "endpoints": recorder.report(),
+    }
+
+
+def print_report(result: dict):
+    totals = result["totals"]
+    print(f"\n{'endpoint':<45} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for endpoint, stats in result["endpoints"].items():
+        print(
+            f"{endpoint:<45} {stats['requests']:>9} {stats['errors']:>7} {stats['throughput']:>9.1f} "
+            f"{stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}"
+        )
+    print(
+        f"{'total':<45} {totals['requests']:>9} {totals['errors']:>7} {totals['throughput']:>9.1f} "
+        f"{totals['p50_ms']:>9.2f} {totals['p95_ms']:>9.2f} {totals['p99_ms']:>9.2f}"
+    )
+    failed = {name: runs["failed"] for name, runs in result["scenarios"].items() if runs["failed"]}
+    if failed:
+        print(f"\nfailed scenario runs: {failed}")
+
+
+def run(args):
+    args.weights = parse_weights(args.scenarios) if args.scenarios else dict(DEFAULT_WEIGHTS)
+    args.run_id = args.run_id or f"bench{int(time.time())}"
+    configure_environment(args.database_url)
+    # read by create_app, in this process or in the uvicorn workers
+    os.environ["DB_SYNC_SESSIONS"] = "true" if args.sync_sessions else "false"
+
+    result = asyncio.run(benchmark(args))
+    print_report(result)
+
+    output = Path(args.output) if args.output else RESULTS_DIR / "{}-{}.json".format(
+        (result["meta"]["commit"] or "unknown")[:10], datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2))
+    print(f"\nresults written to {output}")
+
+
+"""
+Function:       compare
+Description:    Compares two result files endpoint by endpoint. An endpoint regressed when its p95 latency grew,
+                or its throughput dropped, by more than --threshold percent; the exit code is 1 if any did.
+"""
+
+
+def compare(args):
+    old, new = (json.loads(Path(path).read_text()) for path in (args.old, args.new))
+    regressions = []
+
+    def change(before, after):
+        return (after - before) / before * 100 if before else 0.0
+
+    print(f"{'endpoint':<45} {'p95 ms':>19} {'change':>8} {'req/s':>17} {'change':>8}")
+    rows = [(endpoint, old["endpoints"][endpoint], stats) for endpoint, stats in new["endpoints"].items()
+            if endpoint in old["endpoints"]]
+    rows.append(("total", old["totals"], new["totals"]))
+    for endpoint, before, after in rows:
+        latency = change(before["p95_ms"], after["p95_ms"])
+        throughput = change(before["throughput"], after["throughput"])
+        regressed = latency > args.threshold or throughput < -args.threshold
+        if regressed:
+            regressions.append(endpoint)
+        print(
+            f"{endpoint:<45} {before['p95_ms']:>9.2f}→{after['p95_ms']:<9.2f} {latency:>+7.1f}% "
+            f"{before['throughput']:>8.1f}→{after['throughput']:<8.1f} {throughput:>+7.1f}%"
+            + ("  REGRESSION" if regressed else "")
+        )
+
+    for name in ("mode", "sessions", "concurrency", "duration", "database", "bcrypt_rounds"):
+        if old["meta"].get(name) != new["meta"].get(name):
+            print(f"note: {name} differs ({old['meta'].get(name)} vs {new['meta'].get(name)})")
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.threshold}%")
+        sys.exit(1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="bench.py")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the load test and write the results")
+    run_parser.add_argument("--concurrency", type=int, default=10, help="virtual users")
+    run_parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    run_parser.add_argument("--warmup", type=float, default=5, help="seconds run before measuring")
+    run_parser.add_argument("--scenarios", default=None,
+                            help=f"weights, e.g. browse=10,place_order=4 (from {', '.join(SCENARIOS)})")
+    run_parser.add_argument("--pizzas", type=int, default=20, help="size of the menu")
+    run_parser.add_argument("--seed", type=int, default=1, help="seed of the scenario choices")
+    run_parser.add_argument("--server", action="store_true", help="run the app with uvicorn on localhost")
+    run_parser.add_argument("--workers", type=int, default=1, help="uvicorn workers, with --server")
+    run_parser.add_argument("--sync-sessions", action="store_true",
+                            help="serve the routers from the sync engine in the threadpool (DB_SYNC_SESSIONS)")
+    run_parser.add_argument("--database-url", default=None,
+                            help="database to run against, a temporary SQLite file by default")
+    run_parser.add_argument("--run-id", default=None, help="prefix of the created users and pizzas")
+    run_parser.add_argument("--output", default=None, help="result file, benchmarks/results/<commit>-<time>.json")
+    run_parser.set_defaults(handler=run)
+
+    compare_parser = commands.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=10, help="allowed change in percent")
+    compare_parser.set_defaults(handler=compare)
+
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+# benchmarks/harness.py
+
+import asyncio
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+import httpx
+
+APPLICATION_DIR = Path(__file__).resolve().parent.parent / "application"
+
+
+"""
+Function:       configure_environment
+Description:    Settings for the app under test, set before it is imported (or passed to the uvicorn process).
+                Without a DATABASE_URL a fresh SQLite file in a temporary directory is used. Rate limiting is
+                turned off, the benchmark would only measure 429 responses otherwise. Variables that are
+                already set are kept, so BCRYPT_ROUNDS, DB_POOL_SIZE, ... can be varied from the shell.
+"""
+
+
+def configure_environment(database_url: Optional[str] = None) -> Dict[str, str]:
+    if database_url:
+        os.environ["DATABASE_URL"] = database_url
+    elif not os.getenv("DATABASE_URL"):
+        directory = tempfile.mkdtemp(prefix="pizza-benchmark-")
+        os.environ["DATABASE_URL"] = f"sqlite:///{directory}/benchmark.db"
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    os.environ.setdefault("ALGORITHM", "HS256")
+    if str(APPLICATION_DIR) not in sys.path:
+        sys.path.insert(0, str(APPLICATION_DIR))
+    return dict(os.environ)
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Linear interpolation between the closest ranks, q in 0..100."""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q / 100
+    lower = math.floor(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+"""
+Class:          Recorder
+Description:    Latencies and unexpected responses per endpoint, labelled with the method and path template
+                ("PUT /admin/orders/{order_id}/status") so that every order id counts towards the same endpoint.
+                Nothing is recorded while `recording` is off, during the setup and warm up.
+"""
+
+
+class Recorder:
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.recording = False
+        self.started_at = None
+        self.stopped_at = None
+
+    def start(self):
+        self.recording = True
+        self.started_at = time.perf_counter()
+
+    def stop(self):
+        self.recording = False
+        self.stopped_at = time.perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        return (self.stopped_at or time.perf_counter()) - self.started_at
+
+    def observe(self, endpoint: str, seconds: float, status: int, expected: bool):
+        if not self.recording:
+            return
+        self.latencies[endpoint].append(seconds)
+        self.statuses[endpoint][status] += 1
+        if not expected:
+            self.errors[endpoint] += 1
+
+    def report(self) -> Dict[str, dict]:
+        endpoints = {}
+        for endpoint in sorted(self.latencies):
+            values = sorted(self.latencies[endpoint])
+            endpoints[endpoint] = {
+                "requests": len(values),
+                "errors": self.errors.get(endpoint, 0),
+                "statuses": {str(status): count for status, count in sorted(self.statuses[endpoint].items())},
+                "throughput": len(values) / self.elapsed,
+                "mean_ms": sum(values) / len(values) * 1000,
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "p99_ms": percentile(values, 99) * 1000,
+                "max_ms": values[-1] * 1000,
+            }
+        return endpoints
+
+    def totals(self) -> dict:
+        values = sorted(value for latencies in self.latencies.values() for value in latencies)
+        return {
+            "requests": len(values),
+            "errors": sum(self.errors.values()),
+            "throughput": len(values) / self.elapsed if values else 0.0,
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+        }
+
+
+class UnexpectedResponse(Exception):
+
+    def __init__(self, endpoint: str, response: httpx.Response):
+        super().__init__(f"{endpoint} returned {response.status_code}: {response.text[:200]}")
+        self.response = response
+
+
+"""
+Class:          Client
+Description:    Sends the requests of the scenarios and times them. Paths are given as templates with their
+                parameters, request("GET", "/customer/orders/{order_id}", order_id=3), and the template is the
+                endpoint the time is recorded under. Responses outside `expect` count as errors and raise
+                UnexpectedResponse, which ends that scenario run.
+"""
+
+
+class Client:
+
+    def __init__(self, http: httpx.AsyncClient, recorder: Recorder):
+        self.http = http
+        self.recorder = recorder
+
+    async def request(
+            self,
+            method: str,
+            template: str,
+            token: Optional[str] = None,
+            expect: Iterable[int] = (200,),
+            **kwargs,
+    ) -> httpx.Response:
+        path_params = {name: kwargs.pop(name) for name in list(kwargs) if "{" + name + "}" in template}
+        headers = kwargs.pop("headers", {})
+        if token is not None:
+            headers["Authorization"] = f"Bearer {token}"
+
+        endpoint = f"{method} {template}"
+        started_at = time.perf_counter()
+        response = await self.http.request(method, template.format(**path_params), headers=headers, **kwargs)
+        expected = response.status_code in expect
+        self.recorder.observe(endpoint, time.perf_counter() - started_at, response.status_code, expected)
+        if not expected:
+            raise UnexpectedResponse(endpoint, response)
+        return response
+
+
+"""
+Function:       in_process_client
+Description:    httpx client calling the ASGI app directly, without sockets. Measures the application and the
+                database only; the client shares the event loop with the app. The app's lifespan runs around
+                it, as it would in a server.
+"""
+
+
+@asynccontextmanager
+async def in_process_client(app):
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=60) as http:
+            yield http
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+"""
+Function:       uvicorn_client
+Description:    Starts `uvicorn main:app` on a free localhost port with the given number of workers, and yields an
+                httpx client connected to it. Measures the whole stack, HTTP parsing and the connection pool
+                included. The server is stopped when the block ends.
+"""
+
+
+@asynccontextmanager
+async def uvicorn_client(concurrency: int, workers: int = 1, startup_timeout: float = 60):
+    port = _free_port()
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--log-level", "error", "--no-access-log",
+        ],
+        cwd=APPLICATION_DIR,
+        env=dict(os.environ),
+    )
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as http:
+            deadline = time.monotonic() + startup_timeout
+            while True:
+                if server.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with code {server.returncode}")
+                try:
+                    await http.get("/openapi.json")
+                    break
+                except httpx.TransportError:
+                    if time.monotonic() > deadline:
+                        raise RuntimeError(f"uvicorn did not start within {startup_timeout} seconds")
+                    await asyncio.sleep(0.1)
+            yield http
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+"""
+Function:       run_load
+Description:    Runs `concurrency` virtual users for `warmup` + `duration` seconds. Each one repeatedly picks a
+                scenario by weight (seeded, so the sequence is the same between runs) and runs it to the end.
+                Only the requests after the warm up are recorded. A failed scenario run is counted and the
+                virtual user goes on with the next one.
+"""
+
+
+async def run_load(
+        client: Client,
+        scenarios: Dict[str, Callable],
+        weights: Dict[str, float],
+        context,
+        concurrency: int,
+        duration: float,
+        warmup: float,
+        seed: int,
+) -> Dict[str, Dict[str, int]]:
+    names = [name for name in weights if weights[name] > 0]
+    runs = {name: {"completed": 0, "failed": 0} for name in names}
+    warmup_ends = time.perf_counter() + warmup
+    stop_at = warmup_ends + duration
+
+    async def virtual_user(number: int):
+        rng = random.Random(seed * 1000 + number)
+        while time.perf_counter() < stop_at:
+            name = rng.choices(names, [weights[name] for name in names])[0]
+            try:
+                await scenarios[name](client, context, rng, number)
+                outcome = "completed"
+            except UnexpectedResponse:
+                outcome = "failed"
+            if client.recorder.recording:
+                runs[name][outcome] += 1
+
+    async def switch_recording():
+        await asyncio.sleep(warmup)
+        client.recorder.start()
+        await asyncio.sleep(duration)
+        client.recorder.stop()
+
+    await asyncio.gather(switch_recording(), *(virtual_user(number) for number in range(concurrency)))
+    return runs
@@ -0,0 +1,234 @@
+# benchmarks/scenarios.py
+
+import asyncio
+import itertools
+import json
+import random
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from harness import Client
+
+PASSWORD = "benchmark-password"
+
+
+@dataclass
+class Account:
+    id: int
+    username: str
+    token: str
+
+
+"""
+Class:          BenchmarkData
+Description:    The accounts and pizzas created before the measured run. Every virtual user has its own
+                customer and delivery partner, so that carts are not shared between concurrent users.
+"""
+
+
+@dataclass
+class BenchmarkData:
+    run_id: str
+    admin: Account
+    customers: List[Account]
+    partners: List[Account]
+    pizza_ids: List[int]
+    signups: itertools.count = field(default_factory=itertools.count)
+
+    def customer(self, user: int) -> Account:
+        return self.customers[user % len(self.customers)]
+
+    def partner(self, user: int) -> Account:
+        return self.partners[user % len(self.partners)]
+
+
+async def create_account(client: Client, username: str, role: str) -> Account:
+    response = await client.request("POST", "/users/signup", json={
+        "username": username,
+        "email": f"{username}@example.com",
+        "password": PASSWORD,
+        "role": role,
+    })
+    token = (await client.request(
+        "POST", "/users/login", data={"username": username, "password": PASSWORD}
+    )).json()["access_token"]
+    return Account(response.json()["id"], username, token)
+
+
+"""
+Function:       prepare
+Description:    Creates the admin, one customer and one delivery partner per virtual user, and the menu
+                (imported in one bulk request). Runs before recording starts.
+"""
+
+
+async def prepare(client: Client, run_id: str, users: int, pizzas: int) -> BenchmarkData:
+    admin = await create_account(client, f"{run_id}-admin", "admin")
+    customers = await asyncio.gather(*(
+        create_account(client, f"{run_id}-customer{number}", "customer") for number in range(users)
+    ))
+    partners = await asyncio.gather(*(
+        create_account(client, f"{run_id}-partner{number}", "delivery_partner") for number in range(users)
+    ))
+
+    lines = "\n".join(
+        json.dumps({
+            "name": f"{run_id} pizza {number}",
+            "description": "benchmark pizza",
+            "price": round(8 + number % 12 * 0.75, 2),
+        })
+        for number in range(pizzas)
+    )
+    report = (await client.request(
+        "POST", "/admin/pizzas/bulk", token=admin.token,
+        content=lines, headers={"Content-Type": "application/x-ndjson"},
+    )).json()
+    pizza_ids = [row["id"] for row in report["rows"] if row.get("id") is not None]
+
+    return BenchmarkData(run_id, admin, list(customers), list(partners), pizza_ids)
+
+
+def _order_items(data: BenchmarkData, rng: random.Random) -> List[Dict[str, int]]:
+    # one to four different pizzas, mostly one of each
+    pizza_ids = rng.sample(data.pizza_ids, min(len(data.pizza_ids), rng.choice((1, 1, 2, 2, 3, 4))))
+    return [{"pizza_id": pizza_id, "quantity": rng.choice((1, 1, 1, 2, 3))} for pizza_id in pizza_ids]
+
+
+"""
+Scenario:       signup_login
+Description:    A new customer signs up and logs in. Both requests hash the password with bcrypt.
+"""
+
+
+async def signup_login(client: Client, data: BenchmarkData, rng: random.Random, user: int):
+    await create_account(client, f"{data.run_id}-signup{next(data.signups)}", "customer")
+
+
+"""
+Scenario:       browse
+Description:    A customer looks at the menu, the cart summary and the first page of their orders.
+"""
+
+
+async def browse(client: Client, data: BenchmarkData, rng: random.Random, user: int):
+    customer = data.customer(user)
+    await client.request("GET", "/customer/pizzas", token=customer.token)
+    await client.request("GET", "/customer/cart/summary", token=customer.token)
+    await client.request("GET", "/customer/orders", token=customer.token, params={"limit": 20})
+
+
+"""
+Scenario:       build_cart
+Description:    A customer adds pizzas to the cart one by one, views it, changes a quantity, removes an item
+                and checks out.
+"""
+
+
+async def build_cart(client: Client, data: BenchmarkData, rng: random.Random, user: int):
+    customer = data.customer(user)
+    item_ids = []
+    for item in _order_items(data, rng) + _order_items(data, rng)[:1]:
+        response = await client.request("POST", "/customer/cart", token=customer.token, json=item)
+        item_ids.append(response.json()["id"])
+
+    await client.request("GET", "/customer/cart", token=customer.token)
+    await client.request(
+        "PUT", "/customer/cart/{item_id}", token=customer.token, item_id=item_ids[0], json={"quantity": 2}
+    )
+    if len(set(item_ids)) > 1:
+        await client.request("DELETE", "/customer/cart/{item_id}", token=customer.token, item_id=item_ids[-1])
+    await client.request("POST", "/customer/cart/checkout", token=customer.token)
+
+
+"""
+Scenario:       place_order
+Description:    A customer places an order directly, without the cart.
+"""
+
+
+async def place_order(client: Client, data: BenchmarkData, rng: random.Random, user: int):
+    customer = data.customer(user)
+    await client.request(
+        "POST", "/customer/orders", token=customer.token,
+        json={"user_id": customer.id, "items": _order_items(data, rng)},
+    )
+
+
+"""
+Scenario:       kitchen
+Description:    The admin looks at the latest placed orders and the kitchen starts preparing one of them.
+                Another virtual user may have taken it already, which is a 409.
+"""
+
+
+async def kitchen(client: Client, data: BenchmarkData, rng: random.Random, user: int):
+    page = (await client.request(
+        "GET", "/admin/orders", token=data.admin.token, params={"status": "placed", "limit": 10}
+    )).json()
+    if not page["items"]:
+        return
+    order = rng.choice(page["items"])
+    await client.request(
+        "PUT", "/admin/orders/{order_id}/status", token=data.admin.token, order_id=order["id"],
+        json={"status": "preparing", "version": order["version"]}, expect=(200, 409),
+    )
+
+
+"""
+Scenario:       deliver
+Description:    A delivery partner looks at the dispatch queue, claims the next order (404 when the queue is
+                empty), takes it out, comments on it and delivers it.
+"""
+
+
+async def deliver(client: Client, data: BenchmarkData, rng: random.Random, user: int):
+    partner = data.partner(user)
+    await client.request("GET", "/delivery/queue", token=partner.token)
+    response = await client.request("POST", "/delivery/queue/claim", token=partner.token, expect=(200, 404))
+    if response.status_code == 404:
+        return
+    order_id = response.json()["id"]
+
+    await client.request(
+        "PUT", "/delivery/deliveries/{order_id}/status", token=partner.token, order_id=order_id,
+        json={"status": "out_for_delivery"},
+    )
+    await client.request(
+        "POST", "/delivery/deliveries/{order_id}/comments", token=partner.token, order_id=order_id,
+        json={"order_id": order_id, "delivery_person_id": partner.id, "comment": "on the way"},
+    )
+    await client.request(
+        "PUT", "/delivery/deliveries/{order_id}/status", token=partner.token, order_id=order_id,
+        json={"status": "delivered"},
+    )
+
+
+SCENARIOS = {
+    "signup_login": signup_login,
+    "browse": browse,
+    "build_cart": build_cart,
+    "place_order": place_order,
+    "kitchen": kitchen,
+    "deliver": deliver,
+}
+
+# a lunch rush: mostly browsing and ordering, the kitchen and the drivers keeping up
+DEFAULT_WEIGHTS = {
+    "signup_login": 1,
+    "browse": 10,
+    "build_cart": 3,
+    "place_order": 4,
+    "kitchen": 4,
+    "deliver": 4,
+}
+
+
+def parse_weights(value: str) -> Dict[str, float]:
+    """"browse=10,place_order=4" replaces the default weights, a scenario left out does not run."""
+    weights = {}
+    for part in filter(None, (part.strip() for part in value.split(","))):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS:
+            raise ValueError(f"unknown scenario {name!r}, choose from {', '.join(SCENARIOS)}")
+        weights[name] = float(weight or 1)
+    return weights
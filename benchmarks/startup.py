@@ -0,0 +1,182 @@
+# benchmarks/startup.py
+
+"""
+Cold start time of the app, run from the repository root:
+
+    python benchmarks/startup.py                        5 fresh processes against new SQLite databases
+    python benchmarks/startup.py --existing             against a database that is already set up
+    python benchmarks/startup.py --server --workers 4   time until uvicorn answers
+    python benchmarks/startup.py --max-seconds 2        exits 1 when the median total is slower
+    python benchmarks/startup.py --imports 15           also lists the slowest imports of create_app()
+
+Every run is a new Python process, so nothing is cached between runs but the files the OS keeps in memory.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from bench import RESULTS_DIR, git_commit
+from harness import APPLICATION_DIR, configure_environment, uvicorn_client
+
+# the phases a run reports, in order
+PHASES = ["import", "create_app", "startup", "first_request", "process"]
+
+# runs in the new process: times importing main, building the app, its lifespan startup (engine and schema)
+# and the first request, the same way a server would start it
+CHILD = r"""
+import asyncio, json, sys, time
+import httpx
+
+started = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+import main
+imported = time.perf_counter()
+app = main.create_app()
+created = time.perf_counter()
+
+
+async def serve():
+    async with app.router.lifespan_context(app):
+        up = time.perf_counter()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://startup") as http:
+            await http.get("/customer/pizzas")
+        return up, time.perf_counter()
+
+up, answered = asyncio.run(serve())
+print(json.dumps({
+    "import": imported - started,
+    "create_app": created - imported,
+    "startup": up - created,
+    "first_request": answered - up,
+}))
+"""
+
+
+def new_database_url() -> str:
+    return f"sqlite:///{tempfile.mkdtemp(prefix='pizza-startup-')}/startup.db"
+
+
+def run_in_process(database_url: str) -> dict:
+    env = {**os.environ, "DATABASE_URL": database_url}
+    started_at = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-c", CHILD, str(APPLICATION_DIR)],
+        cwd=APPLICATION_DIR, env=env, capture_output=True, text=True,
+    )
+    process = time.perf_counter() - started_at
+    if completed.returncode != 0:
+        raise RuntimeError(f"the app did not start:\n{completed.stderr}")
+    return {**json.loads(completed.stdout.strip().splitlines()[-1]), "process": process}
+
+
+async def run_server(database_url: str, workers: int) -> dict:
+    os.environ["DATABASE_URL"] = database_url
+    started_at = time.perf_counter()
+    async with uvicorn_client(concurrency=1, workers=workers):
+        # uvicorn_client returns once the server has answered
+        return {"process": time.perf_counter() - started_at}
+
+
+def slowest_imports(count: int) -> list:
+    """The modules with the highest cumulative import time under create_app(), from -X importtime."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main; main.create_app()"],
+        cwd=APPLICATION_DIR, env={**os.environ, "DATABASE_URL": new_database_url()}, capture_output=True, text=True,
+    )
+    imports = []
+    for line in completed.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)", line)
+        # top level imports only, the time of their own imports is included in theirs
+        if match and len(match.group(3)) == 1:
+            imports.append((match.group(4), int(match.group(2)) / 1000))
+    return sorted(imports, key=lambda item: item[1], reverse=True)[:count]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="startup.py")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--existing", action="store_true",
+                        help="start against a database that is already set up, instead of a new one each run")
+    parser.add_argument("--server", action="store_true", help="measure the time until uvicorn answers")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers, with --server")
+    parser.add_argument("--imports", type=int, default=0, help="list the N slowest imports")
+    parser.add_argument("--max-seconds", type=float, default=None, help="fail if the median total is slower")
+    parser.add_argument("--output", default=None, help="result file, benchmarks/results/startup-<commit>-<time>.json")
+    args = parser.parse_args(argv)
+
+    configure_environment()
+    existing_url = None
+    if args.existing:
+        existing_url = new_database_url()
+        # the first start creates the schema, it is not measured
+        run_in_process(existing_url)
+
+    runs = []
+    for number in range(args.runs):
+        database_url = existing_url or new_database_url()
+        if args.server:
+            runs.append(asyncio.run(run_server(database_url, args.workers)))
+        else:
+            runs.append(run_in_process(database_url))
+        timings = ", ".join(f"{phase} {seconds * 1000:.0f} ms" for phase, seconds in runs[-1].items())
+        print(f"run {number + 1}: {timings}", file=sys.stderr)
+
+    summary = {
+        phase: {
+            "min_ms": min(run[phase] for run in runs) * 1000,
+            "median_ms": statistics.median(run[phase] for run in runs) * 1000,
+            "max_ms": max(run[phase] for run in runs) * 1000,
+        }
+        for phase in PHASES if phase in runs[0]
+    }
+
+    print(f"\n{'phase':<15} {'min ms':>9} {'median ms':>10} {'max ms':>9}")
+    for phase, stats in summary.items():
+        print(f"{phase:<15} {stats['min_ms']:>9.1f} {stats['median_ms']:>10.1f} {stats['max_ms']:>9.1f}")
+
+    result = {
+        "meta": {
+            **git_commit(),
+            "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "mode": "uvicorn" if args.server else "in-process",
+            "workers": args.workers if args.server else None,
+            "database": "existing" if args.existing else "new",
+            "runs": args.runs,
+        },
+        "summary": summary,
+        "runs": runs,
+    }
+
+    if args.imports:
+        result["slowest_imports"] = slowest_imports(args.imports)
+        print(f"\n{'module':<40} {'ms':>9}")
+        for module, milliseconds in result["slowest_imports"]:
+            print(f"{module:<40} {milliseconds:>9.1f}")
+
+    output = Path(args.output) if args.output else RESULTS_DIR / "startup-{}-{}.json".format(
+        (result["meta"]["commit"] or "unknown")[:10], datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2))
+    print(f"\nresults written to {output}")
+
+    total = summary["process"]["median_ms"] / 1000
+    if args.max_seconds is not None and total > args.max_seconds:
+        print(f"median start up of {total:.2f} s is over the budget of {args.max_seconds} s")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
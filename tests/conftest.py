@@ -0,0 +1,207 @@
+# tests/conftest.py
+
+import os
+import re
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+
+import pytest
+
+# the application imports its packages relative to application/, and reads its settings at import time
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "application"))
+os.environ.update({
+    "DATABASE_URL": "sqlite://",
+    "SECRET_KEY": "test-secret",
+    "ALGORITHM": "HS256",
+    "EXPIRE_TIME": "1",
+    # roles come from the token, so budgets only count the endpoint's own queries
+    "AUTH_TRUST_TOKEN_CLAIMS": "true",
+    "BCRYPT_ROUNDS": "4",
+    "RATE_LIMIT_ENABLED": "false",
+    "METRICS_ENABLED": "false",
+    # the client fixture creates the schema in the in-memory database itself
+    "DB_SETUP_SCHEMA": "false",
+})
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession  # noqa: E402
+
+import main  # noqa: E402
+from database.database import Base, async_engine, get_async_db  # noqa: E402
+from models.order import Order, OrderItem, OrderStatus  # noqa: E402
+from models.pizza import Pizza  # noqa: E402
+from models.cart import CartItem  # noqa: E402
+from models.user import User  # noqa: E402
+from utils.menu_cache import menu_cache  # noqa: E402
+from utils.principal_cache import principal_cache  # noqa: E402
+from utils.util_functions import create_access_token, principal_claims  # noqa: E402
+
+
+# pysqlite (and aiosqlite) only support SAVEPOINT once SQLAlchemy issues BEGIN itself
+@event.listens_for(async_engine.sync_engine, "connect")
+def _autocommit_driver(dbapi_connection, connection_record):
+    dbapi_connection.isolation_level = None
+
+
+@event.listens_for(async_engine.sync_engine, "begin")
+def _begin(conn):
+    conn.exec_driver_sql("BEGIN")
+
+
+TRANSACTION_CONTROL = re.compile(r"^\s*(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE)\b", re.IGNORECASE)
+
+
+class QueryCounter:
+
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if not TRANSACTION_CONTROL.match(statement):
+            self.statements.append(statement)
+
+
+"""
+Fixture:        client
+Description:    One app and one in-memory schema for the whole session. The TestClient's event loop is kept
+                running, every database call of the tests goes through client.portal so they share that loop.
+"""
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(main.app) as client:
+        async def create_schema():
+            async with async_engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+
+        client.portal.call(create_schema)
+        yield client
+
+
+"""
+Fixture:        db
+Description:    A session inside a transaction that is rolled back after the test. The app's get_async_db yields
+                the same session, and the commits of the endpoints only release savepoints.
+"""
+
+
+@pytest.fixture
+def db(client):
+    state = {}
+
+    async def begin():
+        state["connection"] = await async_engine.connect()
+        state["transaction"] = await state["connection"].begin()
+        state["session"] = AsyncSession(
+            bind=state["connection"],
+            join_transaction_mode="create_savepoint",
+            expire_on_commit=False,
+            autoflush=False,
+        )
+
+    async def rollback():
+        await state["session"].close()
+        await state["transaction"].rollback()
+        await state["connection"].close()
+
+    async def override_get_async_db():
+        yield state["session"]
+
+    client.portal.call(begin)
+    main.app.dependency_overrides[get_async_db] = override_get_async_db
+    menu_cache.invalidate()
+    principal_cache.clear()
+    yield state["session"]
+    main.app.dependency_overrides.pop(get_async_db, None)
+    menu_cache.invalidate()
+    client.portal.call(rollback)
+
+
+@pytest.fixture
+def run(client):
+    """Runs a coroutine function on the app's event loop: run(fn, *args)."""
+    return client.portal.call
+
+
+"""
+Fixture:        count_queries
+Description:    Context manager counting the SQL statements (without transaction control) run inside it:
+
+                    with count_queries() as queries:
+                        client.get(...)
+                    assert queries.count == 1
+"""
+
+
+@pytest.fixture
+def count_queries():
+    @contextmanager
+    def counting():
+        counter = QueryCounter()
+        event.listen(async_engine.sync_engine, "before_cursor_execute", counter)
+        try:
+            yield counter
+        finally:
+            event.remove(async_engine.sync_engine, "before_cursor_execute", counter)
+
+    return counting
+
+
+@pytest.fixture
+def make(db, run):
+    """Factory for test data, added to the test's transaction."""
+    return DataFactory(db, run)
+
+
+class DataFactory:
+
+    def __init__(self, db: AsyncSession, run):
+        self.db = db
+        self.run = run
+        self.sequence = 0
+
+    def _add(self, *objects):
+        async def add():
+            self.db.add_all(objects)
+            await self.db.flush()
+        self.run(add)
+        return objects
+
+    def user(self, role: str = "customer") -> User:
+        self.sequence += 1
+        name = f"{role}{self.sequence}"
+        return self._add(User(username=name, email=f"{name}@example.com", hashed_password="x", role=role))[0]
+
+    def headers(self, user: User) -> dict:
+        token = create_access_token({"sub": user.username, **principal_claims(user)})
+        return {"Authorization": f"Bearer {token}"}
+
+    def pizzas(self, count: int, available: bool = True) -> list:
+        first = self.sequence
+        self.sequence += count
+        return list(self._add(*(
+            Pizza(name=f"pizza{first + i}", description="test", price=10.0 + i, is_available=available)
+            for i in range(count)
+        )))
+
+    def cart(self, user: User, pizzas: list, quantity: int = 1) -> list:
+        return list(self._add(*(CartItem(user_id=user.id, pizza_id=pizza.id, quantity=quantity) for pizza in pizzas)))
+
+    def orders(self, user: User, pizzas: list, count: int, status: OrderStatus = OrderStatus.PLACED) -> list:
+        orders = self._add(*(
+            Order(user_id=user.id, total_amount=sum(pizza.price for pizza in pizzas), status=status)
+            for _ in range(count)
+        ))
+        self._add(*(
+            OrderItem(order_id=order.id, pizza_id=pizza.id, quantity=1, unit_price=pizza.price)
+            for order in orders
+            for pizza in pizzas
+        ))
+        return list(orders)
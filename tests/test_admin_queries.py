@@ -0,0 +1,165 @@
+# tests/test_admin_queries.py
+
+import pytest
+from models.order import OrderStatus
+
+SIZES = [1, 5, 25]
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_browse_orders_is_two_queries(client, make, count_queries, size):
+    admin = make.user("admin")
+    make.orders(make.user(), make.pizzas(3), count=size)
+
+    with count_queries() as queries:
+        response = client.get("/admin/orders", params={"limit": 100}, headers=make.headers(admin))
+    assert len(response.json()["items"]) == size
+    assert queries.count == 2
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_update_order_status_query_count_does_not_grow(client, make, count_queries, size):
+    admin = make.user("admin")
+    order = make.orders(make.user(), make.pizzas(size), count=1)[0]
+
+    with count_queries() as queries:
+        response = client.put(
+            f"/admin/orders/{order.id}/status", json={"status": "preparing"}, headers=make.headers(admin)
+        )
+    assert response.json()["status"] == "preparing"
+    # conditional update, and the rollup upserts for the daily row and the two per pizza statuses
+    assert queries.count == 4
+
+
+def test_update_order_status_is_admin_only(client, make):
+    customer = make.user()
+    order = make.orders(customer, make.pizzas(1), count=1)[0]
+
+    response = client.put(
+        f"/admin/orders/{order.id}/status", json={"status": "cancelled"}, headers=make.headers(customer)
+    )
+    assert response.status_code in (401, 403)
+    assert client.get("/customer/orders", headers=make.headers(customer)).json()["items"][0]["status"] == "placed"
+
+
+def test_update_order_status_conflicts(client, make, count_queries):
+    order = make.orders(make.user(), make.pizzas(1), count=1, status=OrderStatus.DELIVERED)[0]
+    headers = make.headers(make.user("admin"))
+
+    with count_queries() as queries:
+        response = client.put(f"/admin/orders/{order.id}/status", json={"status": "preparing"}, headers=headers)
+    assert response.status_code == 409
+    # the conditional update matched nothing, one read tells why
+    assert queries.count == 2
+
+    response = client.put(
+        f"/admin/orders/{order.id}/status", json={"status": "cancelled", "version": order.version + 1}, headers=headers
+    )
+    assert response.status_code == 409
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_sales_stats_query_count_does_not_grow(client, make, count_queries, size):
+    admin = make.user("admin")
+    customer = make.user()
+    pizzas = make.pizzas(3)
+    for _ in range(size):
+        client.post(
+            "/customer/orders",
+            json={"user_id": customer.id, "items": [{"pizza_id": pizza.id, "quantity": 1} for pizza in pizzas]},
+            headers=make.headers(customer),
+        )
+
+    with count_queries() as queries:
+        response = client.get("/admin/stats", headers=make.headers(admin))
+    stats = response.json()
+    assert stats["days"][0]["order_count"] == size
+    assert {pizza["order_count"] for pizza in stats["pizzas"]} == {size}
+    # days and pizzas, read from the rollups
+    assert queries.count == 2
+
+
+def test_pizza_changes_invalidate_the_menu(client, make, count_queries):
+    admin = make.user("admin")
+    customer = make.user()
+    pizza = make.pizzas(1)[0]
+    client.get("/customer/pizzas", headers=make.headers(customer))
+
+    response = client.put(f"/admin/pizzas/{pizza.id}", json={"price": 99.0}, headers=make.headers(admin))
+    assert response.json()["price"] == 99.0
+
+    with count_queries() as queries:
+        menu = client.get("/customer/pizzas", headers=make.headers(customer)).json()
+    assert menu[0]["price"] == 99.0
+    assert queries.count == 1
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_bulk_pizza_import_query_count_does_not_grow(client, make, count_queries, size):
+    admin = make.user("admin")
+    existing = make.pizzas(1)[0]
+    lines = [f'{{"name": "{existing.name}", "description": "updated", "price": 1.5}}']
+    lines += [f'{{"name": "imported{i}", "description": "new", "price": 2.5}}' for i in range(size)]
+
+    with count_queries() as queries:
+        response = client.post(
+            "/admin/pizzas/bulk",
+            content="\n".join(lines),
+            headers={**make.headers(admin), "Content-Type": "application/x-ndjson"},
+        )
+    report = response.json()
+    assert (report["created"], report["updated"], report["failed"]) == (size, 1, 0)
+    # existing names, insert, update
+    assert queries.count == 3
+
+
+def test_bulk_pizza_import_only_writes_the_columns_a_row_has(client, make, run, db):
+    admin = make.user("admin")
+    hidden, listed = make.pizzas(2)
+    hidden.is_available = False
+    run(db.flush)
+    # a price only sync of the menu, with a pizza that is not on it yet
+    body = "\n".join(["name,price", f"{hidden.name},20", f"{listed.name},21", "unknown,22"])
+
+    response = client.post(
+        "/admin/pizzas/bulk", content=body, headers={**make.headers(admin), "Content-Type": "text/csv"}
+    )
+    report = response.json()
+    assert (report["created"], report["updated"], report["failed"]) == (0, 2, 1)
+    assert report["rows"][2]["errors"] == ["description: Field required"]
+
+    for pizza in (hidden, listed):
+        run(db.refresh, pizza)
+    assert (hidden.price, hidden.description, hidden.is_available) == (20.0, "test", False)
+    assert (listed.price, listed.description, listed.is_available) == (21.0, "test", True)
+
+
+def test_bulk_pizza_import_reports_lines_that_are_not_utf8(client, make):
+    admin = make.user("admin")
+    headers = {**make.headers(admin), "Content-Type": "text/csv"}
+    body = b"name,description,price\nlatin1 caf\xe9,test,9\nutf8 caf\xc3\xa9,test,9"
+
+    response = client.post("/admin/pizzas/bulk", content=body, headers=headers)
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["created"], report["failed"]) == (1, 1)
+    assert report["rows"][0] == {
+        "row": 2, "name": None, "status": "error", "id": None, "errors": ["Invalid UTF-8 at byte 10"]
+    }
+    assert report["rows"][1]["name"] == "utf8 caf\u00e9"
+
+    response = client.post("/admin/pizzas/bulk", content=b"n\xe4me,price\n", headers=headers)
+    assert response.status_code == 400
+    assert response.json() == {"detail": "The CSV header is not valid UTF-8 (byte 1)"}
+
+
+def test_bulk_pizza_import_rejects_nulls_of_existing_pizzas(client, make):
+    admin = make.user("admin")
+    pizza = make.pizzas(1)[0]
+
+    response = client.post(
+        "/admin/pizzas/bulk",
+        content=f'{{"name": "{pizza.name}", "price": null}}',
+        headers={**make.headers(admin), "Content-Type": "application/x-ndjson"},
+    )
+    assert response.json()["rows"][0]["status"] == "error"
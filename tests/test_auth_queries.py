@@ -0,0 +1,17 @@
+# tests/test_auth_queries.py
+
+
+def test_signup_and_login(client, db, count_queries):
+    user = {"username": "newuser", "email": "newuser@example.com", "password": "secret", "role": "customer"}
+
+    with count_queries() as signup:
+        assert client.post("/users/signup", json=user).status_code == 200
+    # username and email check, insert
+    assert signup.count <= 3
+
+    with count_queries() as login:
+        response = client.post("/users/login", data={"username": "newuser", "password": "secret"})
+    assert response.json()["token_type"] == "bearer"
+    assert login.count == 1
+
+    assert client.post("/users/login", data={"username": "newuser", "password": "wrong"}).status_code == 401
@@ -0,0 +1,195 @@
+# tests/test_customer_queries.py
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql
+
+from api.customer import orderable_cart
+from database.database import async_engine
+
+SIZES = [1, 5, 25]
+
+
+def test_menu_is_one_query_and_then_cached(client, make, count_queries):
+    customer = make.user()
+    make.pizzas(5)
+
+    with count_queries() as first:
+        response = client.get("/customer/pizzas", headers=make.headers(customer))
+    assert response.status_code == 200
+    assert len(response.json()) == 5
+    assert first.count == 1
+
+    with count_queries() as cached:
+        assert client.get("/customer/pizzas", headers=make.headers(customer)).status_code == 200
+    assert cached.count == 0
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_menu_query_count_does_not_grow(client, make, count_queries, size):
+    customer = make.user()
+    make.pizzas(size)
+
+    with count_queries() as queries:
+        assert len(client.get("/customer/pizzas", headers=make.headers(customer)).json()) == size
+    assert queries.count == 1
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_view_cart_is_one_query(client, make, count_queries, size):
+    customer = make.user()
+    make.cart(customer, make.pizzas(size), quantity=2)
+
+    with count_queries() as queries:
+        response = client.get("/customer/cart", headers=make.headers(customer))
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == size
+    assert queries.count == 1
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_cart_summary_is_one_query(client, make, count_queries, size):
+    customer = make.user()
+    pizzas = make.pizzas(size)
+    make.cart(customer, pizzas, quantity=2)
+
+    with count_queries() as queries:
+        response = client.get("/customer/cart/summary", headers=make.headers(customer))
+    assert response.json() == {"item_count": 2 * size, "total": 2 * sum(pizza.price for pizza in pizzas)}
+    assert queries.count == 1
+
+
+def test_add_to_cart_is_a_single_upsert(client, make, count_queries):
+    customer = make.user()
+    pizza = make.pizzas(1)[0]
+    headers = make.headers(customer)
+    # pizzas are checked against the cached menu
+    client.get("/customer/pizzas", headers=headers)
+
+    for expected_quantity in (2, 4):
+        with count_queries() as queries:
+            response = client.post("/customer/cart", json={"pizza_id": pizza.id, "quantity": 2}, headers=headers)
+        assert response.json()["quantity"] == expected_quantity
+        assert queries.count == 1
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_batch_add_to_cart_query_count_does_not_grow(client, make, count_queries, size):
+    customer = make.user()
+    pizzas = make.pizzas(size)
+    client.get("/customer/pizzas", headers=make.headers(customer))
+
+    with count_queries() as queries:
+        response = client.post(
+            "/customer/cart/batch",
+            json=[{"pizza_id": pizza.id, "quantity": 1} for pizza in pizzas],
+            headers=make.headers(customer),
+        )
+    assert response.status_code == 200
+    assert len(response.json()) == size
+    assert queries.count == 1
+
+
+def test_update_and_delete_cart_item(client, make, count_queries):
+    customer = make.user()
+    item = make.cart(customer, make.pizzas(1))[0]
+    headers = make.headers(customer)
+
+    with count_queries() as update:
+        assert client.put(f"/customer/cart/{item.id}", json={"quantity": 3}, headers=headers).json()["quantity"] == 3
+    with count_queries() as delete:
+        assert client.delete(f"/customer/cart/{item.id}", headers=headers).json() == ["Item got deleted"]
+    # select and write
+    assert update.count == 2
+    assert delete.count == 2
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_create_order_query_count_does_not_grow(client, make, count_queries, size):
+    customer = make.user()
+    pizzas = make.pizzas(size)
+
+    with count_queries() as queries:
+        response = client.post(
+            "/customer/orders",
+            json={"user_id": customer.id, "items": [{"pizza_id": pizza.id, "quantity": 2} for pizza in pizzas]},
+            headers=make.headers(customer),
+        )
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == size
+    # pizzas, order, items, and the two sales rollup upserts
+    assert queries.count == 5
+
+
+def test_create_order_reports_missing_pizzas_with_one_query(client, make, count_queries):
+    customer = make.user()
+    pizza = make.pizzas(1)[0]
+
+    with count_queries() as queries:
+        response = client.post(
+            "/customer/orders",
+            json={"user_id": customer.id, "items": [{"pizza_id": pizza.id, "quantity": 1}, {"pizza_id": 999999, "quantity": 1}]},
+            headers=make.headers(customer),
+        )
+    assert response.status_code == 404
+    assert response.json()["detail"]["missing_pizza_ids"] == [999999]
+    assert queries.count == 1
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_checkout_query_count_does_not_grow(client, make, count_queries, size):
+    customer = make.user()
+    make.cart(customer, make.pizzas(size))
+
+    with count_queries() as queries:
+        response = client.post("/customer/cart/checkout", headers=make.headers(customer))
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == size
+    # order, items, total, two sales rollup upserts, and the cart cleanup (decrement, delete emptied lines)
+    assert queries.count == 7
+
+
+def test_checkout_keeps_what_was_added_meanwhile(client, make):
+    customer = make.user()
+    ordered, added = make.pizzas(2)
+    make.cart(customer, [ordered, added], quantity=2)
+
+    def concurrent_add_to_cart(conn, cursor, statement, parameters, context, executemany):
+        # another request adds to one line between the order's INSERT ... SELECT and the cart cleanup
+        if statement.lstrip().startswith("UPDATE cart_items") and not concurrent_add_to_cart.done:
+            concurrent_add_to_cart.done = True
+            cursor.execute(
+                "UPDATE cart_items SET quantity = quantity + 3 WHERE user_id = ? AND pizza_id = ?",
+                (customer.id, added.id),
+            )
+    concurrent_add_to_cart.done = False
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", concurrent_add_to_cart)
+    try:
+        response = client.post("/customer/cart/checkout", headers=make.headers(customer))
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", concurrent_add_to_cart)
+    assert concurrent_add_to_cart.done
+    assert {item["pizza_id"]: item["quantity"] for item in response.json()["items"]} == {ordered.id: 2, added.id: 2}
+
+    cart = client.get("/customer/cart", headers=make.headers(customer)).json()
+    assert [(item["pizza_id"], item["quantity"]) for item in cart["items"]] == [(added.id, 3)]
+
+
+def test_checkout_locks_the_cart_lines_it_orders():
+    # a second checkout of the same cart waits for the first one, and then no longer finds the ordered lines
+    sql = str(orderable_cart(1).compile(dialect=postgresql.dialect()))
+    assert sql.endswith("FOR UPDATE OF cart_items")
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_order_page_is_two_queries(client, make, count_queries, size):
+    customer = make.user()
+    make.orders(customer, make.pizzas(3), count=size)
+
+    with count_queries() as queries:
+        response = client.get("/customer/orders", params={"limit": 100}, headers=make.headers(customer))
+    assert len(response.json()["items"]) == size
+    assert all(len(order["items"]) == 3 for order in response.json()["items"])
+    # orders and their items
+    assert queries.count == 2
@@ -0,0 +1,59 @@
+# tests/test_delivery_queries.py
+
+import pytest
+from models.order import OrderStatus
+
+SIZES = [1, 5, 25]
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_dispatch_queue_is_two_queries(client, make, count_queries, size):
+    partner = make.user("delivery_partner")
+    customer = make.user()
+    pizzas = make.pizzas(2)
+    make.orders(customer, pizzas, count=size, status=OrderStatus.PREPARING)
+    make.orders(customer, pizzas, count=2, status=OrderStatus.PLACED)
+
+    with count_queries() as queries:
+        response = client.get("/delivery/queue", headers=make.headers(partner))
+    assert len(response.json()) == size
+    assert queries.count == 2
+
+
+def test_claim_and_deliver(client, make, count_queries):
+    partner = make.user("delivery_partner")
+    other_partner = make.user("delivery_partner")
+    order = make.orders(make.user(), make.pizzas(3), count=1, status=OrderStatus.PREPARING)[0]
+
+    with count_queries() as claim:
+        response = client.post("/delivery/queue/claim", headers=make.headers(partner))
+    assert response.json()["assigned_to"] == partner.id
+    # conditional update, order, items
+    assert claim.count == 3
+
+    assert client.post("/delivery/queue/claim", headers=make.headers(other_partner)).status_code == 404
+    assert client.put(
+        f"/delivery/deliveries/{order.id}/status", json={"status": "out_for_delivery"}, headers=make.headers(other_partner)
+    ).status_code == 403
+
+    with count_queries() as update:
+        response = client.put(
+            f"/delivery/deliveries/{order.id}/status", json={"status": "out_for_delivery"}, headers=make.headers(partner)
+        )
+    assert response.status_code == 200
+    assert update.count == 4
+
+
+def test_add_delivery_comment(client, make, count_queries):
+    partner = make.user("delivery_partner")
+    order = make.orders(make.user(), make.pizzas(1), count=1)[0]
+
+    with count_queries() as queries:
+        response = client.post(
+            f"/delivery/deliveries/{order.id}/comments",
+            json={"order_id": order.id, "delivery_person_id": partner.id, "comment": "at the door"},
+            headers=make.headers(partner),
+        )
+    assert response.json()["comment"] == "at the door"
+    # order lookup and insert
+    assert queries.count == 2
@@ -0,0 +1,133 @@
+# tests/test_idempotency.py
+
+import asyncio
+import uuid
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from utils.idempotency import IdempotencyMiddleware, MemoryIdempotencyStore
+
+
+def key_headers(headers: dict) -> dict:
+    # the app's store lives as long as the test session, every test uses keys of its own
+    return {**headers, "Idempotency-Key": str(uuid.uuid4())}
+
+
+def test_retry_replays_the_stored_response(client, make, count_queries):
+    customer = make.user()
+    pizza = make.pizzas(1)[0]
+    headers = key_headers(make.headers(customer))
+
+    first = client.post("/customer/cart", json={"pizza_id": pizza.id, "quantity": 2}, headers=headers)
+    with count_queries() as queries:
+        retry = client.post("/customer/cart", json={"pizza_id": pizza.id, "quantity": 2}, headers=headers)
+
+    assert retry.status_code == first.status_code == 200
+    assert retry.json() == first.json()
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert "idempotent-replayed" not in first.headers
+    # the endpoint did not run again, the upsert would have added 2 more
+    assert queries.count == 0
+    cart = client.get("/customer/cart", headers=make.headers(customer)).json()
+    assert [item["quantity"] for item in cart["items"]] == [2]
+
+
+def test_key_reused_with_a_different_body_is_rejected(client, make):
+    customer = make.user()
+    first, second = make.pizzas(2)
+    headers = key_headers(make.headers(customer))
+
+    assert client.post("/customer/cart", json={"pizza_id": first.id}, headers=headers).status_code == 200
+    response = client.post("/customer/cart", json={"pizza_id": second.id}, headers=headers)
+    assert response.status_code == 422
+    cart = client.get("/customer/cart", headers=make.headers(customer)).json()
+    assert [item["pizza_id"] for item in cart["items"]] == [first.id]
+
+
+def test_keys_are_scoped_to_the_caller(client, make):
+    pizza = make.pizzas(1)[0]
+    key = {"Idempotency-Key": "shared"}
+
+    for customer in (make.user(), make.user()):
+        response = client.post(
+            "/customer/cart", json={"pizza_id": pizza.id}, headers={**make.headers(customer), **key}
+        )
+        assert "idempotent-replayed" not in response.headers
+        assert response.json()["user_id"] == customer.id
+
+
+"""
+Function:       order_app
+Description:    A stand-in for POST /customer/orders behind the middleware, with its own store. It answers with
+                the status in the request body and counts how often it ran, waiting for `release` if given.
+"""
+
+
+def order_app(release: asyncio.Event = None):
+    app = FastAPI()
+    app.state.calls = 0
+
+    @app.post("/customer/orders")
+    async def create_order(request: Request):
+        app.state.calls += 1
+        if release is not None:
+            await release.wait()
+        status = (await request.json())["status"]
+        return JSONResponse({"call": app.state.calls}, status_code=status)
+
+    app.add_middleware(IdempotencyMiddleware, store=MemoryIdempotencyStore())
+    return app
+
+
+def post(app, status: int, key: str = "key"):
+    async def send():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await http.post("/customer/orders", json={"status": status}, headers={"Idempotency-Key": key})
+    return asyncio.run(send())
+
+
+def test_server_errors_are_not_stored():
+    app = order_app()
+
+    assert post(app, 503).status_code == 503
+    # the failed request freed the key, the retry runs the endpoint
+    retry = post(app, 503)
+    assert (retry.status_code, "idempotent-replayed" in retry.headers) == (503, False)
+    assert app.state.calls == 2
+
+    assert post(app, 201).json() == {"call": 3}
+    replay = post(app, 201)
+    assert (replay.json(), replay.headers["idempotent-replayed"]) == ({"call": 3}, "true")
+    assert app.state.calls == 3
+
+
+def test_client_errors_are_replayed():
+    app = order_app()
+
+    assert post(app, 400).status_code == 400
+    replay = post(app, 400)
+    assert (replay.status_code, replay.headers["idempotent-replayed"]) == (400, "true")
+    assert app.state.calls == 1
+
+
+def test_concurrent_retry_waits_for_the_first_request():
+    async def run():
+        release = asyncio.Event()
+        app = order_app(release)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            def send():
+                return http.post("/customer/orders", json={"status": 200}, headers={"Idempotency-Key": "key"})
+            first = asyncio.ensure_future(send())
+            retry = asyncio.ensure_future(send())
+            await asyncio.sleep(0.05)
+            release.set()
+            return app.state.calls, await first, await retry
+
+    calls, first, retry = asyncio.run(run())
+    assert calls == 1
+    assert first.json() == retry.json() == {"call": 1}
+    assert retry.headers["idempotent-replayed"] == "true"
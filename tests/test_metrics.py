@@ -0,0 +1,70 @@
+# tests/test_metrics.py
+
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from utils import metrics
+from utils.idempotency import IdempotencyMiddleware, MemoryIdempotencyStore
+from utils.metrics import MetricsMiddleware, registry
+from utils.rate_limit import MemoryRateLimitStore, RateLimit, RateLimitMiddleware
+
+
+@pytest.fixture
+def measured(monkeypatch):
+    """An app behind the same middleware as main's, with a slow stream and a limit of 2 requests on /admin."""
+    monkeypatch.setattr(metrics, "SLOW_REQUEST_MS", 100)
+    app = FastAPI()
+
+    @app.get("/customer/events")
+    async def events():
+        async def body():
+            yield b": connected\n\n"
+            await asyncio.sleep(0.2)
+        return StreamingResponse(body(), media_type="text/event-stream")
+
+    @app.put("/admin/orders/{order_id}/status")
+    async def order_status(order_id: int):
+        return {"id": order_id}
+
+    app.add_middleware(IdempotencyMiddleware, store=MemoryIdempotencyStore())
+    app.add_middleware(
+        RateLimitMiddleware, limits={"/admin": RateLimit(2, 60)}, store=MemoryRateLimitStore(), enabled=True
+    )
+    app.add_middleware(MetricsMiddleware, enabled=True)
+    return TestClient(app)
+
+
+def observed(method: str, route: str, status: str, handler: str = "endpoint"):
+    return registry.latency.get((method, route, status, handler))
+
+
+def test_streams_are_timed_until_the_response_starts(measured):
+    slow_requests = registry.slow_requests
+
+    response = measured.get("/customer/events")
+
+    assert response.status_code == 200
+    latency = observed("GET", "/customer/events", "200")
+    assert latency.count == 1
+    # the body stays open for 200 ms, the request was answered long before
+    assert latency.sum < 0.1
+    assert registry.slow_requests == slow_requests
+
+
+def test_answers_of_the_middleware_are_labelled_with_it(measured):
+    headers = {"Idempotency-Key": "key"}
+
+    assert measured.put("/admin/orders/7/status", headers=headers).status_code == 200
+    replay = measured.put("/admin/orders/7/status", headers=headers)
+    assert replay.headers["idempotent-replayed"] == "true"
+    assert measured.put("/admin/orders/7/status", headers=headers).status_code == 429
+
+    # each under the route template, not as unmatched
+    assert observed("PUT", "/admin/orders/{order_id}/status", "200").count == 1
+    assert observed("PUT", "/admin/orders/{order_id}/status", "200", "idempotency").count == 1
+    assert observed("PUT", "/admin/orders/{order_id}/status", "429", "rate_limit").count == 1
+    assert 'handler="rate_limit"' in registry.render()
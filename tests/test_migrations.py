@@ -0,0 +1,122 @@
+# tests/test_migrations.py
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import create_engine, inspect, select, text
+from sqlalchemy.exc import IntegrityError
+
+# every table, as the app has them once create_app imported the routers
+import models.delivery  # noqa: F401
+import models.idempotency  # noqa: F401
+import models.sales  # noqa: F401
+from database.database import Base
+from database.migrations import HEAD, current_version, schema_migrations, setup_schema, upgrade
+from models.cart import CartItem
+from models.order import Order
+from models.sales import DailyPizzaSales, DailySales
+from utils.sales_rollups import rebuild_rollups
+
+# the tables as they were before the first migration, with a cart that has duplicate lines
+BASELINE = [
+    "CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR UNIQUE, email VARCHAR UNIQUE,"
+    " hashed_password VARCHAR, role VARCHAR CHECK (role IN ('customer', 'delivery_partner', 'admin')),"
+    " is_active BOOLEAN)",
+    "CREATE TABLE pizzas (id INTEGER PRIMARY KEY, name VARCHAR, description VARCHAR, price FLOAT,"
+    " is_available BOOLEAN)",
+    "CREATE TABLE cart_items (id INTEGER PRIMARY KEY, user_id INTEGER REFERENCES users (id),"
+    " pizza_id INTEGER REFERENCES pizzas (id), quantity INTEGER)",
+    "CREATE TABLE orders (id INTEGER PRIMARY KEY, user_id INTEGER REFERENCES users (id), total_amount FLOAT,"
+    " status VARCHAR(16), created_at DATETIME, updated_at DATETIME)",
+    "CREATE TABLE order_items (id INTEGER PRIMARY KEY, order_id INTEGER REFERENCES orders (id),"
+    " pizza_id INTEGER REFERENCES pizzas (id), quantity INTEGER, unit_price FLOAT)",
+    "CREATE TABLE delivery_comments (id INTEGER PRIMARY KEY, order_id INTEGER NOT NULL REFERENCES orders (id),"
+    " current_user_id INTEGER NOT NULL REFERENCES users (id), comment VARCHAR NOT NULL)",
+    "INSERT INTO users VALUES (1, 'alice', 'alice@example.com', 'x', 'customer', 1),"
+    " (2, 'bob', 'bob@example.com', 'x', 'customer', 1)",
+    "INSERT INTO pizzas VALUES (1, 'margherita', 'test', 10.0, 1), (2, 'funghi', 'test', 12.0, 1)",
+    "INSERT INTO cart_items VALUES (1, 1, 1, 1), (2, 1, 2, 1), (3, 1, 1, 2), (4, 2, 1, 1), (5, 1, 1, 4)",
+    "INSERT INTO orders VALUES"
+    " (1, 1, 32.0, 'DELIVERED', '2026-01-05 12:00:00', '2026-01-05 12:40:00'),"
+    " (2, 2, 10.0, 'DELIVERED', '2026-01-05 19:00:00', '2026-01-05 19:30:00'),"
+    " (3, 1, 24.0, 'CANCELLED', '2026-01-06 18:00:00', '2026-01-06 18:05:00')",
+    "INSERT INTO order_items VALUES (1, 1, 1, 2, 10.0), (2, 1, 2, 1, 12.0), (3, 2, 1, 1, 10.0), (4, 3, 2, 2, 12.0)",
+]
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrations.db'}")
+    yield engine
+    engine.dispose()
+
+
+@pytest.mark.parametrize("existing", [False, True])
+def test_setup_schema_from_concurrent_workers(engine, existing):
+    if existing:
+        # the tables are there but no migration is recorded, every worker finds all of them pending
+        Base.metadata.create_all(bind=engine)
+
+    with ThreadPoolExecutor(max_workers=4) as workers:
+        results = [workers.submit(setup_schema, engine) for _ in range(4)]
+        applied = [result.result() for result in results]
+
+    # each migration was applied by one worker only, or by none on a new database
+    assert sum(len(migrations) for migrations in applied) == (HEAD if existing else 0)
+    with engine.connect() as conn:
+        assert conn.execute(select(schema_migrations.c.version)).scalars().all() == list(range(1, HEAD + 1))
+        assert current_version(conn) == HEAD
+
+
+def test_baseline_database_is_migrated(engine):
+    with engine.begin() as conn:
+        for statement in BASELINE:
+            conn.execute(text(statement))
+
+    applied = setup_schema(engine)
+    assert [migration.version for migration in applied] == list(range(1, HEAD + 1))
+    # a second start has nothing left to do
+    assert setup_schema(engine) == []
+
+    with engine.begin() as conn:
+        # duplicate lines were merged into the oldest one
+        cart = conn.execute(
+            select(CartItem.id, CartItem.user_id, CartItem.pizza_id, CartItem.quantity).order_by(CartItem.id)
+        ).all()
+        assert [tuple(row) for row in cart] == [(1, 1, 1, 7), (2, 1, 2, 1), (4, 2, 1, 1)]
+        with pytest.raises(IntegrityError), conn.begin_nested():
+            conn.execute(text("INSERT INTO cart_items (user_id, pizza_id, quantity) VALUES (1, 2, 1)"))
+
+        orders = conn.execute(select(Order.id, Order.version, Order.assigned_to).order_by(Order.id)).all()
+        assert [tuple(row) for row in orders] == [(1, 1, None), (2, 1, None), (3, 1, None)]
+        assert inspect(conn).has_table("idempotency_keys")
+        # the rollups start out empty and are filled from the existing orders
+        assert conn.execute(select(DailySales.day)).all() == []
+
+        rebuild_rollups(conn)
+        days = conn.execute(
+            select(DailySales.day, DailySales.status, DailySales.order_count, DailySales.revenue)
+            .order_by(DailySales.day, DailySales.status)
+        ).all()
+        assert [(str(day), status.value, count, revenue) for day, status, count, revenue in days] == [
+            ("2026-01-05", "delivered", 2, 42.0),
+            ("2026-01-06", "cancelled", 1, 24.0),
+        ]
+        pizzas = conn.execute(
+            select(DailyPizzaSales.pizza_id, DailyPizzaSales.order_count, DailyPizzaSales.quantity)
+            .where(DailyPizzaSales.day == days[0].day)
+            .order_by(DailyPizzaSales.pizza_id)
+        ).all()
+        assert [tuple(row) for row in pizzas] == [(1, 2, 3), (2, 1, 1)]
+
+
+def test_upgrade_stops_at_the_target(engine):
+    with engine.begin() as conn:
+        for statement in BASELINE[:6]:
+            conn.execute(text(statement))
+
+    assert [migration.version for migration in upgrade(engine, target=2)] == [1, 2]
+    with engine.connect() as conn:
+        assert current_version(conn) == 2
+        assert "version" not in {column["name"] for column in inspect(conn).get_columns("orders")}
+    assert [migration.version for migration in upgrade(engine)] == list(range(3, HEAD + 1))
@@ -0,0 +1,109 @@
+# tests/test_order_events.py
+
+import asyncio
+import json
+
+import pytest
+
+from utils import events
+from utils.events import KITCHEN_CHANNEL, event_stream, get_broker, user_channel
+
+
+class ClientRequest:
+    """What event_stream needs of the Request: whether the client went away."""
+
+    def __init__(self):
+        self.disconnected = False
+
+    async def is_disconnected(self) -> bool:
+        return self.disconnected
+
+
+"""
+Class:          Stream
+Description:    An SSE body as the endpoints return it, read message by message on the app's event loop, so that
+                it sees the events the requests of the test client publish.
+"""
+
+
+class Stream:
+
+    def __init__(self, run, *channels: str):
+        self.run = run
+        self.request = ClientRequest()
+        self.body = event_stream(self.request, *channels)
+        # subscribes, the first message is sent before any event
+        assert self.next() == ": connected\n\n"
+
+    def next(self, timeout: float = 1.0) -> str:
+        async def receive():
+            return await asyncio.wait_for(self.body.__anext__(), timeout)
+        return self.run(receive)
+
+    def event(self) -> dict:
+        fields = dict(line.split(": ", 1) for line in self.next().strip().split("\n"))
+        data = json.loads(fields["data"])
+        assert (int(fields["id"]), fields["event"]) == (data["id"], data["type"])
+        return data
+
+    def pending(self) -> bool:
+        try:
+            self.next(timeout=0.05)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def close(self):
+        self.run(self.body.aclose)
+
+
+def test_order_events_reach_the_customer_and_the_kitchen(client, make, run):
+    customer, other = make.user(), make.user()
+    admin = make.user("admin")
+    make.cart(customer, make.pizzas(2))
+    customer_stream = Stream(run, user_channel(customer.id))
+    other_stream = Stream(run, user_channel(other.id))
+    kitchen_stream = Stream(run, KITCHEN_CHANNEL)
+
+    try:
+        order = client.post("/customer/cart/checkout", headers=make.headers(customer)).json()
+        created = customer_stream.event()
+        assert {key: created[key] for key in ("type", "order_id", "user_id", "status", "previous_status")} == {
+            "type": "order.created", "order_id": order["id"], "user_id": customer.id, "status": "placed",
+            "previous_status": None,
+        }
+        assert kitchen_stream.event() == created
+
+        client.put(f"/admin/orders/{order['id']}/status", json={"status": "preparing"}, headers=make.headers(admin))
+        changed = customer_stream.event()
+        assert (changed["type"], changed["status"], changed["previous_status"]) == (
+            "order.status_changed", "preparing", "placed"
+        )
+        assert changed["id"] > created["id"]
+        assert kitchen_stream.event() == changed
+
+        # nothing for other customers
+        assert not other_stream.pending()
+    finally:
+        for stream in (customer_stream, other_stream, kitchen_stream):
+            stream.close()
+
+    # closed streams unsubscribe
+    assert not get_broker().subscribers.get(user_channel(customer.id))
+    assert not get_broker().subscribers.get(KITCHEN_CHANNEL)
+
+
+def test_idle_streams_send_keepalives_until_the_client_leaves(run, monkeypatch):
+    monkeypatch.setattr(events, "ORDER_EVENTS_HEARTBEAT", 0.01)
+    stream = Stream(run, user_channel(0))
+
+    assert stream.next() == ": keepalive\n\n"
+    stream.request.disconnected = True
+    with pytest.raises(StopAsyncIteration):
+        stream.next()
+    assert not get_broker().subscribers.get(user_channel(0))
+
+
+def test_kitchen_events_are_for_admins_only(client, make):
+    response = client.get("/admin/orders/events", headers=make.headers(make.user()))
+    assert response.status_code == 401
@@ -0,0 +1,112 @@
+# tests/test_rate_limit.py
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import main
+from settings import Settings
+from utils import rate_limit
+from utils.rate_limit import MemoryRateLimitStore, RateLimit, RateLimitMiddleware
+from utils.util_functions import create_access_token
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def limited():
+    """An app with 2 requests per minute on /customer and none on /open, behind its own limiter."""
+    app = FastAPI()
+
+    @app.get("/customer/pizzas")
+    async def pizzas():
+        return []
+
+    @app.get("/open")
+    async def open_route():
+        return {}
+
+    app.add_middleware(
+        RateLimitMiddleware, limits={"/customer": RateLimit(2, 60)}, store=MemoryRateLimitStore(), enabled=True
+    )
+    return TestClient(app)
+
+
+def bearer(username: str) -> dict:
+    return {"Authorization": f"Bearer {create_access_token({'sub': username})}"}
+
+
+def test_requests_over_the_limit_get_429_with_retry_after(limited, clock):
+    responses = [limited.get("/customer/pizzas") for _ in range(3)]
+
+    assert [response.status_code for response in responses] == [200, 200, 429]
+    assert [response.headers["ratelimit-remaining"] for response in responses] == ["1", "0", "0"]
+    assert responses[0].headers["ratelimit-limit"] == "2"
+    assert responses[0].headers["ratelimit-policy"] == "2;w=60"
+    assert "retry-after" not in responses[1].headers
+    # one token comes back every 30 seconds
+    assert responses[2].headers["retry-after"] == "30"
+    assert responses[2].json() == {"detail": "Too many requests"}
+
+
+def test_buckets_refill_over_time(limited, clock):
+    for _ in range(2):
+        limited.get("/customer/pizzas")
+    assert limited.get("/customer/pizzas").status_code == 429
+
+    clock.now += 29
+    assert limited.get("/customer/pizzas").headers["retry-after"] == "1"
+    clock.now += 1
+    assert limited.get("/customer/pizzas").status_code == 200
+
+
+def test_each_user_has_a_bucket_of_their_own(limited, clock):
+    for _ in range(2):
+        assert limited.get("/customer/pizzas", headers=bearer("alice")).status_code == 200
+    assert limited.get("/customer/pizzas", headers=bearer("alice")).status_code == 429
+
+    assert limited.get("/customer/pizzas", headers=bearer("bob")).status_code == 200
+    # without a valid token the client address is limited, also not alice's bucket
+    assert limited.get("/customer/pizzas", headers={"Authorization": "Bearer forged"}).status_code == 200
+    assert limited.get("/customer/pizzas").status_code == 200
+    assert limited.get("/customer/pizzas").status_code == 429
+
+
+def test_routes_without_a_limit_are_not_counted(limited, clock):
+    for _ in range(5):
+        response = limited.get("/open")
+        assert response.status_code == 200
+        assert "ratelimit-limit" not in response.headers
+
+
+@pytest.mark.parametrize("value, limit", [
+    ("10/60", RateLimit(10, 60)),
+    ("5", RateLimit(5, 60)),
+    ("off", None),
+    ("0", None),
+])
+def test_parse_limits(value, limit):
+    assert RateLimit.parse(value) == limit
+
+
+def test_the_settings_turn_the_limiter_on_and_off(monkeypatch):
+    # the environment of the tests turns it off, only the settings passed to create_app count
+    monkeypatch.setenv("RATE_LIMIT_ENABLED", "false")
+    for enabled in (True, False):
+        app = main.create_app(Settings(rate_limit_enabled=enabled, setup_schema=False))
+        middleware = next(item for item in app.user_middleware if item.cls is RateLimitMiddleware)
+        assert middleware.kwargs["enabled"] is enabled
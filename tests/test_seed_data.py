@@ -0,0 +1,91 @@
+# tests/test_seed_data.py
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, insert, select
+
+from database.migrations import setup_schema
+from models.cart import CartItem
+from models.delivery import DeliveryComment
+from models.order import Order, OrderItem
+from models.sales import DailySales
+from models.user import User
+from utils.seed_data import SEED_END, SeedConfig, SeedGenerator
+
+TABLES = [User, CartItem, Order, OrderItem, DeliveryComment]
+
+END = datetime(2026, 3, 14, 19, 30)
+
+
+SIZES = {"customers": 40, "delivery_partners": 3, "admins": 1, "pizzas": 6, "orders": 500, "days": 20}
+
+
+def config(**changes) -> SeedConfig:
+    return SeedConfig(**{**SIZES, "end": END, "batch_size": 100, **changes})
+
+
+def seed(tmp_path, name: str, seed_config: SeedConfig, existing_users=()) -> dict:
+    """Seeds a new SQLite database, or one with existing_users, and returns every row, per table."""
+    engine = create_engine(f"sqlite:///{tmp_path / name}")
+    try:
+        setup_schema(engine)
+        with engine.begin() as conn:
+            if existing_users:
+                conn.execute(insert(User.__table__), list(existing_users))
+            SeedGenerator(conn, seed_config, progress=lambda message: None).run()
+        with engine.connect() as conn:
+            rows = {
+                model.__tablename__: conn.execute(select(model.__table__).order_by(model.id)).all()
+                for model in TABLES
+            }
+            rows["daily_sales"] = conn.execute(
+                select(DailySales.__table__).order_by(DailySales.day, DailySales.status)
+            ).all()
+        return rows
+    finally:
+        engine.dispose()
+
+
+def test_the_same_seed_and_end_give_the_same_rows(tmp_path):
+    first = seed(tmp_path, "first.db", config())
+    assert first == seed(tmp_path, "second.db", config())
+    assert len(first["orders"]) == 500
+    assert first["daily_sales"]
+
+    assert seed(tmp_path, "other.db", config(seed=7))["orders"] != first["orders"]
+
+
+def test_runs_without_an_end_give_the_same_rows(tmp_path):
+    first = seed(tmp_path, "first.db", SeedConfig(**SIZES))
+
+    assert first == seed(tmp_path, "second.db", SeedConfig(**SIZES))
+    assert max(order.created_at for order in first["orders"]) <= SEED_END
+
+
+@pytest.mark.parametrize("end", [END, SEED_END])
+def test_orders_are_placed_within_the_days_before_the_end(tmp_path, end):
+    orders = seed(tmp_path, "seed.db", config(end=end))["orders"]
+
+    last = end
+    created = [order.created_at for order in orders]
+    assert max(created) <= last
+    assert (last - min(created)).days < 20
+    # ids grow with created_at
+    assert created == sorted(created)
+    # only the orders of the last hour are still open
+    open_orders = [order for order in orders if order.status.value in ("placed", "preparing", "out_for_delivery")]
+    assert all((last - order.created_at).total_seconds() <= 3600 for order in open_orders)
+
+
+def test_names_of_existing_users_are_skipped(tmp_path):
+    existing = [
+        {"id": 1, "username": "admin3", "email": "someone@example.com", "hashed_password": "x", "role": "customer"},
+        {"id": 2, "username": "someone", "email": "admin4@example.com", "hashed_password": "x", "role": "customer"},
+    ]
+    users = seed(tmp_path, "existing.db", config(), existing_users=existing)["users"]
+
+    # admin3 and admin4 are taken, the admin gets the next free id
+    assert [(user.id, user.username) for user in users if user.role == "admin"] == [(5, "admin5")]
+    assert len(users) == 2 + 1 + 3 + 40
+    assert len({user.username for user in users}) == len({user.email for user in users}) == len(users)
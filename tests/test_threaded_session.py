@@ -0,0 +1,73 @@
+# tests/test_threaded_session.py
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+import main
+from database.database import get_async_db
+from database.migrations import setup_schema
+from database.threaded_session import ThreadedSession
+from models.order import Order
+from models.pizza import Pizza
+from models.user import User
+from utils.menu_cache import menu_cache
+from utils.util_functions import create_access_token, principal_claims
+
+
+"""
+Fixture:        sync_db
+Description:    The routers on ThreadedSession (DB_SYNC_SESSIONS=true), against a SQLite file of their own: the
+                in-memory database of the other tests is only visible to the async engine's connection.
+"""
+
+
+@pytest.fixture
+def sync_db(client, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'sync.db'}")
+    setup_schema(engine)
+
+    async def override_get_async_db():
+        db = ThreadedSession(Session(bind=engine, expire_on_commit=False, autoflush=False))
+        try:
+            yield db
+        finally:
+            await db.close()
+
+    main.app.dependency_overrides[get_async_db] = override_get_async_db
+    menu_cache.invalidate()
+    with Session(engine, expire_on_commit=False) as session:
+        yield session
+    main.app.dependency_overrides.pop(get_async_db, None)
+    menu_cache.invalidate()
+    engine.dispose()
+
+
+def headers(user: User) -> dict:
+    return {"Authorization": f"Bearer {create_access_token({'sub': user.username, **principal_claims(user)})}"}
+
+
+def test_cart_checkout_and_status_change_with_sync_sessions(client, sync_db):
+    customer = User(username="sync-customer", email="c@example.com", hashed_password="x", role="customer")
+    admin = User(username="sync-admin", email="a@example.com", hashed_password="x", role="admin")
+    pizza = Pizza(name="sync", description="test", price=10.0, is_available=True)
+    sync_db.add_all([customer, admin, pizza])
+    sync_db.commit()
+
+    assert [item["id"] for item in client.get("/customer/pizzas", headers=headers(customer)).json()] == [pizza.id]
+    response = client.post("/customer/cart", json={"pizza_id": pizza.id, "quantity": 2}, headers=headers(customer))
+    assert response.status_code == 200
+    # the upsert adds to the existing line
+    client.post("/customer/cart", json={"pizza_id": pizza.id, "quantity": 1}, headers=headers(customer))
+    assert client.get("/customer/cart/summary", headers=headers(customer)).json()["total"] == 30.0
+
+    order = client.post("/customer/cart/checkout", headers=headers(customer)).json()
+    assert order["total_amount"] == 30.0
+    response = client.put(
+        f"/admin/orders/{order['id']}/status", json={"status": "preparing"}, headers=headers(admin)
+    )
+    assert response.json()["status"] == "preparing"
+
+    page = client.get("/customer/orders", headers=headers(customer)).json()
+    assert [(item["id"], item["status"]) for item in page["items"]] == [(order["id"], "preparing")]
+    assert sync_db.scalar(select(Order.version).where(Order.id == order["id"])) == 2